@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import sqlite3
+from contextlib import closing
+
+import redis
+
+from app import profiles
+from app.config import settings
+from app.records import decode_github_item, decode_x_post
+from app.store import scoped
+
+logger = logging.getLogger(__name__)
+
+r = redis.from_url(settings.redis_url, decode_responses=True)
+
+# Per source: (post hash prefix, record decoder, link field)
+SOURCES = {
+    "x": ("post", decode_x_post, "link"),
+    "github": ("gh_post", decode_github_item, "url"),
+}
+
+# Append-only: rows are never updated, so the full-text index and the
+# tag table are filled by an insert trigger alone.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    pk INTEGER PRIMARY KEY,
+    day TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    source TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    priority TEXT NOT NULL DEFAULT '',
+    title TEXT NOT NULL DEFAULT '',
+    tldr TEXT NOT NULL DEFAULT '',
+    reason TEXT NOT NULL DEFAULT '',
+    tips TEXT NOT NULL DEFAULT '',
+    text TEXT NOT NULL DEFAULT '',
+    author TEXT NOT NULL DEFAULT '',
+    link TEXT NOT NULL DEFAULT '',
+    tags TEXT NOT NULL DEFAULT '[]',
+    published INTEGER NOT NULL DEFAULT 0,
+    discord_thread_id TEXT NOT NULL DEFAULT '',
+    record TEXT NOT NULL DEFAULT '',
+    UNIQUE (day, profile, source, item_id)
+);
+CREATE INDEX IF NOT EXISTS items_day ON items(day);
+CREATE INDEX IF NOT EXISTS items_source ON items(source, day);
+CREATE INDEX IF NOT EXISTS items_priority ON items(priority, day);
+CREATE TABLE IF NOT EXISTS item_tags (
+    item INTEGER NOT NULL REFERENCES items(pk),
+    tag TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS item_tags_tag
+    ON item_tags(tag COLLATE NOCASE, item);
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+    title, tldr, reason, text, content='items', content_rowid='pk'
+);
+CREATE TRIGGER IF NOT EXISTS items_archived AFTER INSERT ON items BEGIN
+    INSERT INTO items_fts(rowid, title, tldr, reason, text)
+        VALUES (new.pk, new.title, new.tldr, new.reason, new.text);
+    INSERT INTO item_tags(item, tag)
+        SELECT new.pk, value FROM json_each(new.tags);
+END;
+"""
+
+COLUMNS = (
+    "day", "profile", "source", "item_id", "priority", "title", "tldr",
+    "reason", "tips", "text", "author", "link", "tags", "published",
+    "discord_thread_id", "record",
+)
+
+
+def connect(path: str | None = None) -> sqlite3.Connection:
+    path = path or settings.archive_path
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _row(day: str, profile: str, source: str, item_id: str,
+         fields: dict[str, str]) -> dict:
+    _, decode, link_field = SOURCES[source]
+    row = {
+        "day": day,
+        "profile": profile,
+        "source": source,
+        "item_id": item_id,
+        "title": fields.get("short_title", ""),
+        "link": fields.get(link_field, ""),
+        "published": int(fields.get("published") or 0),
+        "discord_thread_id": fields.get("discord_thread_id", ""),
+        "record": fields.get("record", ""),
+    }
+    # Hashes claimed before records were stored only have the above
+    if not row["record"]:
+        return row
+    rec = decode(row["record"])
+    if source == "x":
+        row.update(text=rec.text, author=rec.username)
+    else:
+        row.update(text=f"{rec.title}\n{rec.body}", author=rec.author)
+    if rec.verdict:
+        row.update(
+            priority=rec.verdict.priority,
+            title=rec.verdict.short_title or row["title"],
+            tldr=rec.verdict.tldr,
+            reason=rec.verdict.reason,
+            tips=rec.verdict.tips,
+            tags=json.dumps(rec.verdict.tags),
+        )
+    return row
+
+
+def _day_rows(day: str):
+    """Every profile's post hashes for *day*, as archive rows."""
+    for profile in profiles.names():
+        for source, (prefix, _, _) in SOURCES.items():
+            head = scoped(f"{prefix}:{day}:", profile)
+            cursor = 0
+            while True:
+                cursor, keys = r.scan(cursor, match=f"{head}*", count=500)
+                if keys:
+                    pipe = r.pipeline()
+                    for key in keys:
+                        pipe.hgetall(key)
+                    for key, fields in zip(keys, pipe.execute()):
+                        if fields:
+                            yield _row(
+                                day, profile, source,
+                                key[len(head):], fields,
+                            )
+                if cursor == 0:
+                    break
+
+
+def archive_day(day: str) -> int:
+    """Copy *day*'s scored items from Redis into the archive.
+
+    Safe to repeat: rows already archived are left as they are.
+    Returns how many rows were added.
+    """
+    placeholders = ", ".join(f":{c}" for c in COLUMNS)
+    sql = (
+        f"INSERT OR IGNORE INTO items ({', '.join(COLUMNS)}) "
+        f"VALUES ({placeholders})"
+    )
+    added = 0
+    with closing(connect()) as conn, conn:
+        for row in _day_rows(day):
+            full = {c: "" for c in COLUMNS} | {"tags": "[]"} | row
+            added += conn.execute(sql, full).rowcount
+    logger.info("Archived %d item(s) for %s.", added, day)
+    return added
+
+
+def search(
+    query: str = "",
+    *,
+    source: str | None = None,
+    profile: str | None = None,
+    tag: str | None = None,
+    priority: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    limit: int = 20,
+) -> list[sqlite3.Row]:
+    """Archived items matching an FTS5 *query* and filters.
+
+    Full-text hits come best match first, plain filtered listings
+    newest first. *since*/*until* are inclusive ``YYYY-MM-DD`` days.
+    """
+    clauses, args = [], []
+    if query:
+        clauses.append("items_fts MATCH ?")
+        args.append(query)
+    for column, value in (
+        ("source", source), ("profile", profile), ("priority", priority),
+    ):
+        if value:
+            clauses.append(f"items.{column} = ?")
+            args.append(value)
+    if tag:
+        clauses.append(
+            "items.pk IN (SELECT item FROM item_tags "
+            "WHERE tag = ? COLLATE NOCASE)"
+        )
+        args.append(tag)
+    if since:
+        clauses.append("items.day >= ?")
+        args.append(since)
+    if until:
+        clauses.append("items.day <= ?")
+        args.append(until)
+
+    sql = "SELECT items.* FROM items"
+    if query:
+        sql += " JOIN items_fts ON items_fts.rowid = items.pk"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += (
+        " ORDER BY bm25(items_fts)" if query
+        else " ORDER BY items.day DESC, items.pk DESC"
+    )
+    sql += " LIMIT ?"
+    args.append(limit)
+
+    with closing(connect()) as conn:
+        return conn.execute(sql, args).fetchall()
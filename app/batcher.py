@@ -0,0 +1,196 @@
+import logging
+import threading
+from datetime import timedelta
+from typing import Callable
+from zoneinfo import ZoneInfo
+
+import redis
+
+from app import clock
+from app.config import settings
+from app.records import encode
+
+logger = logging.getLogger(__name__)
+
+r = redis.from_url(settings.redis_url, decode_responses=True)
+
+STATS_KEY = "score_batches"
+# Failed scoring attempts after which a record is parked in the dead
+# letters instead of being put back
+MAX_ATTEMPTS = 5
+TIMEZONE = ZoneInfo("America/Argentina/Buenos_Aires")
+
+# Pops the whole buffer if it is big enough, old enough, or forced.
+# KEYS[1]=buffer; ARGV: min_size, oldest_allowed_ts, force
+_TAKE_SCRIPT = """
+local size = redis.call('ZCARD', KEYS[1])
+if size == 0 then
+    return {}
+end
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+if ARGV[3] == '1'
+    or size >= tonumber(ARGV[1])
+    or tonumber(oldest[2]) <= tonumber(ARGV[2]) then
+    local members = redis.call('ZRANGE', KEYS[1], 0, -1, 'WITHSCORES')
+    redis.call('DEL', KEYS[1])
+    return members
+end
+return {}
+"""
+
+# Enqueue time of each popped record, by (source, id), until it is
+# scored (record_batch) or put back (restore)
+_taken: dict[tuple[str, str], float] = {}
+_taken_lock = threading.Lock()
+
+
+def _key(source: str) -> str:
+    return f"score_buffer:{source}"
+
+
+def _attempts_key(source: str) -> str:
+    return f"score_attempts:{source}"
+
+
+def dead_letter_key(source: str) -> str:
+    return f"score_dead:{source}"
+
+
+def add(source: str, records: list) -> None:
+    """Queue scoring candidates; keeps each one's first enqueue time."""
+    if not records:
+        return
+    now = clock.time()
+    r.zadd(_key(source), {encode(rec): now for rec in records}, nx=True)
+
+
+def _last_cycle(interval_minutes: int) -> bool:
+    """Whether the next cycle would fall outside operating hours."""
+    later = clock.now() + timedelta(minutes=interval_minutes)
+    hour = later.astimezone(TIMEZONE).hour
+    return not (
+        settings.schedule_start_hour <= hour < settings.schedule_end_hour
+    )
+
+
+def take_ready(
+    source: str,
+    decode: Callable[[str], object],
+    interval_minutes: int,
+    force: bool = False,
+    size: int | None = None,
+    max_wait_minutes: int | None = None,
+) -> list:
+    """Pop the buffered batch once it should be scored, else [].
+
+    A batch is ready at *size* (SCORE_BATCH_SIZE) candidates, or when
+    waiting one more cycle (*interval_minutes*) would push its oldest
+    candidate past *max_wait_minutes* (SCORE_MAX_WAIT_MINUTES), or on
+    the day's last cycle, so nothing waits overnight. *force* flushes
+    it unconditionally, e.g. to ride along with an urgent call that is
+    made anyway.
+
+    Pass the batch to record_batch() once it is scored, or to
+    restore() if scoring failed.
+    """
+    if size is None:
+        size = settings.score_batch_size
+    if max_wait_minutes is None:
+        max_wait_minutes = settings.score_max_wait_minutes
+    oldest_allowed = (
+        clock.time()
+        - max_wait_minutes * 60
+        + interval_minutes * 60
+    )
+    members = r.eval(
+        _TAKE_SCRIPT, 1, _key(source),
+        size,
+        oldest_allowed,
+        "1" if force or _last_cycle(interval_minutes) else "0",
+    )
+    records = []
+    with _taken_lock:
+        for member, score in zip(members[::2], members[1::2]):
+            rec = decode(member)
+            _taken[(source, rec.id)] = float(score)
+            records.append(rec)
+    return records
+
+
+def restore(source: str, records: list) -> None:
+    """Put a batch whose scoring failed back, keeping its enqueue times.
+
+    Records that never went through the buffer (urgent ones) are due
+    again on the next cycle. A record that has failed MAX_ATTEMPTS
+    times is parked in the dead letters instead.
+    """
+    if not records:
+        return
+    pipe = r.pipeline()
+    for rec in records:
+        pipe.hincrby(_attempts_key(source), rec.id, 1)
+    attempts = pipe.execute()
+    exhausted = [
+        rec for rec, n in zip(records, attempts) if n >= MAX_ATTEMPTS
+    ]
+    retry = [rec for rec, n in zip(records, attempts) if n < MAX_ATTEMPTS]
+    with _taken_lock:
+        scores = {
+            encode(rec): _taken.pop((source, rec.id), 0.0)
+            for rec in records
+        }
+
+    pipe = r.pipeline()
+    for rec in exhausted:
+        pipe.xadd(
+            dead_letter_key(source), {"id": rec.id, "record": encode(rec)},
+            maxlen=1000, approximate=True,
+        )
+        pipe.hdel(_attempts_key(source), rec.id)
+    if retry:
+        pipe.zadd(
+            _key(source), {encode(rec): scores[encode(rec)] for rec in retry},
+            nx=True,
+        )
+    pipe.execute()
+    if retry:
+        logger.warning(
+            "Scoring %s batch of %d failed; put back in the buffer.",
+            source, len(retry),
+        )
+    if exhausted:
+        logger.error(
+            "Parked %d %s record(s) in %s after %d failed attempts.",
+            len(exhausted), source, dead_letter_key(source), MAX_ATTEMPTS,
+        )
+
+
+def pending(source: str) -> int:
+    return r.zcard(_key(source))
+
+
+def record_batch(source: str, records: list) -> float:
+    """Count a scored batch and return the running average size."""
+    with _taken_lock:
+        for rec in records:
+            _taken.pop((source, rec.id), None)
+    size = len(records)
+    pipe = r.pipeline()
+    if records:
+        pipe.hdel(_attempts_key(source), *(rec.id for rec in records))
+    pipe.hincrby(STATS_KEY, f"{source}:batches", 1)
+    pipe.hincrby(STATS_KEY, f"{source}:items", size)
+    batches, items = pipe.execute()[-2:]
+    average = items / batches
+    logger.info(
+        "Scored %s batch of %d (average batch size %.1f over %d).",
+        source, size, average, batches,
+    )
+    return average
+
+
+def average_batch_size(source: str) -> float:
+    batches, items = r.hmget(
+        STATS_KEY, [f"{source}:batches", f"{source}:items"],
+    )
+    return int(items) / int(batches) if batches else 0.0
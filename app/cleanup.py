@@ -4,28 +4,55 @@ from datetime import datetime, timedelta, timezone
 import redis
 
 from app.config import settings
-from app import discord
+from app import archive, digest, discord, profiles
+from app.store import scoped
 
 logger = logging.getLogger(__name__)
 
 r = redis.from_url(settings.redis_url, decode_responses=True)
 
 
-def midnight_cleanup() -> None:
-    """Delete yesterday's Discord threads and Redis keys. Runs at 00:00 ART."""
-    yesterday = (datetime.now(timezone.utc) - timedelta(days=1)).strftime("%Y-%m-%d")
+def midnight_cleanup(day: str | None = None) -> None:
+    """Delete yesterday's Discord threads and Redis keys. Runs at 00:00 ART.
 
-    # 1. Delete Discord threads created yesterday
-    thread_ids = []
-    cursor = 0
-    while True:
-        cursor, keys = r.scan(cursor, match=f"post:{yesterday}:*", count=500)
-        for key in keys:
-            tid = r.hget(key, "discord_thread_id")
-            if tid:
-                thread_ids.append(tid)
-        if cursor == 0:
-            break
+    *day* (``YYYY-MM-DD``) cleans up another day instead, e.g. one whose
+    archiving failed and was kept.
+    """
+    yesterday = day or (datetime.now(timezone.utc) - timedelta(days=1)).strftime("%Y-%m-%d")
+
+    # 0. Archive the day's scored items; keep everything if that fails
+    try:
+        archive.archive_day(yesterday)
+    except Exception:
+        logger.error(
+            "Archiving %s failed; keeping its threads and keys.",
+            yesterday, exc_info=True,
+        )
+        return
+
+    # 0b. Final digest, so items published since the last window get
+    # their thread recorded before the keys holding them are deleted
+    if settings.publish_mode == "digest":
+        digest.run_digests()
+
+    names = profiles.names()
+
+    # 1. Delete Discord threads created yesterday, in every profile.
+    # Digested items share a thread, which is deleted once.
+    thread_ids = set()
+    for name in names:
+        cursor = 0
+        while True:
+            cursor, keys = r.scan(
+                cursor, match=scoped(f"post:{yesterday}:*", name),
+                count=500,
+            )
+            for key in keys:
+                tid = r.hget(key, "discord_thread_id")
+                if tid:
+                    thread_ids.add(tid)
+            if cursor == 0:
+                break
 
     for tid in thread_ids:
         discord.delete_thread(tid)
@@ -36,19 +63,23 @@ def midnight_cleanup() -> None:
     )
 
     # 1b. Delete GitHub Discord threads from yesterday
-    gh_thread_ids = []
-    cursor = 0
-    while True:
-        cursor, keys = r.scan(
-            cursor, match=f"gh_post:{yesterday}:*", count=500,
-        )
-        for key in keys:
-            tid = r.hget(key, "discord_thread_id")
-            if tid:
-                gh_thread_ids.append(tid)
-        if cursor == 0:
-            break
+    gh_thread_ids = set()
+    for name in names:
+        cursor = 0
+        while True:
+            cursor, keys = r.scan(
+                cursor, match=scoped(f"gh_post:{yesterday}:*", name),
+                count=500,
+            )
+            for key in keys:
+                tid = r.hget(key, "discord_thread_id")
+                if tid:
+                    gh_thread_ids.add(tid)
+            if cursor == 0:
+                break
 
+    # A digest holding both sources was already deleted above
+    gh_thread_ids -= thread_ids
     for tid in gh_thread_ids:
         discord.delete_thread(tid)
 
@@ -59,13 +90,18 @@ def midnight_cleanup() -> None:
 
     # 2. Delete Redis keys
     patterns = [
-        f"post:{yesterday}:*",
         f"known:{yesterday}",
-        f"published:{yesterday}",
-        f"gh_post:{yesterday}:*",
         f"gh_known:{yesterday}",
-        f"gh_published:{yesterday}",
     ]
+    for name in names:
+        patterns += [
+            scoped(f"post:{yesterday}:*", name),
+            scoped(f"published:{yesterday}", name),
+            scoped(f"claimed:{yesterday}", name),
+            scoped(f"gh_post:{yesterday}:*", name),
+            scoped(f"gh_published:{yesterday}", name),
+            scoped(f"gh_claimed:{yesterday}", name),
+        ]
 
     deleted = 0
     for pattern in patterns:
@@ -0,0 +1,32 @@
+import contextvars
+import time as _time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+_frozen: contextvars.ContextVar[float | None] = contextvars.ContextVar(
+    "clock_frozen", default=None,
+)
+
+
+def time() -> float:
+    """Seconds since the epoch, or the frozen instant of a replay."""
+    frozen = _frozen.get()
+    return _time.time() if frozen is None else frozen
+
+
+def now() -> datetime:
+    return datetime.fromtimestamp(time(), timezone.utc)
+
+
+@contextmanager
+def frozen_at(timestamp: float):
+    """Make the pipeline see *timestamp* as "now" within this block.
+
+    Replays run each recorded cycle at the instant it was recorded, so
+    age windows, buffer waits and decay come out the same.
+    """
+    token = _frozen.set(timestamp)
+    try:
+        yield
+    finally:
+        _frozen.reset(token)
@@ -9,8 +9,19 @@ load_dotenv()
 @dataclass(frozen=True)
 class Settings:
     x_bearer_token: str = os.environ.get("X_BEARER_TOKEN", "")
+    x_api_base: str = os.environ.get("X_API_BASE", "https://api.x.com")
+    x_ingest_mode: str = os.environ.get("X_INGEST_MODE", "poll")
+    x_stream_consume_minutes: int = int(
+        os.environ.get("X_STREAM_CONSUME_MINUTES", "1")
+    )
     gemini_api_key: str = os.environ.get("GEMINI_API_KEY", "")
     gemini_model: str = os.environ.get("GEMINI_MODEL", "gemini-2.0-flash")
+    gemini_cache_ttl_seconds: int = int(
+        os.environ.get("GEMINI_CACHE_TTL_SECONDS", "3600")
+    )
+    gemini_rpm: int = int(os.environ.get("GEMINI_RPM", "15"))
+    gemini_tpm: int = int(os.environ.get("GEMINI_TPM", "1000000"))
+    gemini_max_retries: int = int(os.environ.get("GEMINI_MAX_RETRIES", "3"))
     alignments: str = """
     You are a content relevance filter for a team of AI engineers and entrepreneurs building products with LLMs. Your job is to read incoming posts and return a JSON verdict for each.  ## TEAM CONTEXT - We build AI-powered products (code migration, texture generation, dev tools) - We use Claude Code (Anthropic) daily as our primary dev tool - We work with LLMs operationally: prompting, agentic workflows, multi-agent orchestration - Tech stack varies: Python, TypeScript, cloud infra (GCP), Git workflows - We care about AI business strategy and competitive positioning  ## HIGH INTEREST (pass = true, priority = "high") - Claude Code updates, tips, new commands, plugins, skills - Anthropic product launches, model releases, engineering blog posts - New AI coding tools, CLI agents, or developer workflows (Codex, Cursor, etc.) - Multi-agent orchestration, agent teams, agentic patterns - AI benchmarks that signal real capability jumps (ARC-AGI, SWE-bench, etc.) - MCP servers, plugins, or integrations useful for dev workflows - Practical prompt engineering or workflow optimization techniques - Open-source AI tools for code generation, migration, or automation - Framework version migration tools or strategies - AI texture/image generation advances (diffusion models, 3D, UV-space)  ## MEDIUM INTEREST (pass = true, priority = "medium") - Major competitor moves (OpenAI, Google, Meta) in AI dev tools or APIs - New AI startups or platforms relevant to code, gaming, or creative AI - AI safety/alignment research with practical engineering implications - Interesting AI agent experiments (emergent behavior, self-organization) - Browser automation, web scraping, or testing tools for AI agents - Enterprise AI platforms or deployment patterns  ## LOW INTEREST (pass = false) - Generic AI hype or opinion pieces without technical substance - AI art drama, copyright debates, or policy-only discussions - Crypto/web3 unless directly integrated with AI tooling - Consumer AI apps (chatbots, personal assistants) without dev relevance - Marketing fluff or product announcements with no technical depth - Social media drama, influencer takes, or pure engagement bait - AI ethics/philosophy without actionable engineering takeaways  ## INSTRUCTIONS You will receive numbered posts [0], [1], etc. Return ONLY a valid JSON array containing ONLY posts that pass (pass=true). Each element must include the original index. If no posts pass, return an empty array: []  Output format per element: { "index": <number>, "pass": true, "priority": "high" | "medium", "tags": ["claude-code", "model-release", ...], "title": "Short headline, max 100 chars, like a news title.", "reason": "One sentence why this is relevant.", "tldr": "2-3 sentence summary." }  Be aggressive filtering. We'd rather miss some medium content than drown in noise. Ask: "Would this change how we build or use our tools tomorrow?" If no, filter it out.
     """
@@ -22,16 +33,61 @@ class Settings:
         'OR "model release" OR "open source AI") lang:en -is:retweet',
     )
     redis_url: str = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+    http_max_retries: int = int(os.environ.get("HTTP_MAX_RETRIES", "3"))
+    http_breaker_threshold: int = int(
+        os.environ.get("HTTP_BREAKER_THRESHOLD", "5")
+    )
+    http_breaker_cooldown_seconds: int = int(
+        os.environ.get("HTTP_BREAKER_COOLDOWN_SECONDS", "60")
+    )
+    cycle_budget_seconds: int = int(
+        os.environ.get("CYCLE_BUDGET_SECONDS", "600")
+    )
+    rate_limit_reserve: int = int(os.environ.get("RATE_LIMIT_RESERVE", "2"))
     fetch_interval_minutes: int = int(os.environ.get("FETCH_INTERVAL_MINUTES", "30"))
     max_results: int = int(os.environ.get("MAX_RESULTS", "30"))
+    x_max_pages: int = int(os.environ.get("X_MAX_PAGES", "3"))
     top_n: int = int(os.environ.get("TOP_N", "1"))
     min_age_minutes: int = int(os.environ.get("MIN_AGE_MINUTES", "30"))
     max_age_minutes: int = int(os.environ.get("MAX_AGE_MINUTES", "120"))
     min_engagement: int = int(os.environ.get("MIN_ENGAGEMENT", "3"))
+    score_batch_size: int = int(os.environ.get("SCORE_BATCH_SIZE", "5"))
+    score_max_wait_minutes: int = int(
+        os.environ.get("SCORE_MAX_WAIT_MINUTES", "60")
+    )
+    reputation_half_life_days: float = float(
+        os.environ.get("REPUTATION_HALF_LIFE_DAYS", "14")
+    )
+    reputation_min_seen: float = float(
+        os.environ.get("REPUTATION_MIN_SEEN", "8")
+    )
+    reputation_skip_rate: float = float(
+        os.environ.get("REPUTATION_SKIP_RATE", "0.05")
+    )
+    reputation_fast_track_rate: float = float(
+        os.environ.get("REPUTATION_FAST_TRACK_RATE", "0.5")
+    )
+    rank_weights: str = os.environ.get(
+        "RANK_WEIGHTS", "priority=3,velocity=1,author=1,tags=1"
+    )
+    rank_tag_weights: str = os.environ.get(
+        "RANK_TAG_WEIGHTS",
+        "claude-code=1,Release=1,ClaudeCode=1,Breaking=0.8,"
+        "model-release=0.5,MCP=0.5",
+    )
     schedule_start_hour: int = int(os.environ.get("SCHEDULE_START_HOUR", "9"))
     schedule_end_hour: int = int(os.environ.get("SCHEDULE_END_HOUR", "20"))
     discord_bot_token: str = os.environ.get("DISCORD_BOT_TOKEN", "")
     discord_channel_id: str = os.environ.get("DISCORD_CHANNEL_ID", "")
+    publish_mode: str = os.environ.get("PUBLISH_MODE", "thread")
+    digest_window_minutes: int = int(
+        os.environ.get("DIGEST_WINDOW_MINUTES", "60")
+    )
+    digest_releases_immediate: bool = (
+        os.environ.get("DIGEST_RELEASES_IMMEDIATE", "true").lower()
+        == "true"
+    )
+    profiles_file: str = os.environ.get("PROFILES_FILE", "")
     x_accounts: str = os.environ.get("X_ACCOUNTS", "")
     github_token: str = os.environ.get("GITHUB_TOKEN", "")
     github_repos: str = os.environ.get(
@@ -41,6 +97,72 @@ class Settings:
         os.environ.get("GITHUB_CHECK_INTERVAL_MINUTES", "30")
     )
     github_top_n: int = int(os.environ.get("GITHUB_TOP_N", "3"))
+    # Empty means the standard GitHub filter prompt
+    github_prompt: str = os.environ.get("GITHUB_PROMPT", "")
+    github_max_pages: int = int(os.environ.get("GITHUB_MAX_PAGES", "10"))
+    github_fetch_mode: str = os.environ.get("GITHUB_FETCH_MODE", "rest")
+    github_graphql_chunk_size: int = int(
+        os.environ.get("GITHUB_GRAPHQL_CHUNK_SIZE", "10")
+    )
+    # GitHub item types scored by batch jobs (e.g. "issue"); empty: off
+    deferred_types: str = os.environ.get("DEFERRED_TYPES", "")
+    batch_backend: str = os.environ.get("BATCH_BACKEND", "gemini")
+    deferred_batch_size: int = int(
+        os.environ.get("DEFERRED_BATCH_SIZE", "50")
+    )
+    deferred_max_wait_minutes: int = int(
+        os.environ.get("DEFERRED_MAX_WAIT_MINUTES", "180")
+    )
+    release_chunk_chars: int = int(
+        os.environ.get("RELEASE_CHUNK_CHARS", "4000")
+    )
+    release_map_concurrency: int = int(
+        os.environ.get("RELEASE_MAP_CONCURRENCY", "4")
+    )
+    release_map_timeout_seconds: int = int(
+        os.environ.get("RELEASE_MAP_TIMEOUT_SECONDS", "60")
+    )
+    github_webhook_secret: str = os.environ.get("GITHUB_WEBHOOK_SECRET", "")
+    # With webhooks, polling only reconciles missed deliveries
+    github_reconcile_interval_minutes: int = int(
+        os.environ.get("GITHUB_RECONCILE_INTERVAL_MINUTES", "120")
+    )
+    webhook_host: str = os.environ.get("WEBHOOK_HOST", "")
+    webhook_port: int = int(os.environ.get("WEBHOOK_PORT", "8080"))
+    archive_path: str = os.environ.get("ARCHIVE_PATH", "data/archive.db")
+    record_dir: str = os.environ.get("RECORD_DIR", "")
+    record_rotate_mb: int = int(os.environ.get("RECORD_ROTATE_MB", "64"))
+    record_keep_files: int = int(
+        os.environ.get("RECORD_KEEP_FILES", "50")
+    )
+    outbox_batch_size: int = int(os.environ.get("OUTBOX_BATCH_SIZE", "10"))
+    stream_retention_days: int = int(
+        os.environ.get("STREAM_RETENTION_DAYS", "7")
+    )
+    stream_per_source: bool = (
+        os.environ.get("STREAM_PER_SOURCE", "false").lower() == "true"
+    )
+    distributed: bool = (
+        os.environ.get("DISTRIBUTED", "false").lower() == "true"
+    )
+    leader_lease_seconds: int = int(
+        os.environ.get("LEADER_LEASE_SECONDS", "60")
+    )
+    work_visibility_seconds: int = int(
+        os.environ.get("WORK_VISIBILITY_SECONDS", "120")
+    )
+    consumer_group: str = os.environ.get("CONSUMER_GROUP", "presenters")
+    consumer_name: str = os.environ.get("CONSUMER_NAME", "")
+    consumer_batch_size: int = int(
+        os.environ.get("CONSUMER_BATCH_SIZE", "10")
+    )
+    consumer_block_ms: int = int(os.environ.get("CONSUMER_BLOCK_MS", "5000"))
+    consumer_claim_idle_seconds: int = int(
+        os.environ.get("CONSUMER_CLAIM_IDLE_SECONDS", "60")
+    )
+    consumer_max_pending: int = int(
+        os.environ.get("CONSUMER_MAX_PENDING", "100")
+    )
 
 
 settings = Settings()
@@ -0,0 +1,214 @@
+import logging
+import os
+import socket
+import threading
+from dataclasses import dataclass
+from typing import Callable
+
+import redis
+
+from app.config import settings
+from app.store import STREAM_KEY
+
+logger = logging.getLogger(__name__)
+
+r = redis.from_url(settings.redis_url, decode_responses=True)
+
+# Deliveries after which a failing entry is parked in the dead letters
+MAX_DELIVERIES = 5
+
+
+@dataclass(slots=True)
+class Entry:
+    """One stream entry delivered to this consumer."""
+
+    id: str
+    fields: dict[str, str]
+
+
+def default_consumer() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def dead_letter_key(stream: str) -> str:
+    return f"{stream}:dead"
+
+
+def ensure_group(
+    group: str, stream: str = STREAM_KEY, start: str = "$",
+) -> None:
+    """Create *group* (and the stream) unless it already exists.
+
+    *start* ``$`` delivers only entries added from now on; ``0``
+    replays everything still in the stream.
+    """
+    try:
+        r.xgroup_create(stream, group, id=start, mkstream=True)
+        logger.info("Created consumer group %s on %s.", group, stream)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def _entries(raw: list) -> tuple[list[Entry], list[str]]:
+    """Split delivered entries from ids trimmed out of the stream."""
+    entries, gone = [], []
+    for entry_id, fields in raw:
+        if fields:
+            entries.append(Entry(entry_id, fields))
+        else:
+            gone.append(entry_id)
+    return entries, gone
+
+
+def read(
+    group: str,
+    consumer: str,
+    stream: str = STREAM_KEY,
+    count: int | None = None,
+    block_ms: int | None = None,
+    pending: bool = False,
+) -> list[Entry]:
+    """Read up to *count* entries, blocking up to *block_ms* for new ones.
+
+    With *pending*, re-reads this consumer's own unacknowledged entries
+    instead (no blocking). Entries trimmed from the stream while pending
+    are acknowledged and skipped.
+    """
+    count = count or settings.consumer_batch_size
+    if block_ms is None:
+        block_ms = settings.consumer_block_ms
+    response = r.xreadgroup(
+        group, consumer, {stream: "0" if pending else ">"},
+        count=count, block=None if pending else block_ms,
+    )
+    if not response:
+        return []
+    entries, gone = _entries(response[0][1])
+    if gone:
+        ack(group, gone, stream)
+    return entries
+
+
+def ack(group: str, ids: list[str], stream: str = STREAM_KEY) -> None:
+    if ids:
+        r.xack(stream, group, *ids)
+
+
+def reclaim(
+    group: str,
+    consumer: str,
+    stream: str = STREAM_KEY,
+    min_idle_ms: int | None = None,
+    count: int | None = None,
+) -> list[Entry]:
+    """Take over entries other consumers left pending for too long.
+
+    A consumer that crashed mid-batch never acknowledges; after
+    CONSUMER_CLAIM_IDLE_SECONDS its entries move to *consumer*.
+    """
+    if min_idle_ms is None:
+        min_idle_ms = settings.consumer_claim_idle_seconds * 1000
+    count = count or settings.consumer_batch_size
+    response = r.xautoclaim(
+        stream, group, consumer, min_idle_ms, start_id="0-0", count=count,
+    )
+    # Redis 7 also reports ids deleted from the stream; they are
+    # dropped from the pending list by the claim itself.
+    entries, _ = _entries(response[1])
+    if entries:
+        logger.info(
+            "Reclaimed %d idle entr%s for %s.",
+            len(entries), "y" if len(entries) == 1 else "ies", consumer,
+        )
+    return entries
+
+
+def pending_count(
+    group: str, consumer: str, stream: str = STREAM_KEY,
+) -> int:
+    """Entries delivered to *consumer* and not yet acknowledged."""
+    for entry in r.xpending(stream, group).get("consumers", []):
+        if entry["name"] == consumer:
+            return int(entry["pending"])
+    return 0
+
+
+def _park_exhausted(
+    group: str, entries: list[Entry], stream: str,
+) -> None:
+    """Move entries delivered MAX_DELIVERIES times to the dead letters."""
+    details = r.xpending_range(
+        stream, group, min=entries[0].id, max=entries[-1].id,
+        count=len(entries),
+    )
+    deliveries = {d["message_id"]: d["times_delivered"] for d in details}
+    exhausted = [
+        e for e in entries if deliveries.get(e.id, 0) >= MAX_DELIVERIES
+    ]
+    for e in exhausted:
+        r.xadd(
+            dead_letter_key(stream), {**e.fields, "entry_id": e.id},
+            maxlen=1000, approximate=True,
+        )
+    ack(group, [e.id for e in exhausted], stream)
+    if exhausted:
+        logger.error(
+            "Parked %d entr%s in %s after %d deliveries.",
+            len(exhausted), "y" if len(exhausted) == 1 else "ies",
+            dead_letter_key(stream), MAX_DELIVERIES,
+        )
+
+
+def consume(
+    group: str,
+    handler: Callable[[list[Entry]], None],
+    consumer: str | None = None,
+    stream: str = STREAM_KEY,
+    stop: threading.Event | None = None,
+    count: int | None = None,
+    start: str = "$",
+) -> None:
+    """Feed batches to *handler* until *stop* is set.
+
+    A batch is acknowledged once *handler* returns; if it raises, the
+    batch stays pending and is retried. Backpressure: the next read
+    only happens after the handler returns, and once this consumer
+    holds CONSUMER_MAX_PENDING unacknowledged entries it stops taking
+    new ones and works through its own backlog first. Entries idle in
+    crashed consumers are reclaimed before each read. *start* applies
+    when the group is created (see ensure_group).
+    """
+    consumer = consumer or default_consumer()
+    stop = stop or threading.Event()
+    ensure_group(group, stream, start)
+    logger.info("Consuming %s as %s/%s.", stream, group, consumer)
+
+    while not stop.is_set():
+        backlogged = (
+            pending_count(group, consumer, stream)
+            >= settings.consumer_max_pending
+        )
+        batch = (
+            read(group, consumer, stream, count, pending=True)
+            if backlogged
+            else reclaim(group, consumer, stream, count=count)
+            or read(group, consumer, stream, count)
+        )
+        if not batch:
+            if backlogged:
+                # Nothing readable left in our own pending list
+                stop.wait(1)
+            continue
+        try:
+            handler(batch)
+        except Exception:
+            logger.error(
+                "Handler failed on %d entr%s; will retry.",
+                len(batch), "y" if len(batch) == 1 else "ies",
+                exc_info=True,
+            )
+            _park_exhausted(group, batch, stream)
+            stop.wait(1)
+            continue
+        ack(group, [e.id for e in batch], stream)
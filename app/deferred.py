@@ -0,0 +1,355 @@
+import json
+import logging
+import uuid
+from dataclasses import asdict, dataclass
+from typing import Protocol
+
+import redis
+
+from app import batcher, clock, gemini, outbox, profiles, ranking
+from app.config import settings
+from app.github_scorer import (
+    apply_classification, classify_request, enrich_github_items,
+)
+from app.records import GitHubItem, decode_github_item, encode
+from app.scorer import CLASSIFY_SCHEMA
+
+logger = logging.getLogger(__name__)
+
+r = redis.from_url(settings.redis_url, decode_responses=True)
+
+# batcher source whose score_buffer holds items waiting for a job
+QUEUE = "github_deferred"
+JOBS_KEY = "deferred:jobs"
+LOCAL_JOB_TTL_SECONDS = 7 * 86400
+# A replica collecting a job holds it this long; if it dies, another
+# replica collects the job once the claim lapses
+COLLECT_CLAIM_SECONDS = 3600
+# Items per classification request inside a job
+REQUEST_ITEMS = 25
+
+
+@dataclass(frozen=True, slots=True)
+class BatchRequest:
+    """One generation in a batch job, as generate_json() would send it."""
+
+    name: str
+    system_instruction: str
+    contents: str
+    response_schema: dict
+
+
+class BatchFailed(Exception):
+    """A batch job ended without results; its items are re-queued."""
+
+
+class BatchBackend(Protocol):
+    """Runs batches of generations asynchronously."""
+
+    name: str
+
+    def submit(self, requests: list[BatchRequest]) -> str:
+        """Start a job; returns its id."""
+
+    def results(self, job_id: str) -> list[str | None] | None:
+        """Answers in request order, or None while the job still runs.
+
+        A request that failed on its own answers None; a job that
+        failed as a whole raises BatchFailed.
+        """
+
+    def discard(self, job_id: str) -> None:
+        """Drop what the backend keeps for a collected job."""
+
+
+class GeminiBatchBackend:
+    """Gemini Batch API with inline requests, billed at batch rates."""
+
+    name = "gemini"
+    PENDING_STATES = frozenset({
+        "JOB_STATE_UNSPECIFIED", "JOB_STATE_QUEUED", "JOB_STATE_PENDING",
+        "JOB_STATE_RUNNING", "JOB_STATE_PAUSED", "JOB_STATE_UPDATING",
+    })
+    DONE_STATES = frozenset({
+        "JOB_STATE_SUCCEEDED", "JOB_STATE_PARTIALLY_SUCCEEDED",
+    })
+
+    def submit(self, requests: list[BatchRequest]) -> str:
+        job = gemini.get_client().batches.create(
+            model=settings.gemini_model,
+            src=[
+                {
+                    "contents": [
+                        {"role": "user", "parts": [{"text": req.contents}]},
+                    ],
+                    "config": {
+                        "system_instruction": req.system_instruction,
+                        "response_mime_type": "application/json",
+                        "response_schema": req.response_schema,
+                    },
+                }
+                for req in requests
+            ],
+            config={"display_name": f"botman-deferred-{len(requests)}"},
+        )
+        return job.name
+
+    def results(self, job_id: str) -> list[str | None] | None:
+        job = gemini.get_client().batches.get(name=job_id)
+        state = job.state.name if job.state else "JOB_STATE_UNSPECIFIED"
+        if state in self.PENDING_STATES:
+            return None
+        if state not in self.DONE_STATES:
+            raise BatchFailed(f"Batch job {job_id} ended {state}")
+        texts = []
+        for inlined in job.dest.inlined_responses or []:
+            if inlined.error or inlined.response is None:
+                texts.append(None)
+                continue
+            gemini.record_usage("batch", inlined.response)
+            texts.append(inlined.response.text)
+        return texts
+
+    def discard(self, job_id: str) -> None:
+        # Finished jobs are left to the Batch API's own retention
+        pass
+
+
+class LocalBackend:
+    """Stand-in that answers a job through the regular Gemini path.
+
+    The requests are kept in Redis and run one by one when the job is
+    collected, so the deferred tier works (and can be exercised)
+    without Batch API access. The answers are kept until the job is
+    discarded, so a collect that fails to publish does not pay for
+    them again.
+    """
+
+    name = "local"
+
+    def submit(self, requests: list[BatchRequest]) -> str:
+        job_id = f"local-{uuid.uuid4().hex}"
+        r.set(
+            f"deferred:local:{job_id}",
+            json.dumps([asdict(req) for req in requests]),
+            ex=LOCAL_JOB_TTL_SECONDS,
+        )
+        return job_id
+
+    def results(self, job_id: str) -> list[str | None] | None:
+        answers = r.get(f"deferred:local:{job_id}:answers")
+        if answers is not None:
+            return json.loads(answers)
+        raw = r.get(f"deferred:local:{job_id}")
+        if raw is None:
+            raise BatchFailed(f"Local job {job_id} expired")
+        texts = []
+        for req in json.loads(raw):
+            try:
+                texts.append(gemini.generate_json(
+                    req["name"], req["system_instruction"],
+                    req["contents"],
+                    priority=gemini.PRIORITY_NORMAL,
+                    response_schema=req["response_schema"],
+                ))
+            except Exception:
+                logger.error(
+                    "Local batch request %s failed.", req["name"],
+                    exc_info=True,
+                )
+                texts.append(None)
+        r.set(
+            f"deferred:local:{job_id}:answers", json.dumps(texts),
+            ex=LOCAL_JOB_TTL_SECONDS,
+        )
+        return texts
+
+    def discard(self, job_id: str) -> None:
+        r.delete(
+            f"deferred:local:{job_id}", f"deferred:local:{job_id}:answers",
+        )
+
+
+BACKENDS: dict[str, BatchBackend] = {
+    backend.name: backend for backend in (GeminiBatchBackend(), LocalBackend())
+}
+
+
+def is_deferred(item: GitHubItem) -> bool:
+    """Whether *item* is scored by a batch job instead of this cycle.
+
+    Releases are always scored right away.
+    """
+    if item.type == "release":
+        return False
+    types = {t.strip() for t in settings.deferred_types.split(",")}
+    return item.type in types
+
+
+def enqueue(items: list[GitHubItem]) -> None:
+    if items:
+        batcher.add(QUEUE, items)
+        logger.info(
+            "Deferred %d GitHub item(s) to batch scoring (%d waiting).",
+            len(items), batcher.pending(QUEUE),
+        )
+
+
+def submit_ready(interval_minutes: int) -> str | None:
+    """Submit the waiting items as one job once the queue is ready.
+
+    Ready at DEFERRED_BATCH_SIZE items, or before the oldest would wait
+    past DEFERRED_MAX_WAIT_MINUTES. Every profile classifies the items
+    in the same job. Returns the job id, if one was submitted.
+    """
+    items = batcher.take_ready(
+        QUEUE, decode_github_item, interval_minutes,
+        size=settings.deferred_batch_size,
+        max_wait_minutes=settings.deferred_max_wait_minutes,
+    )
+    if not items:
+        return None
+
+    requests, layout = [], []
+    for profile in profiles.load():
+        for start in range(0, len(items), REQUEST_ITEMS):
+            chunk = items[start:start + REQUEST_ITEMS]
+            requests.append(BatchRequest(
+                *classify_request(chunk, profile), CLASSIFY_SCHEMA,
+            ))
+            layout.append({
+                "profile": profile.name,
+                "items": [encode(it) for it in chunk],
+            })
+
+    backend = BACKENDS[settings.batch_backend]
+    try:
+        job_id = backend.submit(requests)
+    except Exception:
+        logger.error(
+            "Submitting a batch of %d item(s) failed; re-queued.",
+            len(items), exc_info=True,
+        )
+        batcher.restore(QUEUE, items)
+        return None
+    batcher.record_batch(QUEUE, items)
+
+    r.hset(JOBS_KEY, job_id, json.dumps({
+        "backend": backend.name,
+        "submitted_at": clock.time(),
+        "requests": layout,
+    }))
+    logger.info(
+        "Submitted batch job %s: %d item(s), %d request(s).",
+        job_id, len(items), len(requests),
+    )
+    return job_id
+
+
+def _job_items(requests: list[dict]) -> list[GitHubItem]:
+    """The distinct items of *requests*, in order.
+
+    Every profile's requests carry the same items.
+    """
+    records = dict.fromkeys(
+        raw for request in requests for raw in request["items"]
+    )
+    return [decode_github_item(raw) for raw in records]
+
+
+def _publish(
+    layout: list[dict], texts: list[str | None],
+) -> tuple[int, list[dict]]:
+    """Rank, enrich and queue each profile's passing items.
+
+    Returns the count queued and the requests that got no usable
+    answer, whose items go back to the queue.
+    """
+    passed: dict[str, list[GitHubItem]] = {}
+    failed = []
+    # A backend that answers short leaves the tail unanswered
+    texts = list(texts) + [None] * (len(layout) - len(texts))
+    for request, text in zip(layout, texts):
+        if text is None:
+            failed.append(request)
+            continue
+        try:
+            profile = profiles.get(request["profile"])
+            items = [decode_github_item(raw) for raw in request["items"]]
+            passed.setdefault(profile.name, []).extend(
+                apply_classification(items, text, profile),
+            )
+        except Exception:
+            logger.error(
+                "Batch answer for %s unusable.", request["profile"],
+                exc_info=True,
+            )
+            failed.append(request)
+
+    queued = 0
+    for name, scored in passed.items():
+        profile = profiles.get(name)
+        top = ranking.rank_github_items(scored)[: profile.github_top_n]
+        enrich_github_items(top, profile)
+        queued += len(outbox.add("github", top, profile.name))
+    return queued, failed
+
+
+def collect() -> int:
+    """Publish the results of every finished job; returns items queued.
+
+    A replica claims a job before fetching its results, so only one
+    replica runs or publishes it, and deletes the job only once it is
+    published. Items of a job that failed as a whole, or of a request
+    with no usable answer, are queued for the next job; outbox claims
+    keep a profile that already passed them from publishing twice.
+    """
+    queued = 0
+    for job_id, raw in r.hgetall(JOBS_KEY).items():
+        claim = f"deferred:collecting:{job_id}"
+        if not r.set(claim, "1", nx=True, ex=COLLECT_CLAIM_SECONDS):
+            continue
+        meta = json.loads(raw)
+        backend = BACKENDS[meta["backend"]]
+        try:
+            texts = backend.results(job_id)
+            if texts is not None:
+                count, failed = _publish(meta["requests"], texts)
+        except BatchFailed as e:
+            logger.error("%s; re-queueing its items.", e)
+            enqueue(_job_items(meta["requests"]))
+            r.hdel(JOBS_KEY, job_id)
+            r.delete(claim)
+            continue
+        except Exception:
+            logger.warning(
+                "Could not collect batch job %s; retrying next cycle.",
+                job_id, exc_info=True,
+            )
+            r.delete(claim)
+            continue
+        if texts is None:
+            r.delete(claim)
+            continue
+
+        if failed:
+            logger.warning(
+                "Batch job %s: %d request(s) without a usable answer; "
+                "re-queueing their items.", job_id, len(failed),
+            )
+            enqueue(_job_items(failed))
+        r.hdel(JOBS_KEY, job_id)
+        r.delete(claim)
+        backend.discard(job_id)
+        logger.info(
+            "Batch job %s finished after %.0f min: queued %d item(s).",
+            job_id, (clock.time() - meta["submitted_at"]) / 60, count,
+        )
+        queued += count
+    return queued
+
+
+def run(interval_minutes: int) -> None:
+    """Collect finished jobs, then submit the queue if it is ready."""
+    collect()
+    submit_ready(interval_minutes)
@@ -0,0 +1,174 @@
+import logging
+import threading
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+
+import redis
+
+from app import clock, discord, profiles
+from app.config import settings
+from app.records import (
+    GitHubItem, XPost, decode_github_item, decode_x_post,
+)
+from app.store import scoped
+
+logger = logging.getLogger(__name__)
+
+r = redis.from_url(settings.redis_url, decode_responses=True)
+
+TIMEZONE = ZoneInfo("America/Argentina/Buenos_Aires")
+# Per source: (post hash prefix, record decoder, section label)
+SOURCES = {
+    "x": ("post", decode_x_post, "X"),
+    "github": ("gh_post", decode_github_item, "GitHub"),
+}
+PRIORITIES = ("high", "medium")
+TLDR_CHARS = 300
+
+# The window job and cleanup's final digest must not post the same items
+_lock = threading.Lock()
+
+
+def is_immediate(source: str, rec: XPost | GitHubItem) -> bool:
+    """Whether *rec* gets its own thread instead of a digest line."""
+    if settings.publish_mode != "digest":
+        return True
+    return (
+        settings.digest_releases_immediate
+        and source == "github"
+        and rec.type == "release"
+        and rec.verdict.priority == "high"
+    )
+
+
+def _pending(profile: str) -> list[tuple[str, str, XPost | GitHubItem]]:
+    """Published items of *profile* with no Discord thread yet.
+
+    Yesterday's keys are read too (until cleanup removes them), so
+    items published after the day's last digest are not skipped.
+    """
+    today = clock.now()
+    days = [
+        (today - timedelta(days=1)).strftime("%Y-%m-%d"),
+        today.strftime("%Y-%m-%d"),
+    ]
+    items = []
+    for day in days:
+        for source, (prefix, decode, _) in SOURCES.items():
+            cursor = 0
+            while True:
+                cursor, keys = r.scan(
+                    cursor, match=scoped(f"{prefix}:{day}:*", profile),
+                    count=500,
+                )
+                if keys:
+                    pipe = r.pipeline()
+                    for key in keys:
+                        pipe.hmget(
+                            key, "published", "discord_thread_id", "record",
+                        )
+                    for key, (published, thread_id, record) in zip(
+                        keys, pipe.execute(),
+                    ):
+                        if published == "1" and not thread_id and record:
+                            items.append((source, key, decode(record)))
+                if cursor == 0:
+                    break
+    return items
+
+
+def _line(source: str, rec: XPost | GitHubItem) -> str:
+    verdict = rec.verdict
+    title = verdict.short_title or "News"
+    tldr = verdict.tldr[:TLDR_CHARS]
+    if source == "x":
+        head, link = f"• **{title}**", rec.link
+    else:
+        emoji = discord.TYPE_EMOJI.get(rec.type, "\U0001f4e6")
+        head, link = f"• {emoji} **{title}** `{rec.repo}`", rec.url
+    text = f"{head} — {tldr}" if tldr else head
+    # Angle brackets keep Discord from embedding every link
+    return f"{text}\n  <{link}>"
+
+
+def format_digest(
+    items: list[tuple[str, XPost | GitHubItem]],
+) -> list[str]:
+    """Digest text with one section per source and priority.
+
+    Split into messages under Discord's MESSAGE_LIMIT, breaking only
+    between lines; a single oversized line is cut.
+    """
+    lines = [f"\U0001f4f0 **News digest** — {len(items)} item(s)"]
+    for source, (_, _, label) in SOURCES.items():
+        for priority in PRIORITIES:
+            section = sorted(
+                (rec for src, rec in items
+                 if src == source and rec.verdict.priority == priority),
+                key=lambda rec: rec.created_at,
+                reverse=True,
+            )
+            if not section:
+                continue
+            badge = discord.PRIORITY_BADGE[priority]
+            lines.append("")
+            lines.append(f"## {label} — {badge}")
+            lines.extend(_line(source, rec) for rec in section)
+
+    limit = discord.MESSAGE_LIMIT
+    messages, current = [], ""
+    for line in lines:
+        line = line[:limit]
+        if current and len(current) + 1 + len(line) > limit:
+            messages.append(current)
+            current = line
+        else:
+            current = f"{current}\n{line}" if current else line
+    if current:
+        messages.append(current)
+    return messages
+
+
+def publish_digest(profile: profiles.Profile) -> int:
+    """Post *profile*'s undigested items as one thread; returns the count."""
+    channel = profile.discord_channel_id
+    if not (channel and discord.is_configured(channel)):
+        return 0
+    pending = _pending(profile.name)
+    if not pending:
+        logger.info("Nothing to digest for %s.", profile.name)
+        return 0
+
+    local = clock.now().astimezone(TIMEZONE)
+    thread_id = discord.post_digest(
+        f"\U0001f4f0 Digest {local:%d/%m %H:%M}",
+        format_digest([(source, rec) for source, _, rec in pending]),
+        channel,
+    )
+    if thread_id is None:
+        logger.warning(
+            "Digest for %s not posted; %d item(s) wait for the next one.",
+            profile.name, len(pending),
+        )
+        return 0
+
+    # Cleanup deletes the thread once, whatever number of items share it
+    pipe = r.pipeline()
+    for _, key, _ in pending:
+        pipe.hset(key, "discord_thread_id", thread_id)
+    pipe.execute()
+    logger.info(
+        "Digested %d item(s) for %s into thread %s.",
+        len(pending), profile.name, thread_id,
+    )
+    return len(pending)
+
+
+def run_digests() -> None:
+    """One digest per profile; the scheduler runs this every window."""
+    with _lock:
+        results = profiles.fan_out(publish_digest)
+    logger.info(
+        "Digest run complete: %d item(s).",
+        sum(n for n in results.values() if n),
+    )
@@ -1,12 +1,14 @@
 import logging
 
-import httpx
-
+from app import http_client
 from app.config import settings
+from app.records import GitHubItem, XPost
 
 logger = logging.getLogger(__name__)
 
 DISCORD_API = "https://discord.com/api/v10"
+# Characters allowed in one message's content
+MESSAGE_LIMIT = 2000
 
 
 def _headers() -> dict:
@@ -16,21 +18,27 @@ def _headers() -> dict:
     }
 
 
-def _tweet_link(tweet_id: str) -> str:
-    return f"https://x.com/i/status/{tweet_id}"
+def is_configured(channel_id: str | None = None) -> bool:
+    channel_id = channel_id or settings.discord_channel_id
+    return bool(settings.discord_bot_token and channel_id)
+
 
+def post_news(post: XPost, channel_id: str | None = None) -> str | None:
+    """Create a forum thread for a news item.
 
-def post_news(post: dict) -> str | None:
-    """Create a forum thread for a news item."""
-    if not settings.discord_bot_token or not settings.discord_channel_id:
+    *channel_id* overrides DISCORD_CHANNEL_ID (per-profile channels).
+    """
+    channel_id = channel_id or settings.discord_channel_id
+    if not settings.discord_bot_token or not channel_id:
         return None
 
-    title = post.get("short_title", "News")[:100]
-    link = _tweet_link(post["id"])
-    tldr = post.get("tldr", "")
-    priority = post.get("priority", "medium")
-    tags = ", ".join(post.get("tags", []))
-    reason = post.get("reason", "")
+    verdict = post.verdict
+    title = (verdict.short_title or "News")[:100]
+    link = post.link
+    tldr = verdict.tldr
+    priority = verdict.priority or "medium"
+    tags = ", ".join(verdict.tags)
+    reason = verdict.reason
 
     lines = [f"**{title}**", ""]
     if tldr:
@@ -49,8 +57,8 @@ def post_news(post: dict) -> str | None:
 
     # Create forum thread in the news channel
     try:
-        resp = httpx.post(
-            f"{DISCORD_API}/channels/{settings.discord_channel_id}/threads",
+        resp = http_client.post(
+            f"{DISCORD_API}/channels/{channel_id}/threads",
             headers=_headers(),
             json={"name": title, "message": {"content": content}},
             timeout=15,
@@ -100,21 +108,25 @@ def _format_tags(tags: list[str]) -> str:
     return "  ".join(parts)
 
 
-def post_github_news(post: dict) -> str | None:
+def post_github_news(
+    post: GitHubItem, channel_id: str | None = None,
+) -> str | None:
     """Create a rich forum thread for a GitHub update."""
-    if not settings.discord_bot_token or not settings.discord_channel_id:
+    channel_id = channel_id or settings.discord_channel_id
+    if not settings.discord_bot_token or not channel_id:
         return None
 
-    item_type = post.get("type", "issue")
+    verdict = post.verdict
+    item_type = post.type or "issue"
     emoji = TYPE_EMOJI.get(item_type, "\U0001f4e6")
-    repo = post.get("repo", "")
-    raw_title = post.get("short_title", "News")
-    priority = post.get("priority", "medium")
-    tldr = post.get("tldr", "")
-    reason = post.get("reason", "")
-    tags = post.get("tags", [])
-    tips = post.get("tips", "")
-    url = post.get("url", "")
+    repo = post.repo
+    raw_title = verdict.short_title or "News"
+    priority = verdict.priority or "medium"
+    tldr = verdict.tldr
+    reason = verdict.reason
+    tags = verdict.tags
+    tips = verdict.tips
+    url = post.url
     badge = PRIORITY_BADGE.get(priority, priority)
 
     thread_name = (
@@ -156,10 +168,10 @@ def post_github_news(post: dict) -> str | None:
     content = "\n".join(lines)
 
     try:
-        resp = httpx.post(
+        resp = http_client.post(
             (
                 f"{DISCORD_API}/channels"
-                f"/{settings.discord_channel_id}/threads"
+                f"/{channel_id}/threads"
             ),
             headers=_headers(),
             json={
@@ -183,12 +195,59 @@ def post_github_news(post: dict) -> str | None:
         return None
 
 
+def post_digest(
+    name: str, messages: list[str], channel_id: str | None = None,
+) -> str | None:
+    """Create one forum thread holding a digest, split over *messages*.
+
+    The first message opens the thread; the rest are posted in order.
+    Returns the thread ID once the thread exists, even if a later
+    message failed, so the items are not digested a second time.
+    """
+    channel_id = channel_id or settings.discord_channel_id
+    if not settings.discord_bot_token or not channel_id or not messages:
+        return None
+
+    try:
+        resp = http_client.post(
+            f"{DISCORD_API}/channels/{channel_id}/threads",
+            headers=_headers(),
+            json={"name": name[:100], "message": {"content": messages[0]}},
+            timeout=15,
+        )
+        resp.raise_for_status()
+        thread_id = resp.json()["id"]
+    except Exception:
+        logger.error("Failed to create digest thread.", exc_info=True)
+        return None
+
+    for part, content in enumerate(messages[1:], start=2):
+        try:
+            resp = http_client.post(
+                f"{DISCORD_API}/channels/{thread_id}/messages",
+                headers=_headers(),
+                json={"content": content},
+                timeout=15,
+            )
+            resp.raise_for_status()
+        except Exception:
+            logger.error(
+                "Failed to post part %d of digest thread %s.",
+                part, thread_id, exc_info=True,
+            )
+    logger.info(
+        "Created digest thread %s (%d message(s)): %s",
+        thread_id, len(messages), name,
+    )
+    return thread_id
+
+
 def delete_thread(thread_id: str) -> None:
     """Delete a Discord thread/channel by ID."""
     if not settings.discord_bot_token or not thread_id:
         return
     try:
-        resp = httpx.delete(
+        resp = http_client.delete(
             f"{DISCORD_API}/channels/{thread_id}",
             headers=_headers(),
             timeout=15,
@@ -1,119 +1,348 @@
 import logging
-from datetime import datetime, timedelta, timezone
-
-import httpx
+import threading
+from collections import Counter, deque
+from datetime import timedelta
+from typing import Callable
 
+from app import (
+    clock, http_client, live_config, ratelimit, store, workqueue,
+)
 from app.config import settings
+from app.records import SearchPage, XPost, decode_search, decode_x_post
 
 logger = logging.getLogger(__name__)
 
-SEARCH_URL = "https://api.x.com/2/tweets/search/recent"
+SEARCH_URL = f"{settings.x_api_base}/2/tweets/search/recent"
+SEARCH_ENDPOINT = "search_recent"
+FETCH_QUEUE = "x_fetch"
 MAX_QUERY_LEN = 512
+QUERY_SUFFIX = " -is:retweet"
 
+# Post fields every X request asks for (see records.XPost)
+POST_FIELDS = {
+    "tweet.fields": "created_at,public_metrics,author_id",
+    "expansions": "author_id",
+    "user.fields": "username",
+}
 
-def _build_account_queries() -> list[str]:
-    """Split X_ACCOUNTS into batched queries under 512 chars."""
-    raw = settings.x_accounts
+# Expected posts per cycle for accounts with no history yet.
+DEFAULT_ACTIVITY = 1.0
+# Fraction of max_results a batch may be expected to fill, leaving
+# room for bursts before the response saturates.
+SATURATION_HEADROOM = 0.5
+# Activity drifts slowly, so a packed plan is reused between cycles for
+# this long, or until the account list changes
+PLAN_MAX_AGE_SECONDS = 3600
+
+_plan: dict = {}
+_plan_lock = threading.Lock()
+
+
+@live_config.per_generation
+def _parse_accounts() -> list[str]:
+    raw = live_config.current().x_accounts
     if not raw:
         return []
+    return [a.strip() for a in raw.split(",") if a.strip()]
 
-    accounts = [a.strip() for a in raw.split(",") if a.strip()]
-    if not accounts:
-        return []
 
-    suffix = " -is:retweet"
-    # 2 for parens, len(suffix), small buffer
-    budget = MAX_QUERY_LEN - len(suffix) - 2
-
-    queries: list[str] = []
-    batch: list[str] = []
-    length = 0
-
-    for acct in accounts:
-        part = f"from:{acct}"
-        sep = len(" OR ") if batch else 0
-        needed = len(part) + sep
-
-        if length + needed > budget and batch:
-            q = (
-                "("
-                + " OR ".join(f"from:{a}" for a in batch)
-                + ")"
-                + suffix
-            )
-            queries.append(q)
-            batch = [acct]
-            length = len(part)
+def _query_for(batch: list[str]) -> str:
+    return (
+        "("
+        + " OR ".join(f"from:{a}" for a in batch)
+        + ")"
+        + QUERY_SUFFIX
+    )
+
+
+def _pack_accounts(
+    accounts: list[str], activity: dict[str, float],
+) -> list[list[str]]:
+    """Pack accounts into batches by query length and expected volume.
+
+    First-fit decreasing on historical posts per cycle, so prolific
+    accounts end up alone or with quiet ones instead of crowding each
+    other out of a single ``max_results`` page.
+    """
+    # 2 for parens, len(suffix)
+    budget = MAX_QUERY_LEN - len(QUERY_SUFFIX) - 2
+    capacity = settings.max_results * SATURATION_HEADROOM
+
+    def weight(acct: str) -> float:
+        return activity.get(acct.lower(), DEFAULT_ACTIVITY)
+
+    ordered = sorted(accounts, key=weight, reverse=True)
+
+    batches: list[list[str]] = []
+    lengths: list[int] = []
+    loads: list[float] = []
+
+    for acct in ordered:
+        part = len(f"from:{acct}")
+        w = weight(acct)
+        for i, batch in enumerate(batches):
+            needed = part + len(" OR ")
+            if (
+                lengths[i] + needed <= budget
+                and loads[i] + w <= capacity
+            ):
+                batch.append(acct)
+                lengths[i] += needed
+                loads[i] += w
+                break
         else:
-            batch.append(acct)
-            length += needed
-
-    if batch:
-        q = (
-            "("
-            + " OR ".join(f"from:{a}" for a in batch)
-            + ")"
-            + suffix
+            batches.append([acct])
+            lengths.append(part)
+            loads.append(w)
+
+    return batches
+
+
+def _account_batches() -> list[list[str]]:
+    """Packed account batches, from the cached plan when still fresh."""
+    accounts = _parse_accounts()
+    if not accounts:
+        return []
+    generation = live_config.generation()
+    now = clock.time()
+    with _plan_lock:
+        fresh = (
+            _plan.get("generation") == generation
+            and now - _plan["built_at"] < PLAN_MAX_AGE_SECONDS
         )
-        queries.append(q)
+        if not fresh:
+            _plan.update(
+                generation=generation,
+                built_at=now,
+                batches=_pack_accounts(
+                    accounts, store.get_account_activity(accounts),
+                ),
+            )
+            logger.info(
+                "Packed %d X account(s) into %d query batch(es).",
+                len(accounts), len(_plan["batches"]),
+            )
+        return [list(batch) for batch in _plan["batches"]]
 
-    return queries
 
+def _build_account_queries() -> list[str]:
+    """Split X_ACCOUNTS into activity-weighted queries under 512 chars."""
+    return [_query_for(batch) for batch in _account_batches()]
 
-def fetch_recent_posts() -> list[dict]:
-    """Fetch recent posts from X.
 
-    If X_ACCOUNTS is set, fetches from those accounts in batched
-    queries. Otherwise falls back to X_SEARCH_QUERY keyword search.
-    """
-    now = datetime.now(timezone.utc)
+def _search(
+    params: dict, headers: dict, next_token: str | None = None,
+) -> SearchPage:
+    if next_token:
+        params = {**params, "next_token": next_token}
+    resp = http_client.get(
+        SEARCH_URL, params=params,
+        headers=headers, timeout=30,
+    )
+    ratelimit.record("x", SEARCH_ENDPOINT, resp)
+    resp.raise_for_status()
+    return decode_search(resp.content)
+
+
+def _window() -> tuple[str, str] | None:
+    now = clock.now()
     start_time = now - timedelta(minutes=settings.max_age_minutes)
     end_time = now - timedelta(minutes=settings.min_age_minutes)
-
     if end_time <= start_time:
         logger.info("No valid time window — min_age >= max_age.")
-        return []
+        return None
+    return (
+        start_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        end_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+    )
+
+
+def _plan_batches() -> tuple[list[list[str] | None], int | None]:
+    """Account batches this cycle can afford, and the request budget.
+
+    ``[None]`` stands for the X_SEARCH_QUERY keyword search.
+    """
+    batches = _account_batches()
+    allowance = ratelimit.budget("x", SEARCH_ENDPOINT)
+    if allowance is not None and len(batches) > allowance:
+        logger.warning(
+            "X budget short: querying %d of %d account batches.",
+            allowance, len(batches),
+        )
+        batches = ratelimit.rotate("x:batches", batches, allowance)
+    if allowance == 0:
+        logger.warning("X search budget exhausted, skipping fetch.")
+        return [], allowance
+    return batches or [None], allowance
+
 
-    account_queries = _build_account_queries()
-    queries = account_queries or [settings.x_search_query]
+def _fetch_batch(
+    batch: list[str] | None,
+    window: tuple[str, str],
+    spend: Callable[[], bool],
+    stats: Counter,
+) -> list[XPost]:
+    """Query one account batch (or the keyword search).
 
+    A saturated batch (one with a ``next_token``) is split in half and
+    re-queried; a saturated single-account or keyword query, which
+    cannot be split, is paged through up to X_MAX_PAGES. *spend* is
+    asked before every request.
+    """
     headers = {
         "Authorization": f"Bearer {settings.x_bearer_token}",
     }
     base_params = {
-        "start_time": start_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
-        "end_time": end_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "start_time": window[0],
+        "end_time": window[1],
         "max_results": settings.max_results,
-        "tweet.fields": "created_at,public_metrics,author_id",
+        **POST_FIELDS,
         "sort_order": "relevancy",
     }
 
-    all_posts: list[dict] = []
-    for query in queries:
-        params = {**base_params, "query": query}
-        resp = httpx.get(
-            SEARCH_URL, params=params,
-            headers=headers, timeout=30,
+    work: deque[list[str] | None] = deque([batch])
+    all_posts: list[XPost] = []
+    while work and spend():
+        batch = work.popleft()
+        query = (
+            _query_for(batch) if batch
+            else live_config.current().x_search_query
         )
-        resp.raise_for_status()
-        posts = resp.json().get("data", [])
+        params = {**base_params, "query": query}
+        stats["queries"] += 1
+
+        page = _search(params, headers)
+        posts = page.posts
+        next_token = page.next_token
+        saturated = bool(next_token)
+        pages = 1
+
+        if saturated and batch and len(batch) > 1:
+            mid = len(batch) // 2
+            work.extend([batch[:mid], batch[mid:]])
+            stats["splits"] += 1
+        elif saturated:
+            while (
+                next_token
+                and pages < settings.x_max_pages
+                and spend()
+            ):
+                page = _search(params, headers, next_token)
+                posts.extend(page.posts)
+                next_token = page.next_token
+                pages += 1
+
         all_posts.extend(posts)
+        if saturated:
+            stats["saturated"] += 1
+
         logger.info(
-            "Fetched %d posts from X API (query %d/%d).",
+            "Query %d: %s account(s), %d post(s), %d page(s)%s.",
+            stats["queries"],
+            len(batch) if batch else "keyword",
             len(posts),
-            queries.index(query) + 1,
-            len(queries),
+            pages,
+            (
+                " — saturated, split"
+                if saturated and batch and len(batch) > 1
+                else " — saturated, truncated" if next_token
+                else " — saturated, paged" if saturated
+                else ""
+            ),
+        )
+
+    if work:
+        logger.warning(
+            "X budget ran out with %d split batch(es) unqueried.",
+            len(work),
         )
+    return all_posts
+
 
+def _finish(
+    batches: list[list[str] | None], all_posts: list[XPost], stats: Counter,
+) -> list[XPost]:
+    """Dedup across batches and update per-account activity."""
     # Deduplicate by tweet ID across batches
     seen: set[str] = set()
-    unique: list[dict] = []
+    unique: list[XPost] = []
     for p in all_posts:
-        if p["id"] not in seen:
-            seen.add(p["id"])
+        if p.id not in seen:
+            seen.add(p.id)
             unique.append(p)
 
-    logger.info(
-        "Total unique posts fetched: %d.", len(unique),
-    )
+    accounts = [a for batch in batches if batch for a in batch]
+    if accounts:
+        counts = Counter(p.username.lower() for p in unique)
+        store.record_account_activity(accounts, counts)
+
+    if stats:
+        logger.info(
+            "Total unique posts fetched: %d "
+            "(%d queries, %d saturated, %d split).",
+            len(unique), stats["queries"], stats["saturated"],
+            stats["splits"],
+        )
+    else:
+        logger.info(
+            "Total unique posts fetched: %d (%d batch(es) via workers).",
+            len(unique), len(batches),
+        )
     return unique
+
+
+def fetch_unit(unit: dict) -> list[XPost]:
+    """Work-queue entry point: one batch, budgeted against the ledger.
+
+    Each request reserves its call in the shared ledger first, so
+    concurrent workers never spend the same budget twice.
+    """
+    return _fetch_batch(
+        unit["batch"], tuple(unit["window"]),
+        lambda: ratelimit.take("x", SEARCH_ENDPOINT), Counter(),
+    )
+
+
+workqueue.register(FETCH_QUEUE, fetch_unit)
+
+
+def fetch_recent_posts() -> list[XPost]:
+    """Fetch recent posts from X.
+
+    If X_ACCOUNTS is set, fetches from those accounts in batched
+    queries. Otherwise falls back to X_SEARCH_QUERY keyword search.
+    Requests stay within the rate-limit budget from the ledger;
+    batches that do not fit rotate to later cycles. With DISTRIBUTED,
+    batches are spread over all replicas through the work queue.
+    """
+    window = _window()
+    if window is None:
+        return []
+    batches, allowance = _plan_batches()
+    if not batches:
+        return []
+
+    stats: Counter = Counter()
+    if settings.distributed:
+        all_posts = workqueue.run(
+            FETCH_QUEUE,
+            [{"batch": batch, "window": window} for batch in batches],
+            decode_x_post,
+            settings.cycle_budget_seconds / 2,
+        )
+        # Per-query counts are logged by the workers
+        return _finish(batches, all_posts, stats)
+
+    requests = 0
+
+    def spend() -> bool:
+        nonlocal requests
+        if allowance is not None and requests >= allowance:
+            return False
+        requests += 1
+        return True
+
+    all_posts: list[XPost] = []
+    for batch in batches:
+        all_posts.extend(_fetch_batch(batch, window, spend, stats))
+    return _finish(batches, all_posts, stats)
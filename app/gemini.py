@@ -0,0 +1,344 @@
+import hashlib
+import logging
+import random
+import time
+from datetime import datetime, timezone
+
+import redis
+from google import genai
+
+from app import recorder
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_client = None
+
+r = redis.from_url(settings.redis_url, decode_responses=True)
+
+# Refresh a cache's TTL once less than this many seconds remain.
+CACHE_REFRESH_MARGIN = 600
+USAGE_TTL_SECONDS = 7 * 24 * 3600
+
+# Request priorities, most urgent first.
+PRIORITY_RELEASE = 0
+PRIORITY_HIGH = 1
+PRIORITY_NORMAL = 2
+
+# Share of each bucket a priority must leave untouched, and how long it
+# may wait for budget before giving up.
+PRIORITY_RESERVE = {
+    PRIORITY_RELEASE: 0.0,
+    PRIORITY_HIGH: 0.1,
+    PRIORITY_NORMAL: 0.25,
+}
+PRIORITY_MAX_WAIT = {
+    PRIORITY_RELEASE: 90,
+    PRIORITY_HIGH: 45,
+    PRIORITY_NORMAL: 20,
+}
+
+# Rough output allowance per call when reserving tokens up front.
+OUTPUT_TOKEN_ESTIMATE = 1024
+QUOTA_STATUS_CODES = (429, 503)
+
+RPM_KEY = "gemini_budget:rpm"
+TPM_KEY = "gemini_budget:tpm"
+
+# Atomically refill and debit both buckets. Returns {granted, wait_ms}.
+_TAKE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local granted = 1
+local wait = 0
+local state = {}
+for i = 1, 2 do
+    local capacity = tonumber(ARGV[i * 3 - 1])
+    local cost = tonumber(ARGV[i * 3])
+    local reserve = tonumber(ARGV[i * 3 + 1])
+    local rate = capacity / 60000
+    local data = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(data[1]) or capacity
+    local ts = tonumber(data[2]) or now
+    tokens = math.min(capacity, tokens + (now - ts) * rate)
+    state[i] = tokens
+    if tokens - cost < reserve then
+        granted = 0
+        wait = math.max(wait, math.ceil((cost + reserve - tokens) / rate))
+    end
+end
+for i = 1, 2 do
+    local tokens = state[i]
+    if granted == 1 then
+        tokens = tokens - tonumber(ARGV[i * 3])
+    end
+    redis.call('HSET', KEYS[i], 'tokens', tostring(tokens), 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], 120000)
+end
+return {granted, wait}
+"""
+
+# Credit back (or charge) a live TPM bucket; an expired one is left
+# alone, since the take script already refills it to capacity.
+_SETTLE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HINCRBYFLOAT', KEYS[1], 'tokens', ARGV[1])
+redis.call('PEXPIRE', KEYS[1], 120000)
+return 1
+"""
+
+
+def get_client():
+    """The shared Gemini client, created on first use.
+
+    Tests swap in a stub by setting ``_client``.
+    """
+    global _client
+    if _client is None:
+        _client = genai.Client(api_key=settings.gemini_api_key)
+    return _client
+
+
+class BudgetExceeded(Exception):
+    """Raised when the shared Gemini budget stays exhausted too long."""
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+def _prompt_hash(system_instruction: str) -> str:
+    payload = f"{settings.gemini_model}\n{system_instruction}"
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def _forget_cache(name: str) -> None:
+    r.delete(f"gemini_cache:{name}")
+
+
+def _cached_content(name: str, system_instruction: str) -> str | None:
+    """Return a cached-content handle for the system instruction.
+
+    The handle is shared through Redis so every run reuses it until the
+    prompt (or model) changes. Returns None when caching is disabled or
+    the prompt cannot be cached, in which case callers send it inline.
+    """
+    ttl = settings.gemini_cache_ttl_seconds
+    if ttl <= 0:
+        return None
+
+    key = f"gemini_cache:{name}"
+    digest = _prompt_hash(system_instruction)
+    entry = r.hgetall(key)
+    now = time.time()
+
+    if entry and entry.get("hash") == digest:
+        handle = entry.get("name", "")
+        expires_at = float(entry.get("expires_at", 0))
+        if not handle and expires_at > now:
+            # Recently rejected (e.g. below the minimum cacheable size)
+            return None
+        if handle and expires_at - now > CACHE_REFRESH_MARGIN:
+            return handle
+        if handle and expires_at > now:
+            try:
+                get_client().caches.update(
+                    name=handle, config={"ttl": f"{ttl}s"},
+                )
+                r.hset(key, "expires_at", now + ttl)
+                r.expire(key, ttl)
+                logger.info("Refreshed Gemini cache %s (%s).", name, handle)
+                return handle
+            except Exception:
+                logger.warning(
+                    "Failed to refresh Gemini cache %s, recreating.",
+                    name, exc_info=True,
+                )
+    elif entry.get("name"):
+        # Prompt text or model changed: drop the stale cache
+        try:
+            get_client().caches.delete(name=entry["name"])
+            logger.info("Invalidated Gemini cache %s.", name)
+        except Exception:
+            logger.warning(
+                "Failed to delete stale Gemini cache %s.",
+                name, exc_info=True,
+            )
+
+    try:
+        cache = get_client().caches.create(
+            model=settings.gemini_model,
+            config={
+                "system_instruction": system_instruction,
+                "display_name": f"botman-{name}-{digest}",
+                "ttl": f"{ttl}s",
+            },
+        )
+        handle = cache.name
+    except Exception:
+        logger.warning(
+            "Could not cache system instruction %s; sending inline.",
+            name, exc_info=True,
+        )
+        handle = ""
+
+    r.hset(key, mapping={
+        "name": handle,
+        "hash": digest,
+        "expires_at": now + ttl,
+    })
+    r.expire(key, ttl)
+    if handle:
+        logger.info("Created Gemini cache %s (%s).", name, handle)
+    return handle or None
+
+
+def _acquire(tokens: int, priority: int) -> None:
+    """Block until the shared RPM/TPM buckets grant one request.
+
+    Buckets live in Redis so every process and replica draws from the
+    same quota. Lower priorities must leave a reserve for higher ones
+    and give up sooner.
+    """
+    rpm = settings.gemini_rpm
+    tpm = settings.gemini_tpm
+    if rpm <= 0 and tpm <= 0:
+        return
+
+    # A disabled bucket gets a capacity no request can drain
+    rpm_capacity = rpm if rpm > 0 else 1 << 30
+    tpm_capacity = tpm if tpm > 0 else 1 << 30
+    # Never reserve more than a single request can ever fit under
+    tokens = min(tokens, tpm_capacity)
+    reserve = PRIORITY_RESERVE.get(priority, 0.25)
+    deadline = time.monotonic() + PRIORITY_MAX_WAIT.get(priority, 20)
+
+    while True:
+        granted, wait_ms = r.eval(
+            _TAKE_SCRIPT, 2, RPM_KEY, TPM_KEY,
+            int(time.time() * 1000),
+            rpm_capacity, 1, rpm_capacity * reserve,
+            tpm_capacity, tokens, tpm_capacity * reserve,
+        )
+        if granted:
+            return
+        wait = int(wait_ms) / 1000
+        if time.monotonic() + wait > deadline:
+            raise BudgetExceeded(
+                f"Gemini budget exhausted (priority {priority}, "
+                f"needs {wait:.1f}s)"
+            )
+        logger.info(
+            "Gemini budget: waiting %.1fs (priority %d).", wait, priority,
+        )
+        time.sleep(wait)
+
+
+def _settle(estimate: int, usage: dict) -> None:
+    """Charge the TPM bucket for the difference from the estimate."""
+    if settings.gemini_tpm <= 0:
+        return
+    actual = usage["prompt"] + usage["output"]
+    if actual != estimate:
+        r.eval(_SETTLE_SCRIPT, 1, TPM_KEY, estimate - actual)
+
+
+def _call(contents: str, config: dict, estimate: int, priority: int):
+    """Call Gemini under the shared budget, backing off on quota errors."""
+    attempt = 0
+    while True:
+        _acquire(estimate, priority)
+        try:
+            return get_client().models.generate_content(
+                model=settings.gemini_model,
+                contents=contents,
+                config=config,
+            )
+        except Exception as e:
+            code = getattr(e, "code", None)
+            if code not in QUOTA_STATUS_CODES:
+                raise
+            if attempt >= settings.gemini_max_retries:
+                raise
+            delay = min(60, 2 ** attempt * 2) * (0.5 + random.random())
+            attempt += 1
+            logger.warning(
+                "Gemini quota response %s, retry %d/%d in %.1fs.",
+                code, attempt, settings.gemini_max_retries, delay,
+            )
+            time.sleep(delay)
+
+
+def record_usage(name: str, response) -> dict:
+    """Record prompt/cached/output token counts for one call."""
+    meta = getattr(response, "usage_metadata", None)
+    usage = {
+        "prompt": getattr(meta, "prompt_token_count", None) or 0,
+        "cached": getattr(meta, "cached_content_token_count", None) or 0,
+        "output": getattr(meta, "candidates_token_count", None) or 0,
+    }
+
+    key = f"gemini_usage:{_today()}"
+    pipe = r.pipeline()
+    pipe.hincrby(key, f"{name}:calls", 1)
+    for field, count in usage.items():
+        pipe.hincrby(key, f"{name}:{field}", count)
+    pipe.expire(key, USAGE_TTL_SECONDS)
+    pipe.execute()
+
+    logger.info(
+        "Gemini %s usage: prompt=%d cached=%d output=%d.",
+        name, usage["prompt"], usage["cached"], usage["output"],
+    )
+    return usage
+
+
+def generate_json(
+    name: str,
+    system_instruction: str,
+    contents: str,
+    priority: int = PRIORITY_NORMAL,
+    response_schema: dict | None = None,
+) -> str:
+    """Run a JSON-mode generation, reusing a cached system instruction.
+
+    *response_schema* constrains the output to that shape (OpenAPI
+    subset), overriding any format the system instruction describes.
+    """
+    player = recorder.player()
+    if player is not None:
+        return player.answer(name, contents)
+
+    handle = _cached_content(name, system_instruction)
+    config = {"response_mime_type": "application/json"}
+    if response_schema:
+        config["response_schema"] = response_schema
+    if handle:
+        config["cached_content"] = handle
+    else:
+        config["system_instruction"] = system_instruction
+
+    estimate = (
+        (len(system_instruction) + len(contents)) // 4
+        + OUTPUT_TOKEN_ESTIMATE
+    )
+
+    try:
+        response = _call(contents, config, estimate, priority)
+    except Exception as e:
+        if not handle or getattr(e, "code", None) not in (400, 403, 404):
+            raise
+        # The cache was evicted or expired server-side; retry inline
+        logger.warning(
+            "Gemini call with cache %s failed, retrying inline.",
+            name, exc_info=True,
+        )
+        _forget_cache(name)
+        config.pop("cached_content")
+        config["system_instruction"] = system_instruction
+        response = _call(contents, config, estimate, priority)
+
+    _settle(estimate, record_usage(name, response))
+    recorder.gemini(name, contents, response.text)
+    return response.text
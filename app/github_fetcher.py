@@ -1,13 +1,24 @@
+import json
 import logging
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timedelta
 
 import httpx
 
+from app import (
+    clock, http_client, live_config, ratelimit, store, workqueue,
+)
 from app.config import settings
+from app.records import (
+    GH_BODY_LIMIT,
+    RELEASE_BODY_LIMIT,
+    GitHubItem,
+    decode_github_item,
+)
 
 logger = logging.getLogger(__name__)
 
 GH_API = "https://api.github.com"
+FETCH_QUEUE = "gh_fetch"
 
 
 def _headers() -> dict:
@@ -17,10 +28,31 @@ def _headers() -> dict:
     return h
 
 
+def _get(url: str, params: dict) -> httpx.Response:
+    resp = http_client.get(
+        url, params=params, headers=_headers(), timeout=30,
+    )
+    ratelimit.record("github", "core", resp)
+    resp.raise_for_status()
+    return resp
+
+
+def cycle_minutes() -> int:
+    """Minutes between scheduled GitHub cycles.
+
+    With webhooks configured (GITHUB_WEBHOOK_SECRET) polling is a
+    low-frequency reconciliation sweep for missed deliveries.
+    """
+    if settings.github_webhook_secret:
+        return settings.github_reconcile_interval_minutes
+    return settings.github_check_interval_minutes
+
+
+@live_config.per_generation
 def _parse_repos() -> list[str]:
     return [
         repo.strip()
-        for repo in settings.github_repos.split(",")
+        for repo in live_config.current().github_repos.split(",")
         if repo.strip()
     ]
 
@@ -30,157 +62,594 @@ def _normalize(
     item_type: str,
     number: int,
     raw: dict,
-) -> dict:
+) -> GitHubItem:
     body = raw.get("body") or ""
-    return {
-        "id": f"gh:{repo}:{item_type}:{raw['id']}",
-        "repo": repo,
-        "type": item_type,
-        "number": number,
-        "title": raw.get("title") or raw.get("name", ""),
-        "body": body[:2000],
-        "url": raw.get("html_url", ""),
-        "author": (raw.get("author") or raw.get("user") or {})
+    limit = RELEASE_BODY_LIMIT if item_type == "release" else GH_BODY_LIMIT
+    return GitHubItem(
+        id=f"gh:{repo}:{item_type}:{raw['id']}",
+        repo=repo,
+        type=item_type,
+        number=number,
+        title=raw.get("title") or raw.get("name", ""),
+        body=body[:limit],
+        url=raw.get("html_url", ""),
+        author=(raw.get("author") or raw.get("user") or {})
         .get("login", ""),
-        "created_at": raw.get("created_at", ""),
-        "labels": [
+        created_at=raw.get("created_at", ""),
+        labels=[
             lb["name"]
             for lb in raw.get("labels", [])
             if isinstance(lb, dict)
         ],
-        "reactions_count": raw.get("reactions", {})
+        reactions_count=raw.get("reactions", {})
         .get("total_count", 0),
-        "comments_count": raw.get("comments", 0),
-    }
+        comments_count=raw.get("comments", 0),
+    )
 
 
-def fetch_releases(
-    repo: str, since: datetime,
-) -> list[dict]:
-    url = f"{GH_API}/repos/{repo}/releases"
-    resp = httpx.get(
-        url,
-        params={"per_page": 10},
-        headers=_headers(),
-        timeout=30,
-    )
-    resp.raise_for_status()
+def _parse_ts(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _iso(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
 
+def _newest(values: list[str | None]) -> str | None:
+    present = [v for v in values if v]
+    return max(present, key=_parse_ts) if present else None
+
+
+def _releases_since(
+    repo: str, raw: list[dict], since: datetime,
+) -> list[GitHubItem]:
     items = []
-    for release in resp.json():
+    for release in raw:
         pub = release.get("published_at")
         if not pub:
             continue
-        pub_dt = datetime.fromisoformat(
-            pub.replace("Z", "+00:00")
-        )
-        if pub_dt > since:
+        if _parse_ts(pub) > since:
             items.append(_normalize(repo, "release", 0, release))
     return items
 
 
-def fetch_merged_prs(
-    repo: str, since: datetime,
-) -> list[dict]:
-    url = f"{GH_API}/repos/{repo}/pulls"
-    resp = httpx.get(
-        url,
-        params={
-            "state": "closed",
-            "sort": "updated",
-            "direction": "desc",
-            "per_page": 30,
-        },
-        headers=_headers(),
-        timeout=30,
-    )
-    resp.raise_for_status()
-
+def _merged_prs_since(
+    repo: str, raw: list[dict], since: datetime,
+) -> list[GitHubItem]:
     items = []
-    for pr in resp.json():
+    for pr in raw:
         merged = pr.get("merged_at")
         if not merged:
             continue
-        merged_dt = datetime.fromisoformat(
-            merged.replace("Z", "+00:00")
-        )
-        if merged_dt > since:
+        if _parse_ts(merged) > since:
             items.append(
                 _normalize(repo, "pr", pr.get("number", 0), pr)
             )
     return items
 
 
+def _issues_since(
+    repo: str, raw: list[dict], since: datetime,
+) -> list[GitHubItem]:
+    items = []
+    for issue in raw:
+        if "pull_request" in issue:
+            continue
+        updated = issue.get("updated_at")
+        if updated and _parse_ts(updated) <= since:
+            continue
+        items.append(
+            _normalize(
+                repo, "issue", issue.get("number", 0), issue,
+            )
+        )
+    return items
+
+
+class _Pages:
+    """Result pages from *start* until a short page or GITHUB_MAX_PAGES.
+
+    ``next_page`` is set when the cap cut the listing short, i.e. the
+    caller read every capped page without reaching its watermark. It
+    re-reads the last page, since items updated meanwhile shift the
+    listing up.
+    """
+
+    def __init__(self, url: str, params: dict, start: int = 1):
+        self.url = url
+        self.params = params
+        self.start = start
+        self.next_page: int | None = None
+
+    def __iter__(self):
+        per_page = self.params["per_page"]
+        end = self.start + settings.github_max_pages
+        for page in range(self.start, end):
+            batch = _get(self.url, {**self.params, "page": page}).json()
+            yield batch
+            if len(batch) < per_page:
+                return
+        self.next_page = max(end - 1, self.start + 1)
+
+
+def fetch_releases(
+    repo: str, since: datetime, start: int = 1,
+) -> tuple[list[GitHubItem], str | None, int | None]:
+    """Releases published after *since*, new watermark and resume page."""
+    pages = _Pages(f"{GH_API}/repos/{repo}/releases", {"per_page": 30}, start)
+    items: list[GitHubItem] = []
+    newest = None
+    for page in pages:
+        items.extend(_releases_since(repo, page, since))
+        newest = _newest(
+            [newest] + [r.get("published_at") for r in page],
+        )
+        # Listed newest-created first; a release created before the
+        # watermark cannot have been published after it (drafts aside)
+        if page and _parse_ts(page[-1]["created_at"]) <= since:
+            break
+    return items, newest, pages.next_page
+
+
+def fetch_merged_prs(
+    repo: str, since: datetime, start: int = 1,
+) -> tuple[list[GitHubItem], str | None, int | None]:
+    """PRs merged after *since*, the new watermark and resume page.
+
+    Pages through closed PRs by ``updated`` desc and stops at the
+    first page that reaches back past the watermark: a merge always
+    bumps ``updated_at``, so nothing older can be a new merge.
+    """
+    pages = _Pages(f"{GH_API}/repos/{repo}/pulls", {
+        "state": "closed",
+        "sort": "updated",
+        "direction": "desc",
+        "per_page": 100,
+    }, start)
+    items: list[GitHubItem] = []
+    newest = None
+    for page in pages:
+        items.extend(_merged_prs_since(repo, page, since))
+        newest = _newest(
+            [newest] + [
+                pr.get("merged_at") for pr in page
+                if pr.get("merged_at")
+                and _parse_ts(pr["merged_at"]) > since
+            ],
+        )
+        if page and _parse_ts(page[-1]["updated_at"]) <= since:
+            break
+    return items, newest, pages.next_page
+
+
 def fetch_notable_issues(
-    repo: str, since: datetime,
-) -> list[dict]:
-    url = f"{GH_API}/repos/{repo}/issues"
-    resp = httpx.get(
-        url,
-        params={
-            "sort": "updated",
-            "direction": "desc",
-            "since": since.isoformat(),
-            "per_page": 30,
+    repo: str, since: datetime, start: int = 1,
+) -> tuple[list[GitHubItem], str | None, int | None]:
+    """Issues updated after *since*, the new watermark and resume page."""
+    pages = _Pages(f"{GH_API}/repos/{repo}/issues", {
+        "sort": "updated",
+        "direction": "desc",
+        "since": since.isoformat(),
+        "per_page": 100,
+    }, start)
+    items: list[GitHubItem] = []
+    newest = None
+    for page in pages:
+        items.extend(_issues_since(repo, page, since))
+        newest = _newest([newest] + [i.get("updated_at") for i in page])
+    return items, newest, pages.next_page
+
+
+# --------------- GraphQL batch mode ---------------
+
+GRAPHQL_PAGE = 30
+
+# Only the fields _normalize and the watermark filters read.
+_ITEM_FIELDS = """
+        databaseId number title body url createdAt updatedAt
+        author { login }
+        labels(first: 20) { nodes { name } }
+        reactions { totalCount }
+        comments { totalCount }
+"""
+
+_REPO_FRAGMENT = """
+  %(alias)s: repository(owner: %(owner)s, name: %(name)s) {
+    releases(first: %(page)d, orderBy: {field: CREATED_AT, direction: DESC}) {
+      nodes {
+        databaseId name tagName description url createdAt publishedAt
+        author { login }
+      }
+    }
+    pullRequests(
+      states: MERGED, first: %(page)d,
+      orderBy: {field: UPDATED_AT, direction: DESC}
+    ) {
+      nodes { %(fields)s mergedAt }
+    }
+    issues(
+      first: %(page)d, filterBy: {since: %(issues_since)s},
+      orderBy: {field: UPDATED_AT, direction: DESC}
+    ) {
+      nodes { %(fields)s }
+    }
+  }
+"""
+
+
+def _graphql_query(
+    repos: list[str], sinces: dict[str, dict[str, datetime]],
+) -> str:
+    parts = []
+    for i, repo in enumerate(repos):
+        owner, _, name = repo.partition("/")
+        parts.append(_REPO_FRAGMENT % {
+            "alias": f"r{i}",
+            "owner": json.dumps(owner),
+            "name": json.dumps(name),
+            "page": GRAPHQL_PAGE,
+            "fields": _ITEM_FIELDS,
+            "issues_since": json.dumps(
+                sinces[repo]["issues"].isoformat(),
+            ),
+        })
+    return "query {" + "".join(parts) + "}"
+
+
+def _rest_shape(node: dict) -> dict:
+    """Map a GraphQL node onto the REST field names _normalize reads."""
+    return {
+        "id": node.get("databaseId"),
+        "number": node.get("number", 0),
+        "title": node.get("title"),
+        "name": node.get("name") or node.get("tagName", ""),
+        "body": node.get("body") or node.get("description") or "",
+        "html_url": node.get("url", ""),
+        "user": node.get("author") or {},
+        "created_at": node.get("createdAt", ""),
+        "updated_at": node.get("updatedAt"),
+        "published_at": node.get("publishedAt"),
+        "merged_at": node.get("mergedAt"),
+        "labels": (node.get("labels") or {}).get("nodes", []),
+        "reactions": {
+            "total_count": (node.get("reactions") or {})
+            .get("totalCount", 0),
         },
+        "comments": (node.get("comments") or {}).get("totalCount", 0),
+    }
+
+
+def _nodes(repo_data: dict, field: str) -> list[dict]:
+    return [
+        _rest_shape(n)
+        for n in (repo_data.get(field) or {}).get("nodes", [])
+        if n
+    ]
+
+
+def _overflows(raw: list[dict], field: str, since: datetime) -> bool:
+    """True if a full page still has not reached back to the watermark."""
+    if len(raw) < GRAPHQL_PAGE:
+        return False
+    oldest = raw[-1].get(field)
+    return bool(oldest) and _parse_ts(oldest) > since
+
+
+def fetch_graphql_chunk(
+    repos: list[str],
+    sinces: dict[str, dict[str, datetime]],
+    resuming: frozenset[tuple[str, str]] = frozenset(),
+) -> tuple[
+    list[GitHubItem], dict[str, dict[str, str]], list[tuple[str, str]],
+]:
+    """Fetch releases, merged PRs and issues for *repos* in one query.
+
+    Returns the items, the new watermarks per repo/endpoint, and the
+    repo/endpoint pairs whose single GraphQL page overflowed the
+    watermark and must be paged through REST instead. Pairs in
+    *resuming* still have a REST paging backlog and always go there.
+    """
+    resp = http_client.post(
+        f"{GH_API}/graphql",
+        json={"query": _graphql_query(repos, sinces)},
         headers=_headers(),
         timeout=30,
     )
+    ratelimit.record("github", "graphql", resp)
     resp.raise_for_status()
+    payload = resp.json()
 
-    items = []
-    for issue in resp.json():
-        if "pull_request" in issue:
+    for err in payload.get("errors", []):
+        logger.warning("GitHub GraphQL error: %s", err.get("message"))
+
+    data = payload.get("data") or {}
+    items: list[GitHubItem] = []
+    marks: dict[str, dict[str, str]] = {}
+    overflow: list[tuple[str, str]] = []
+
+    for i, repo in enumerate(repos):
+        repo_data = data.get(f"r{i}")
+        if not repo_data:
             continue
-        items.append(
-            _normalize(
-                repo, "issue", issue.get("number", 0), issue,
+        since = sinces[repo]
+        releases = _nodes(repo_data, "releases")
+        prs = _nodes(repo_data, "pullRequests")
+        issues = _nodes(repo_data, "issues")
+
+        found = {
+            "releases": _releases_since(
+                repo, releases, since["releases"],
+            ),
+            "prs": _merged_prs_since(repo, prs, since["prs"]),
+            "issues": _issues_since(repo, issues, since["issues"]),
+        }
+        newest = {
+            "releases": _newest(
+                [r.get("published_at") for r in releases],
+            ),
+            "prs": _newest([
+                pr.get("merged_at") for pr in prs
+                if _parse_ts(pr["merged_at"]) > since["prs"]
+            ]),
+            "issues": _newest([it.get("updated_at") for it in issues]),
+        }
+        overflowing = {
+            "releases": _overflows(
+                releases, "created_at", since["releases"],
+            ),
+            "prs": _overflows(prs, "updated_at", since["prs"]),
+            "issues": _overflows(issues, "updated_at", since["issues"]),
+        }
+        for endpoint in overflowing:
+            if (repo, endpoint) in resuming:
+                overflowing[endpoint] = True
+
+        for endpoint, endpoint_items in found.items():
+            if overflowing[endpoint]:
+                overflow.append((repo, endpoint))
+                continue
+            items.extend(endpoint_items)
+            marks.setdefault(repo, {})[endpoint] = (
+                newest[endpoint] or _iso(since[endpoint])
             )
+
+        logger.info(
+            "Fetched %d releases, %d merged PRs, %d issues from %s "
+            "(GraphQL).",
+            len(found["releases"]), len(found["prs"]),
+            len(found["issues"]), repo,
+        )
+    return items, marks, overflow
+
+
+def _graphql_chunks(repos: list[str]) -> list[list[str]]:
+    size = max(1, settings.github_graphql_chunk_size)
+    chunks = [repos[i:i + size] for i in range(0, len(repos), size)]
+
+    budget = ratelimit.budget("github", "graphql")
+    if budget is not None and budget < len(chunks):
+        logger.warning(
+            "GitHub GraphQL budget short: fetching %d of %d chunk(s).",
+            budget, len(chunks),
+        )
+        chunks = ratelimit.rotate("github:graphql", chunks, budget)
+    return chunks
+
+
+def _fetch_graphql(
+    chunk: list[str], sinces: dict[str, dict[str, datetime]],
+) -> list[GitHubItem]:
+    resuming = frozenset(
+        (repo, endpoint)
+        for repo in chunk
+        for _, endpoint, _ in FETCHERS
+        if store.get_gh_resume(repo, endpoint)
+    )
+    try:
+        items, marks, overflow = fetch_graphql_chunk(
+            chunk, sinces, resuming,
+        )
+    except httpx.HTTPStatusError as e:
+        logger.warning(
+            "GitHub GraphQL error %d for %s.",
+            e.response.status_code, ", ".join(chunk),
+        )
+        return []
+    except Exception:
+        logger.error(
+            "Failed GraphQL fetch for %s.",
+            ", ".join(chunk), exc_info=True,
+        )
+        return []
+
+    for repo, repo_marks in marks.items():
+        for endpoint, mark in repo_marks.items():
+            store.set_gh_watermark(repo, endpoint, mark)
+
+    # Pages beyond the first go through REST pagination
+    fetchers = {
+        endpoint: (label, fn) for label, endpoint, fn in FETCHERS
+    }
+    for repo, endpoint in overflow:
+        label, fn = fetchers[endpoint]
+        logger.info(
+            "GraphQL page full for %s %s, paging via REST.",
+            repo, label,
+        )
+        items.extend(
+            _fetch_endpoint(repo, label, endpoint, fn, sinces),
         )
     return items
 
 
-def fetch_all_github_items() -> list[dict]:
-    """Fetch releases, merged PRs, and issues from all repos."""
-    since = datetime.now(timezone.utc) - timedelta(
-        minutes=settings.github_check_interval_minutes + 5,
+# Endpoints in the order the rate-limit budget is spent on them:
+# (log label, watermark field, fetcher).
+FETCHERS = [
+    ("releases", "releases", fetch_releases),
+    ("merged PRs", "prs", fetch_merged_prs),
+    ("issues", "issues", fetch_notable_issues),
+]
+
+
+def _plan(repos: list[str]) -> list[tuple[str, str, str, object]]:
+    """Choose which repo x endpoint calls fit this cycle's budget.
+
+    With a short budget, low-priority endpoints (issues first) are
+    deferred, and the repos that do get an endpoint rotate across
+    cycles so none starves.
+    """
+    budget = ratelimit.budget("github", "core")
+    plan = []
+    for label, endpoint, fn in FETCHERS:
+        if budget is None:
+            chosen = repos
+        else:
+            chosen = ratelimit.rotate(
+                f"github:{label}", repos, min(budget, len(repos)),
+            )
+            budget -= len(chosen)
+        if len(chosen) < len(repos):
+            logger.warning(
+                "GitHub budget short: deferring %s for %d of %d repo(s).",
+                label, len(repos) - len(chosen), len(repos),
+            )
+        plan.extend((repo, label, endpoint, fn) for repo in chosen)
+    return plan
+
+
+def _watermarks(repos: list[str]) -> dict[str, dict[str, datetime]]:
+    """Per repo/endpoint lower bound: the stored watermark if any."""
+    default = clock.now() - timedelta(
+        minutes=cycle_minutes() + 5,
+    )
+    stored = store.get_gh_watermarks(repos)
+    return {
+        repo: {
+            endpoint: (
+                _parse_ts(stored[repo][endpoint])
+                if stored[repo].get(endpoint) else default
+            )
+            for _, endpoint, _ in FETCHERS
+        }
+        for repo in repos
+    }
+
+
+def _fetch_endpoint(
+    repo: str,
+    label: str,
+    endpoint: str,
+    fn,
+    sinces: dict[str, dict[str, datetime]],
+) -> list[GitHubItem]:
+    """Run one REST fetcher and advance its watermark on success.
+
+    A listing cut short by GITHUB_MAX_PAGES keeps its watermark and
+    carries on from the last page next cycle; the newest timestamp
+    seen becomes the watermark once the backlog reaches the old one.
+    """
+    since = sinces[repo][endpoint]
+    resume = store.get_gh_resume(repo, endpoint)
+    start = resume[0] if resume else 1
+    try:
+        items, mark, next_page = fn(repo, since, start)
+    except httpx.HTTPStatusError as e:
+        code = e.response.status_code
+        if code in (403, 429):
+            logger.warning(
+                "GitHub rate limited (%d) for %s %s.",
+                code, repo, label,
+            )
+        else:
+            logger.error(
+                "GitHub API error %d for %s %s.",
+                code, repo, label,
+                exc_info=True,
+            )
+        return []
+    except Exception:
+        logger.error(
+            "Failed fetching %s from %s.",
+            label, repo,
+            exc_info=True,
+        )
+        return []
+
+    if resume:
+        mark = _newest([resume[1], mark])
+    if next_page:
+        store.set_gh_resume(repo, endpoint, next_page, mark or _iso(since))
+        logger.warning(
+            "Hit GITHUB_MAX_PAGES (%d) for %s %s before the watermark; "
+            "resuming from page %d next cycle.",
+            settings.github_max_pages, repo, label, next_page,
+        )
+    else:
+        # With nothing new, pin the lower bound so later cycles resume
+        # from here rather than from a wall-clock window
+        store.set_gh_watermark(repo, endpoint, mark or _iso(since))
+    logger.info(
+        "Fetched %d %s from %s.",
+        len(items), label, repo,
     )
+    return items
+
+
+def _plan_units(repos: list[str]) -> list[dict]:
+    """This cycle's fetch units: GraphQL chunks or repo x endpoint."""
+    if settings.github_fetch_mode == "graphql":
+        if settings.github_token:
+            return [{"chunk": chunk} for chunk in _graphql_chunks(repos)]
+        logger.warning(
+            "GitHub GraphQL needs GITHUB_TOKEN; falling back to REST.",
+        )
+    return [
+        {"repo": repo, "endpoint": endpoint}
+        for repo, _, endpoint, _ in _plan(repos)
+    ]
+
+
+def _run_unit(
+    unit: dict, sinces: dict[str, dict[str, datetime]],
+) -> list[GitHubItem]:
+    if "chunk" in unit:
+        return _fetch_graphql(unit["chunk"], sinces)
+    for label, endpoint, fn in FETCHERS:
+        if endpoint == unit["endpoint"]:
+            return _fetch_endpoint(
+                unit["repo"], label, endpoint, fn, sinces,
+            )
+    raise ValueError(f"Unknown GitHub endpoint {unit['endpoint']!r}")
+
+
+def fetch_unit(unit: dict) -> list[GitHubItem]:
+    """Work-queue entry point: one unit, from its current watermarks."""
+    return _run_unit(unit, _watermarks(unit.get("chunk") or [unit["repo"]]))
+
+
+workqueue.register(FETCH_QUEUE, fetch_unit)
+
+
+def fetch_all_github_items() -> list[GitHubItem]:
+    """Fetch releases, merged PRs, and issues from all repos.
+
+    Each repo/endpoint resumes from its own watermark, so a delayed
+    cycle leaves no gap and nothing is downloaded twice. With
+    DISTRIBUTED, units are spread over all replicas via the work queue.
+    """
     repos = _parse_repos()
-    all_items: list[dict] = []
+    units = _plan_units(repos)
 
-    for repo in repos:
-        fetchers = [
-            ("releases", fetch_releases),
-            ("merged PRs", fetch_merged_prs),
-            ("issues", fetch_notable_issues),
+    if settings.distributed:
+        all_items = workqueue.run(
+            FETCH_QUEUE, units, decode_github_item,
+            settings.cycle_budget_seconds / 2,
+        )
+    else:
+        sinces = _watermarks(repos)
+        all_items = [
+            item for unit in units for item in _run_unit(unit, sinces)
         ]
-        for label, fn in fetchers:
-            try:
-                items = fn(repo, since)
-                all_items.extend(items)
-                logger.info(
-                    "Fetched %d %s from %s.",
-                    len(items), label, repo,
-                )
-            except httpx.HTTPStatusError as e:
-                code = e.response.status_code
-                if code in (403, 429):
-                    logger.warning(
-                        "GitHub rate limited (%d) for %s %s.",
-                        code, repo, label,
-                    )
-                else:
-                    logger.error(
-                        "GitHub API error %d for %s %s.",
-                        code, repo, label,
-                        exc_info=True,
-                    )
-            except Exception:
-                logger.error(
-                    "Failed fetching %s from %s.",
-                    label, repo,
-                    exc_info=True,
-                )
 
     logger.info(
         "Total GitHub items fetched: %d.", len(all_items),
@@ -1,19 +1,35 @@
-import json
 import logging
+from dataclasses import replace
 
 import httpx
 
-from app import discord, store
+from app import (
+    batcher, deferred, http_client, outbox, profiles, ranking, ratelimit,
+    recorder, store, summarizer,
+)
 from app.config import settings
-from app.github_fetcher import fetch_all_github_items
-from app.github_scorer import score_github_items
+from app.github_fetcher import cycle_minutes, fetch_all_github_items
+from app.github_scorer import enrich_github_items, score_github_items
+from app.records import GitHubItem, decode_github_item
 
 logger = logging.getLogger(__name__)
 
 
 def run_github_pipeline() -> None:
     """Fetch -> dedup -> score -> store -> publish for GitHub."""
+    try:
+        with (
+            http_client.cycle_budget(settings.cycle_budget_seconds),
+            recorder.cycle("github"),
+        ):
+            _run_cycle()
+            _run_deferred()
+    finally:
+        http_client.log_stats()
+        ratelimit.log_report()
+
 
+def _run_cycle() -> None:
     # 1. Fetch
     try:
         raw_items = fetch_all_github_items()
@@ -33,12 +49,31 @@ def run_github_pipeline() -> None:
         logger.info("No GitHub items fetched, skipping cycle.")
         return
 
+    process_github_items(raw_items)
+
+
+def _run_deferred() -> None:
+    """Publish finished batch jobs and submit the deferred queue."""
+    # Batch jobs outlive a cycle, so replays leave them alone
+    if not settings.deferred_types or recorder.player() is not None:
+        return
+    try:
+        deferred.run(cycle_minutes())
+    except Exception:
+        logger.error("Deferred scoring failed.", exc_info=True)
+
+
+def process_github_items(raw_items: list[GitHubItem]) -> None:
+    """Dedup -> score -> store -> publish for already-fetched items.
+
+    Shared by the polling cycle and push ingestion (webhooks).
+    """
     # 2. Dedup
     new_items = [
         it for it in raw_items
-        if not store.is_gh_known(it["id"])
+        if not store.is_gh_known(it.id)
     ]
-    store.mark_gh_known([it["id"] for it in new_items])
+    store.mark_gh_known([it.id for it in new_items])
 
     if not new_items:
         logger.info(
@@ -52,68 +87,72 @@ def run_github_pipeline() -> None:
         len(raw_items), len(new_items),
     )
 
-    # 3. Score via Gemini (no engagement gate)
-    try:
-        scored = score_github_items(new_items)
-    except json.JSONDecodeError:
-        logger.error(
-            "Gemini returned invalid JSON. Skipping cycle.",
+    # Non-urgent types wait for a batch job (app.deferred)
+    later = [it for it in new_items if deferred.is_deferred(it)]
+    if later:
+        deferred.enqueue(later)
+        new_items = [it for it in new_items if not deferred.is_deferred(it)]
+        if not new_items:
+            return
+
+    # 3. Micro-batch across cycles; releases bypass the buffer and
+    # take whatever is waiting along with them
+    urgent = [it for it in new_items if it.type == "release"]
+    batcher.add(
+        "github", [it for it in new_items if it.type != "release"],
+    )
+    batch = urgent + batcher.take_ready(
+        "github", decode_github_item,
+        cycle_minutes(),
+        force=bool(urgent),
+    )
+    if not batch:
+        logger.info(
+            "Buffered GitHub items (%d pending), waiting for a "
+            "fuller batch.",
+            batcher.pending("github"),
         )
         return
-    except Exception:
-        logger.error("GitHub scoring failed.", exc_info=True)
+
+    # Long release notes are summarized section by section once,
+    # before any profile reads them
+    summarizer.summarize_releases(batch)
+
+    # 4-6. Score, rank and queue once per profile, in parallel
+    results = profiles.fan_out(lambda profile: _select(profile, batch))
+    if None in results.values():
+        # Already marked known, so a dropped batch would never come
+        # back; profiles that did score it have claimed their picks
+        batcher.restore("github", batch)
         return
+    batcher.record_batch("github", batch)
+    logger.info(
+        "GitHub cycle complete. Queued %d new item(s) for publishing.",
+        sum(len(queued) for queued in results.values()),
+    )
 
+
+def _select(
+    profile: profiles.Profile, batch: list[GitHubItem],
+) -> list[GitHubItem]:
+    """Classify (no engagement gate), rank, enrich and queue items."""
+    scored = score_github_items([replace(it) for it in batch], profile)
     if not scored:
-        logger.info("No GitHub items passed the filter.")
-        return
+        logger.info(
+            "No GitHub items passed the filter for %s.", profile.name,
+        )
+        return []
 
-    # 4. Select top N
-    top = scored[: settings.github_top_n]
+    scored = ranking.rank_github_items(scored)
+    top = scored[: profile.github_top_n]
+    enrich_github_items(top, profile)
     logger.info(
-        "Top %d GitHub items: %s",
+        "Top %d GitHub items for %s: %s",
         len(top),
+        profile.name,
         [
-            (p.get("short_title", "?"), p.get("priority", "?"))
+            (p.verdict.short_title, p.verdict.priority)
             for p in top
         ],
     )
-
-    # 5. Store and publish
-    published_count = 0
-    for post in top:
-        try:
-            is_new = store.save_gh_post(post)
-            if is_new:
-                thread_id = discord.post_github_news(post)
-                if thread_id:
-                    post["discord_thread_id"] = thread_id
-                    store.save_gh_thread_id(
-                        post["id"], thread_id,
-                    )
-                store.publish_gh_to_stream(post)
-                logger.info(
-                    "PUBLISHED GH [%s] %s\n  URL: %s\n"
-                    "  TLDR: %s",
-                    post["id"],
-                    post.get("short_title", ""),
-                    post.get("url", ""),
-                    post.get("tldr", ""),
-                )
-                published_count += 1
-            else:
-                logger.info(
-                    "Skipped (already published): [%s]",
-                    post["id"],
-                )
-        except Exception:
-            logger.error(
-                "Failed to store/publish GH item %s.",
-                post["id"],
-                exc_info=True,
-            )
-
-    logger.info(
-        "GitHub cycle complete. Published %d new item(s).",
-        published_count,
-    )
+    return outbox.add("github", top, profile.name)
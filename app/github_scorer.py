@@ -1,13 +1,26 @@
 import json
 import logging
 
-from google import genai
-
+from app import gemini, profiles
 from app.config import settings
+from app.records import GH_BODY_LIMIT, GitHubItem, Verdict
+from app.scorer import CLASSIFY_SCHEMA, enrichment_schema
 
 logger = logging.getLogger(__name__)
 
-client = genai.Client(api_key=settings.gemini_api_key)
+# Classifying needs only the opening of a long release's digest;
+# enrichment reads all of it
+CLASSIFY_NOTES_LIMIT = 1500
+
+ENRICH_SCHEMA = enrichment_schema("title", "reason", "tldr", "tips")
+CLASSIFY_NOTE = (
+    "Classify the items below. Return only index, pass, priority and "
+    "tags for the ones that pass; titles and summaries come later.\n\n"
+)
+ENRICH_NOTE = (
+    "The items below already passed. Write the title, reason, tldr "
+    "and tips for each, as described in your instructions.\n\n"
+)
 
 GITHUB_FILTER_PROMPT = """\
 You are a GitHub activity filter for a team of AI engineers \
@@ -49,27 +62,71 @@ build or use our tools tomorrow?" If no, filter it out.
 """
 
 
-def score_github_items(items: list[dict]) -> list[dict]:
-    """Filter and rank GitHub items via Gemini."""
-    if not items:
-        return []
+def _body(item: GitHubItem, enrich: bool) -> str:
+    if item.notes:
+        return item.notes if enrich else item.notes[:CLASSIFY_NOTES_LIMIT]
+    if enrich and item.type == "release":
+        # Short enough that app.summarizer left it whole
+        return item.body[: settings.release_chunk_chars]
+    return item.body[:GH_BODY_LIMIT]
+
 
-    numbered = "\n".join(
-        f"[{i}] (id:{it['id']}) [{it['type']}] "
-        f"{it['title']}\n{it['body'][:500]}"
+def _numbered(items: list[GitHubItem], enrich: bool = False) -> str:
+    return "\n".join(
+        f"[{i}] (id:{it.id}) [{it.type}] "
+        f"{it.title}\n{_body(it, enrich)}"
         for i, it in enumerate(items)
     )
 
-    response = client.models.generate_content(
-        model=settings.gemini_model,
-        contents=numbered,
-        config={
-            "system_instruction": GITHUB_FILTER_PROMPT,
-            "response_mime_type": "application/json",
-        },
+
+def _priority(items: list[GitHubItem]) -> int:
+    # Releases jump the shared Gemini queue; PRs/issues can wait
+    if any(it.type == "release" for it in items):
+        return gemini.PRIORITY_RELEASE
+    return gemini.PRIORITY_NORMAL
+
+
+def classify_request(
+    items: list[GitHubItem], profile: profiles.Profile,
+) -> tuple[str, str, str]:
+    """Scorer name, system instruction and contents to classify *items*.
+
+    Shared with the deferred tier (app.deferred), which sends the same
+    request through a batch job.
+    """
+    return (
+        profile.gemini_name("github"),
+        profile.github_prompt or GITHUB_FILTER_PROMPT,
+        CLASSIFY_NOTE + _numbered(items),
     )
 
-    scored_list = json.loads(response.text)
+
+def score_github_items(
+    items: list[GitHubItem], profile: profiles.Profile | None = None,
+) -> list[GitHubItem]:
+    """Filter and classify GitHub items via Gemini.
+
+    Verdicts carry priority and tags only; call enrich_github_items()
+    on the items that will be published.
+    """
+    if not items:
+        return []
+    profile = profile or profiles.default()
+
+    name, system_instruction, contents = classify_request(items, profile)
+    text = gemini.generate_json(
+        name, system_instruction, contents,
+        priority=_priority(items),
+        response_schema=CLASSIFY_SCHEMA,
+    )
+    return apply_classification(items, text, profile)
+
+
+def apply_classification(
+    items: list[GitHubItem], text: str, profile: profiles.Profile,
+) -> list[GitHubItem]:
+    """Set verdicts from a classification answer; returns passing items."""
+    scored_list = json.loads(text)
 
     item_map = {i: it for i, it in enumerate(items)}
     priority_order = {"high": 0, "medium": 1}
@@ -77,24 +134,56 @@ def score_github_items(items: list[dict]) -> list[dict]:
     result = []
     for entry in scored_list:
         idx = entry["index"]
-        if idx in item_map:
-            enriched = item_map[idx].copy()
-            enriched["priority"] = entry["priority"]
-            enriched["tags"] = entry.get("tags", [])
-            enriched["short_title"] = entry.get("title", "")
-            enriched["reason"] = entry.get("reason", "")
-            enriched["tldr"] = entry.get("tldr", "")
-            enriched["tips"] = entry.get("tips", "")
-            result.append(enriched)
+        if idx in item_map and entry.get("pass", True):
+            item = item_map[idx]
+            item.verdict = Verdict.from_gemini(entry)
+            result.append(item)
 
     result.sort(
-        key=lambda x: priority_order.get(x["priority"], 99),
+        key=lambda x: priority_order.get(x.verdict.priority, 99),
     )
 
     logger.info(
-        "Scored %d GH items, %d passed. Priorities: %s",
+        "Scored %d GH items for %s, %d passed. Priorities: %s",
         len(items),
+        profile.name,
         len(result),
-        [p["priority"] for p in result],
+        [p.verdict.priority for p in result],
     )
     return result
+
+
+def enrich_github_items(
+    items: list[GitHubItem], profile: profiles.Profile | None = None,
+) -> None:
+    """Write title, reason, TLDR and tips for classified items, in place.
+
+    This is the reduce step for long releases: Gemini reads the digest
+    app.summarizer built from every section of the notes. On failure
+    items keep their own title, cut to 100 chars.
+    """
+    if not items:
+        return
+    profile = profile or profiles.default()
+
+    try:
+        text = gemini.generate_json(
+            profile.gemini_name("github"),
+            profile.github_prompt or GITHUB_FILTER_PROMPT,
+            ENRICH_NOTE + _numbered(items, enrich=True),
+            priority=_priority(items),
+            response_schema=ENRICH_SCHEMA,
+        )
+        for entry in json.loads(text):
+            idx = entry.get("index")
+            if isinstance(idx, int) and 0 <= idx < len(items):
+                items[idx].verdict.enrich(entry)
+    except Exception:
+        logger.error(
+            "Enriching %d GH item(s) for %s failed.",
+            len(items), profile.name, exc_info=True,
+        )
+
+    for item in items:
+        if not item.verdict.short_title:
+            item.verdict.short_title = item.title[:100]
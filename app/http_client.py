@@ -0,0 +1,286 @@
+import contextvars
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import httpx
+
+from app import recorder
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+MAX_RETRY_AFTER = 60
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 20
+
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar(
+    "http_deadline", default=None,
+)
+
+_lock = threading.Lock()
+_clients: dict[str, httpx.Client] = {}
+_breakers: dict[str, "_Breaker"] = {}
+
+
+class CircuitOpenError(httpx.HTTPError):
+    """Raised without a network call while a host's breaker is open."""
+
+
+class DeadlineExceeded(httpx.HTTPError):
+    """Raised when the current cycle has used up its time budget."""
+
+
+class _Breaker:
+    def __init__(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_at = 0.0
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        cooldown = settings.http_breaker_cooldown_seconds
+        if self.state == "open":
+            if now - self.opened_at < cooldown:
+                return False
+            # Let a single trial request through
+            self.state = "half-open"
+            self.trial_at = now
+            return True
+        if self.state == "half-open":
+            # Others wait for the trial to settle the state; a trial
+            # whose caller gave up without reporting is replaced
+            if now - self.trial_at < cooldown:
+                return False
+            self.trial_at = now
+        return True
+
+    def success(self) -> None:
+        self.failures = 0
+        self.state = "closed"
+
+    def failure(self) -> None:
+        self.failures += 1
+        self.errors += 1
+        if (
+            self.state == "half-open"
+            or self.failures >= settings.http_breaker_threshold
+        ):
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+def _host(url: str) -> str:
+    return urlsplit(url).netloc
+
+
+def _client(host: str) -> httpx.Client:
+    with _lock:
+        client = _clients.get(host)
+        if client is None:
+            client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=10, max_keepalive_connections=5,
+                ),
+            )
+            _clients[host] = client
+        return client
+
+
+def _breaker(host: str) -> _Breaker:
+    with _lock:
+        return _breakers.setdefault(host, _Breaker())
+
+
+def _retry_after(resp: httpx.Response) -> float | None:
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def _backoff(attempt: int) -> float:
+    # Full jitter exponential backoff
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def _remaining() -> float | None:
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def _fits(delay: float) -> bool:
+    remaining = _remaining()
+    return remaining is None or delay < remaining
+
+
+@contextmanager
+def cycle_budget(seconds: float):
+    """Bound the total time outbound HTTP may take within this block."""
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def request(
+    method: str,
+    url: str,
+    *,
+    timeout: float = 30,
+    **kwargs,
+) -> httpx.Response:
+    """Send a request through the shared per-host pool.
+
+    Idempotent methods are retried on transport errors and 5xx with
+    jittered exponential backoff; any method is retried on 429, since
+    the server did not act on it. Retry-After is honoured. Non-retried
+    responses are returned as-is for the caller to raise_for_status().
+    During a replay the recorded response is returned instead.
+    """
+    method = method.upper()
+    player = recorder.player()
+    if player is not None:
+        return player.response(method, url, kwargs.get("params"))
+    resp = _send(method, url, timeout, **kwargs)
+    recorder.http(method, url, kwargs.get("params"), resp)
+    return resp
+
+
+def _send(
+    method: str, url: str, timeout: float, **kwargs,
+) -> httpx.Response:
+    host = _host(url)
+    breaker = _breaker(host)
+    idempotent = method in IDEMPOTENT_METHODS
+    attempt = 0
+
+    while True:
+        with _lock:
+            allowed = breaker.allow()
+            breaker.requests += 1
+        if not allowed:
+            raise CircuitOpenError(f"Circuit open for {host}")
+
+        remaining = _remaining()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded(f"Cycle deadline exceeded before {host}")
+        call_timeout = (
+            timeout if remaining is None else min(timeout, remaining)
+        )
+
+        try:
+            resp = _client(host).request(
+                method, url, timeout=call_timeout, **kwargs,
+            )
+        except httpx.TransportError:
+            with _lock:
+                breaker.failure()
+            if not idempotent or attempt >= settings.http_max_retries:
+                raise
+            delay = _backoff(attempt)
+        else:
+            status = resp.status_code
+            retryable = status in RETRY_STATUS_CODES and (
+                idempotent or status == 429
+            )
+            with _lock:
+                if status >= 500:
+                    breaker.failure()
+                else:
+                    breaker.success()
+            if not retryable or attempt >= settings.http_max_retries:
+                return resp
+            delay = _retry_after(resp)
+            if delay is None:
+                delay = _backoff(attempt)
+            if delay > MAX_RETRY_AFTER or not _fits(delay):
+                return resp
+
+        if not _fits(delay):
+            raise DeadlineExceeded(
+                f"Cycle deadline too close to retry {host}"
+            )
+
+        attempt += 1
+        with _lock:
+            breaker.retries += 1
+        logger.warning(
+            "%s %s failed, retry %d/%d in %.1fs.",
+            method, host, attempt, settings.http_max_retries, delay,
+        )
+        time.sleep(delay)
+
+
+@contextmanager
+def stream(
+    method: str, url: str, *, timeout=30, **kwargs,
+):
+    """Open a long-lived streaming response on the shared pool.
+
+    No retries, breaker or cycle deadline: the caller owns the
+    reconnect policy of a connection that is meant to stay open.
+    """
+    host = _host(url)
+    breaker = _breaker(host)
+    with _lock:
+        breaker.requests += 1
+    with _client(host).stream(
+        method.upper(), url, timeout=timeout, **kwargs,
+    ) as resp:
+        yield resp
+
+
+def get(url: str, **kwargs) -> httpx.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> httpx.Response:
+    return request("POST", url, **kwargs)
+
+
+def delete(url: str, **kwargs) -> httpx.Response:
+    return request("DELETE", url, **kwargs)
+
+
+def stats() -> dict[str, dict]:
+    """Breaker state and request/retry/error counts per host."""
+    with _lock:
+        return {
+            host: {
+                "state": b.state,
+                "requests": b.requests,
+                "retries": b.retries,
+                "errors": b.errors,
+            }
+            for host, b in _breakers.items()
+        }
+
+
+def log_stats() -> None:
+    for host, s in stats().items():
+        logger.info(
+            "HTTP %s: breaker=%s requests=%d retries=%d errors=%d.",
+            host, s["state"], s["requests"], s["retries"], s["errors"],
+        )
@@ -0,0 +1,64 @@
+import functools
+import logging
+import os
+import socket
+
+import redis
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+r = redis.from_url(settings.redis_url, decode_responses=True)
+
+LEASE_KEY = "leader:scheduler"
+INSTANCE_ID = f"{socket.gethostname()}-{os.getpid()}"
+
+# Extend the lease only if we still hold it. KEYS[1]=lease;
+# ARGV: instance id, ttl ms
+_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def acquire() -> bool:
+    """Take or extend the scheduler lease; True while we are leader.
+
+    The lease lapses LEADER_LEASE_SECONDS after the leader stops
+    renewing it, and the next replica to call this takes over.
+    """
+    ttl_ms = settings.leader_lease_seconds * 1000
+    if r.eval(_RENEW_SCRIPT, 1, LEASE_KEY, INSTANCE_ID, ttl_ms):
+        return True
+    if r.set(LEASE_KEY, INSTANCE_ID, nx=True, px=ttl_ms):
+        logger.info("%s is now the scheduler leader.", INSTANCE_ID)
+        return True
+    return False
+
+
+def release() -> None:
+    if r.eval(_RELEASE_SCRIPT, 1, LEASE_KEY, INSTANCE_ID):
+        logger.info("%s released the scheduler lease.", INSTANCE_ID)
+
+
+def only_leader(fn):
+    """Run a scheduled job only on the leader (always when standalone)."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if settings.distributed and not acquire():
+            logger.info(
+                "Not the leader, skipping %s.", fn.__name__,
+            )
+            return None
+        return fn(*args, **kwargs)
+    return wrapper
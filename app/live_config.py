@@ -0,0 +1,183 @@
+import functools
+import logging
+import threading
+from dataclasses import replace
+from typing import Callable, TypeVar
+
+import redis
+
+from app.config import Settings, settings
+
+logger = logging.getLogger(__name__)
+
+r = redis.from_url(settings.redis_url, decode_responses=True)
+
+OVERRIDES_KEY = "config:overrides"
+CHANNEL = "config:changes"
+# Settings that can change without a restart; everything else (keys,
+# URLs, schedules, pool sizes) is read once at startup
+DYNAMIC_FIELDS = frozenset({
+    "x_accounts",
+    "x_search_query",
+    "github_repos",
+    "min_engagement",
+    "top_n",
+    "github_top_n",
+    "alignments",
+    "github_prompt",
+    "rank_weights",
+    "rank_tag_weights",
+    "reputation_skip_rate",
+    "reputation_fast_track_rate",
+})
+RECONNECT_SECONDS = 5
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+_current: Settings = settings
+_generation = 0
+_loaded = False
+_callbacks: list[Callable[[Settings], None]] = []
+
+
+def field_name(name: str) -> str:
+    """Settings field for an env-style or field-style *name*."""
+    field = name.strip().lower()
+    if field not in DYNAMIC_FIELDS:
+        raise ValueError(f"{name} cannot be changed at runtime.")
+    return field
+
+
+def _coerce(field: str, value: str):
+    kind = type(getattr(settings, field))
+    if kind is bool:
+        return value.lower() == "true"
+    return kind(value)
+
+
+def reload() -> bool:
+    """Re-read the overrides from Redis; returns whether anything changed.
+
+    Change callbacks run after the new settings are in place.
+    """
+    global _current, _generation, _loaded
+    overrides = {}
+    for field, value in r.hgetall(OVERRIDES_KEY).items():
+        try:
+            name = field_name(field)
+            overrides[name] = _coerce(name, value)
+        except ValueError:
+            logger.warning("Ignoring config override %s=%r.", field, value)
+    updated = replace(settings, **overrides)
+    with _lock:
+        _loaded = True
+        changed = updated != _current
+        if changed:
+            _current = updated
+            _generation += 1
+    if changed:
+        logger.info(
+            "Config reloaded (generation %d), overrides: %s",
+            _generation, sorted(overrides),
+        )
+        for callback in list(_callbacks):
+            try:
+                callback(updated)
+            except Exception:
+                logger.error("Config change callback failed.", exc_info=True)
+    return changed
+
+
+def current() -> Settings:
+    """Environment settings with the Redis overrides applied."""
+    global _loaded
+    if not _loaded:
+        try:
+            reload()
+        except redis.RedisError:
+            logger.warning(
+                "Could not read config overrides; using the environment.",
+                exc_info=True,
+            )
+            _loaded = True
+    return _current
+
+
+def generation() -> int:
+    """Bumped on every change, for callers that cache derived values."""
+    current()
+    return _generation
+
+
+def per_generation(fn: Callable[[], T]) -> Callable[[], T]:
+    """Cache ``fn()`` until the live config next changes."""
+    cached: dict = {}
+
+    @functools.wraps(fn)
+    def wrapper() -> T:
+        gen = generation()
+        if cached.get("generation") != gen:
+            cached["value"] = fn()
+            cached["generation"] = gen
+        return cached["value"]
+
+    return wrapper
+
+
+def on_change(callback: Callable[[Settings], None]) -> None:
+    """Call *callback* with the new settings after every change."""
+    _callbacks.append(callback)
+
+
+def set_value(name: str, value: str) -> None:
+    """Override a dynamic setting for every process and notify them."""
+    field = field_name(name)
+    _coerce(field, value)
+    pipe = r.pipeline()
+    pipe.hset(OVERRIDES_KEY, field, value)
+    pipe.publish(CHANNEL, field)
+    pipe.execute()
+
+
+def unset(name: str) -> None:
+    """Drop an override, going back to the environment's value."""
+    field = field_name(name)
+    pipe = r.pipeline()
+    pipe.hdel(OVERRIDES_KEY, field)
+    pipe.publish(CHANNEL, field)
+    pipe.execute()
+
+
+def overrides() -> dict[str, str]:
+    return r.hgetall(OVERRIDES_KEY)
+
+
+def listen(stop: threading.Event) -> None:
+    """Reload on every change notification until *stop* is set.
+
+    Reloads again after each (re)subscribe, so changes published while
+    disconnected are not missed.
+    """
+    while not stop.is_set():
+        pubsub = r.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(CHANNEL)
+            reload()
+            while not stop.is_set():
+                if pubsub.get_message(timeout=1.0):
+                    reload()
+        except redis.RedisError as e:
+            logger.warning("Config subscription lost: %r", e)
+            stop.wait(RECONNECT_SECONDS)
+        finally:
+            pubsub.close()
+
+
+def start_listener() -> threading.Event:
+    """Run listen() on a daemon thread; set the event to stop it."""
+    stop = threading.Event()
+    threading.Thread(
+        target=listen, args=(stop,), name="config-listener", daemon=True,
+    ).start()
+    return stop
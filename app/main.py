@@ -1,6 +1,7 @@
 import logging
 import signal
 import sys
+import threading
 from datetime import datetime
 
 from app.cleanup import midnight_cleanup
@@ -17,31 +18,93 @@ logger = logging.getLogger("noticias-botman")
 def _run_scheduler() -> None:
     from apscheduler.schedulers.blocking import BlockingScheduler
     from apscheduler.triggers.cron import CronTrigger
+    from apscheduler.triggers.interval import IntervalTrigger
 
+    from app import leader, live_config, outbox, workqueue
     from app.config import settings
 
     scheduler = BlockingScheduler(timezone="America/Argentina/Buenos_Aires")
 
-    # Pipeline every N minutes, only during operating hours (ART)
-    scheduler.add_job(
-        run_pipeline,
-        CronTrigger(
-            hour=(
-                f"{settings.schedule_start_hour}"
-                f"-{settings.schedule_end_hour - 1}"
+    # Cycles only queue items; Discord and the stream are fed from here
+    outbox.start_publisher()
+    # Accounts, repos, thresholds and prompts change without a restart
+    live_config.start_listener()
+
+    # With DISTRIBUTED every replica runs this scheduler, but only the
+    # lease holder fires cycles; all replicas work the fetch queues
+    pipeline_job = leader.only_leader(run_pipeline)
+    github_job = leader.only_leader(run_github_pipeline)
+    cleanup_job = leader.only_leader(midnight_cleanup)
+
+    streaming = settings.x_ingest_mode == "stream"
+    if streaming:
+        from app import x_stream
+
+    def renew_lease() -> None:
+        leading = leader.acquire()
+        if streaming:
+            # X allows one stream connection per app: only the lease
+            # holder listens, and hands over when it loses the lease
+            if leading:
+                x_stream.start_listener()
+            else:
+                x_stream.stop_listener()
+
+    if settings.distributed:
+        renew_lease()
+        scheduler.add_job(
+            renew_lease,
+            IntervalTrigger(
+                seconds=max(1, settings.leader_lease_seconds // 3),
             ),
-            minute=f"*/{settings.fetch_interval_minutes}",
-            timezone="America/Argentina/Buenos_Aires",
-        ),
-        id="pipeline",
-        name="Fetch-Score-Publish Pipeline",
-        misfire_grace_time=300,
-    )
+            id="leader_lease",
+            name="Leader Lease Renewal",
+        )
+        workqueue.start_worker()
 
-    # GitHub pipeline every N minutes, same operating hours
-    scheduler.add_job(
-        run_github_pipeline,
-        CronTrigger(
+    if streaming:
+        # Filtered stream runs continuously; buffered posts are scored
+        # on the same operating hours as polling
+        if not settings.distributed:
+            x_stream.start_listener()
+        scheduler.add_job(
+            leader.only_leader(x_stream.consume_cycle),
+            CronTrigger(
+                hour=(
+                    f"{settings.schedule_start_hour}"
+                    f"-{settings.schedule_end_hour - 1}"
+                ),
+                minute=f"*/{settings.x_stream_consume_minutes}",
+                timezone="America/Argentina/Buenos_Aires",
+            ),
+            id="x_stream_consumer",
+            name="X Stream Consumer",
+            misfire_grace_time=60,
+        )
+    else:
+        # Pipeline every N minutes, only during operating hours (ART)
+        scheduler.add_job(
+            pipeline_job,
+            CronTrigger(
+                hour=(
+                    f"{settings.schedule_start_hour}"
+                    f"-{settings.schedule_end_hour - 1}"
+                ),
+                minute=f"*/{settings.fetch_interval_minutes}",
+                timezone="America/Argentina/Buenos_Aires",
+            ),
+            id="pipeline",
+            name="Fetch-Score-Publish Pipeline",
+            misfire_grace_time=300,
+        )
+
+    # GitHub pipeline every N minutes, same operating hours. With
+    # webhooks it only sweeps up missed deliveries, around the clock
+    if settings.github_webhook_secret:
+        from app.github_fetcher import cycle_minutes
+        github_trigger = IntervalTrigger(minutes=cycle_minutes())
+    else:
+        github_trigger = CronTrigger(
             hour=(
                 f"{settings.schedule_start_hour}"
                 f"-{settings.schedule_end_hour - 1}"
@@ -50,15 +113,30 @@ def _run_scheduler() -> None:
                 f"*/{settings.github_check_interval_minutes}"
             ),
             timezone="America/Argentina/Buenos_Aires",
-        ),
+        )
+    scheduler.add_job(
+        github_job,
+        github_trigger,
         id="github_pipeline",
         name="GitHub Fetch-Score-Publish Pipeline",
         misfire_grace_time=300,
     )
 
+    # Digest threads every window, around the clock: webhook deliveries
+    # can publish outside operating hours
+    if settings.publish_mode == "digest":
+        from app import digest
+        scheduler.add_job(
+            leader.only_leader(digest.run_digests),
+            IntervalTrigger(minutes=settings.digest_window_minutes),
+            id="digest",
+            name="Discord Digest",
+            misfire_grace_time=300,
+        )
+
     # Midnight cleanup
     scheduler.add_job(
-        midnight_cleanup,
+        cleanup_job,
         CronTrigger(
             hour=0,
             minute=0,
@@ -78,10 +156,11 @@ def _run_scheduler() -> None:
         < settings.schedule_end_hour
     )
     if in_hours:
-        logger.info("Running initial pipeline cycle...")
-        run_pipeline()
+        if not streaming:
+            logger.info("Running initial pipeline cycle...")
+            pipeline_job()
         logger.info("Running initial GitHub pipeline cycle...")
-        run_github_pipeline()
+        github_job()
     else:
         logger.info(
             "Outside operating hours (%d:00–%d:00 ART), skipping initial run.",
@@ -100,6 +179,10 @@ def _run_scheduler() -> None:
     def shutdown(signum, frame):
         logger.info("Shutting down...")
         scheduler.shutdown(wait=False)
+        if streaming:
+            x_stream.stop_listener()
+        if settings.distributed:
+            leader.release()
         sys.exit(0)
 
     signal.signal(signal.SIGTERM, shutdown)
@@ -108,6 +191,169 @@ def _run_scheduler() -> None:
     scheduler.start()
 
 
+def _drain_outbox() -> None:
+    from app import outbox
+    logger.info("Published %d queued item(s).", outbox.drain())
+
+
+def _run_publisher() -> None:
+    """Standalone outbox publisher (the scheduler runs one itself)."""
+    from app import consumer, outbox
+    from app.config import settings
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+    consumer.consume(
+        outbox.GROUP, outbox.publish_batch,
+        stream=outbox.OUTBOX_KEY, stop=stop,
+        count=settings.outbox_batch_size, start="0",
+    )
+
+
+def _run_worker() -> None:
+    """Fetch-only replica: runs work units queued by the leader."""
+    from app import live_config, workqueue
+
+    live_config.start_listener()
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+    workqueue.work(stop)
+
+
+def _run_consumer(
+    group: str | None, source: str | None, profile: str | None,
+) -> None:
+    """Print stream entries as JSON lines through a consumer group.
+
+    With *source* (``x`` or ``github``) reads that source's stream
+    (needs STREAM_PER_SOURCE) instead of the merged one; *profile*
+    selects another profile's streams.
+    """
+    import json
+
+    from app import consumer
+    from app.config import settings
+    from app.store import DEFAULT_PROFILE, stream_key
+
+    def emit(batch: list[consumer.Entry]) -> None:
+        for entry in batch:
+            print(json.dumps({"id": entry.id, **entry.fields}), flush=True)
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+    consumer.consume(
+        group or settings.consumer_group, emit,
+        consumer=settings.consumer_name or None,
+        stream=stream_key(source or None, profile or DEFAULT_PROFILE),
+        stop=stop,
+    )
+
+
+def _run_replay(path: str) -> None:
+    """Re-run recorded cycles offline and print what they queued.
+
+    Needs an empty Redis database (point REDIS_URL at a scratch one):
+    replayed cycles dedup and buffer against whatever is stored there.
+    Queued items are printed as JSON lines for diffing between runs.
+    """
+    import json
+
+    from app import outbox, recorder, store
+
+    if store.r.dbsize():
+        print(
+            "Replay needs an empty Redis database; "
+            "set REDIS_URL to a scratch one."
+        )
+        sys.exit(1)
+
+    stats = recorder.replay(path, {
+        "x": run_pipeline,
+        "github": run_github_pipeline,
+    })
+    for _, fields in store.r.xrange(outbox.OUTBOX_KEY):
+        rec = outbox.DECODERS[fields["source"]](fields["record"])
+        print(json.dumps({
+            "profile": fields.get("profile", store.DEFAULT_PROFILE),
+            "source": fields["source"],
+            "id": rec.id,
+            "priority": rec.verdict.priority,
+            "title": rec.verdict.short_title,
+        }))
+    logger.info(
+        "Replayed %d cycle(s) in %.3fs: %d call(s) served, %d missed.",
+        stats["cycles"], stats["seconds"], stats["served"],
+        stats["misses"],
+    )
+
+
+def _run_config(argv: list[str]) -> None:
+    """Show or change the live settings.
+
+    ``config`` lists them; ``config set NAME VALUE`` and ``config unset
+    NAME`` change one for every running process.
+    """
+    from app import live_config
+
+    if argv[:1] == ["set"] and len(argv) == 3:
+        live_config.set_value(argv[1], argv[2])
+    elif argv[:1] == ["unset"] and len(argv) == 2:
+        live_config.unset(argv[1])
+    elif argv:
+        print("Usage: python -m app.main config [set NAME VALUE|unset NAME]")
+        sys.exit(1)
+    else:
+        current = live_config.current()
+        overridden = live_config.overrides()
+        for field in sorted(live_config.DYNAMIC_FIELDS):
+            value = " ".join(str(getattr(current, field)).split())
+            origin = "redis" if field in overridden else "env"
+            print(f"{field.upper()} ({origin}): {value[:70]}")
+
+
+def _run_search(argv: list[str]) -> None:
+    """Query the archive: ``search [text] [--tag T] [--source x] ...``."""
+    import argparse
+    import json
+    import sqlite3
+
+    from app import archive
+
+    parser = argparse.ArgumentParser(prog="python -m app.main search")
+    parser.add_argument("query", nargs="?", default="",
+                        help="FTS5 query over title, TLDR, reason and text")
+    parser.add_argument("--source", choices=sorted(archive.SOURCES))
+    parser.add_argument("--profile")
+    parser.add_argument("--tag")
+    parser.add_argument("--priority", choices=["high", "medium"])
+    parser.add_argument("--since", help="first day, YYYY-MM-DD")
+    parser.add_argument("--until", help="last day, YYYY-MM-DD")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    try:
+        rows = archive.search(
+            args.query, source=args.source, profile=args.profile,
+            tag=args.tag, priority=args.priority, since=args.since,
+            until=args.until, limit=args.limit,
+        )
+    except sqlite3.OperationalError as e:
+        print(f"Bad search: {e}")
+        sys.exit(1)
+    for row in rows:
+        tags = ", ".join(json.loads(row["tags"]))
+        print(
+            f"{row['day']} [{row['source']}/{row['priority'] or '-'}] "
+            f"{row['title']}"
+        )
+        if row["tldr"]:
+            print(f"    {row['tldr']}")
+        print(f"    {row['link']}" + (f"  ({tags})" if tags else ""))
+
+
 def main() -> None:
     command = sys.argv[1] if len(sys.argv) > 1 else "scheduler"
 
@@ -115,13 +361,63 @@ def main() -> None:
         _run_scheduler()
     elif command == "pipeline":
         run_pipeline()
+        _drain_outbox()
     elif command == "github":
         run_github_pipeline()
+        _drain_outbox()
+    elif command == "publisher":
+        _run_publisher()
     elif command == "cleanup":
-        midnight_cleanup()
+        midnight_cleanup(sys.argv[2] if len(sys.argv) > 2 else None)
+    elif command == "digest":
+        from app import digest
+        digest.run_digests()
+    elif command == "archive":
+        if len(sys.argv) < 3:
+            print("Usage: python -m app.main archive <YYYY-MM-DD>")
+            sys.exit(1)
+        from app import archive
+        archive.archive_day(sys.argv[2])
+    elif command == "config":
+        try:
+            _run_config(sys.argv[2:])
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+    elif command == "search":
+        _run_search(sys.argv[2:])
+    elif command == "stream":
+        from app.x_stream import run_stream
+        run_stream()
+    elif command == "webhook":
+        from app.webhook import serve
+        serve()
+    elif command == "worker":
+        _run_worker()
+    elif command == "consume":
+        _run_consumer(
+            sys.argv[2] if len(sys.argv) > 2 else None,
+            sys.argv[3] if len(sys.argv) > 3 else None,
+            sys.argv[4] if len(sys.argv) > 4 else None,
+        )
+    elif command == "replay":
+        if len(sys.argv) < 3:
+            print("Usage: python -m app.main replay <archive file or dir>")
+            sys.exit(1)
+        _run_replay(sys.argv[2])
+    elif command == "budget":
+        from app import ratelimit
+        for endpoint, entry in ratelimit.report().items():
+            print(
+                f"{endpoint}: {entry['remaining']}/{entry['limit']} "
+                f"remaining, resets in {entry['resets_in']}s"
+            )
     else:
         print(f"Unknown command: {command}")
-        print("Usage: python -m app.main [scheduler|pipeline|github|cleanup]")
+        print(
+            "Usage: python -m app.main "
+            "[scheduler|worker|publisher|pipeline|stream|github|webhook|consume|replay|digest|archive|search|config|cleanup|budget]"
+        )
         sys.exit(1)
 
 
@@ -0,0 +1,173 @@
+import logging
+import threading
+
+import redis
+
+from app import consumer, digest, discord, profiles, store
+from app.config import settings
+from app.records import (
+    GitHubItem, XPost, decode_github_item, decode_x_post, encode,
+)
+
+logger = logging.getLogger(__name__)
+
+r = redis.from_url(settings.redis_url, decode_responses=True)
+
+OUTBOX_KEY = "outbox:publish"
+GROUP = "publisher"
+OUTBOX_MAXLEN = 10000
+# Idempotency records outlive the daily dedup keys they back up
+DONE_TTL_SECONDS = 2 * 86400
+
+DECODERS = {"x": decode_x_post, "github": decode_github_item}
+
+
+class PublishError(Exception):
+    """Discord is configured but did not create the thread."""
+
+
+def add(
+    source: str, records: list, profile: str = store.DEFAULT_PROFILE,
+) -> list:
+    """Queue records for the publisher; returns the ones this call claimed.
+
+    Each record is claimed, its post hash saved and its outbox entry
+    written in one atomic step, so a crash never leaves an item
+    claimed but unqueued and replicas never queue the same item twice.
+    Claims are per *profile*: every team can publish the same item.
+    """
+    queued = [
+        rec for rec in records
+        if store.claim_for_publish(
+            source, rec, OUTBOX_KEY,
+            {"source": source, "profile": profile, "record": encode(rec)},
+            OUTBOX_MAXLEN,
+            profile,
+        )
+    ]
+    if queued:
+        logger.info(
+            "Queued %d %s item(s) for publishing to %s: %s",
+            len(queued), source, profile, [rec.id for rec in queued],
+        )
+    return queued
+
+
+def _publish(
+    source: str, rec: XPost | GitHubItem, profile: profiles.Profile,
+) -> None:
+    # Idempotency key: a replayed entry reuses the thread it created
+    done_key = store.scoped(f"outbox_done:{source}:{rec.id}", profile.name)
+    thread_id = r.hget(done_key, "thread_id")
+    if thread_id is None:
+        channel = profile.discord_channel_id
+        if not digest.is_immediate(source, rec):
+            # Left for the next digest thread (app.digest)
+            channel = ""
+        create = (
+            discord.post_news if source == "x"
+            else discord.post_github_news
+        )
+        # A profile without a channel publishes to its stream only
+        thread_id = create(rec, channel) if channel else ""
+        if thread_id is None and discord.is_configured(channel):
+            raise PublishError(f"No Discord thread for {rec.id}")
+        thread_id = thread_id or ""
+        pipe = r.pipeline()
+        pipe.hset(done_key, "thread_id", thread_id)
+        pipe.expire(done_key, DONE_TTL_SECONDS)
+        pipe.execute()
+
+    if source == "x":
+        if thread_id:
+            rec.discord_thread_id = thread_id
+            store.save_thread_id(rec.id, thread_id, profile.name)
+        store.publish_to_stream(rec, profile.name)
+        logger.info(
+            "PUBLISHED [%s] %s\n  Link: %s\n  Text: %s\n  TLDR: %s",
+            rec.id, rec.verdict.short_title, rec.link,
+            rec.text[:280], rec.verdict.tldr,
+        )
+    else:
+        if thread_id:
+            rec.discord_thread_id = thread_id
+            store.save_gh_thread_id(rec.id, thread_id, profile.name)
+        store.publish_gh_to_stream(rec, profile.name)
+        logger.info(
+            "PUBLISHED GH [%s] %s\n  URL: %s\n  TLDR: %s",
+            rec.id, rec.verdict.short_title, rec.url, rec.verdict.tldr,
+        )
+
+
+def publish_batch(batch: list[consumer.Entry]) -> None:
+    """Publish a batch of outbox entries.
+
+    Entries that went through are acknowledged even if others fail;
+    the failures raise so the consumer retries only them.
+    """
+    done, failed = [], []
+    for entry in batch:
+        source = entry.fields.get("source", "")
+        try:
+            rec = DECODERS[source](entry.fields["record"])
+            profile = profiles.get(
+                entry.fields.get("profile", store.DEFAULT_PROFILE),
+            )
+            _publish(source, rec, profile)
+        except Exception:
+            logger.error(
+                "Failed to publish outbox entry %s.", entry.id,
+                exc_info=True,
+            )
+            failed.append(entry.id)
+        else:
+            done.append(entry.id)
+    if failed:
+        consumer.ack(GROUP, done, OUTBOX_KEY)
+        raise PublishError(
+            f"{len(failed)} of {len(batch)} outbox entries failed",
+        )
+
+
+def start_publisher() -> threading.Event:
+    """Drain the outbox on a daemon thread; set the event to stop it."""
+    stop = threading.Event()
+    threading.Thread(
+        target=consumer.consume,
+        args=(GROUP, publish_batch),
+        kwargs={
+            "stream": OUTBOX_KEY,
+            "stop": stop,
+            "count": settings.outbox_batch_size,
+            "start": "0",
+        },
+        name="outbox-publisher",
+        daemon=True,
+    ).start()
+    return stop
+
+
+def drain() -> int:
+    """Publish everything currently in the outbox, then return.
+
+    For one-shot commands that have no publisher thread running.
+    """
+    consumer.ensure_group(GROUP, OUTBOX_KEY, start="0")
+    name = consumer.default_consumer()
+    published = 0
+    while True:
+        batch = consumer.reclaim(
+            GROUP, name, OUTBOX_KEY, count=settings.outbox_batch_size,
+        ) or consumer.read(
+            GROUP, name, OUTBOX_KEY, settings.outbox_batch_size,
+            block_ms=1,
+        )
+        if not batch:
+            return published
+        try:
+            publish_batch(batch)
+        except PublishError:
+            logger.warning("Outbox entries left pending for retry.")
+            return published
+        consumer.ack(GROUP, [e.id for e in batch], OUTBOX_KEY)
+        published += len(batch)
@@ -1,19 +1,34 @@
-import json
 import logging
+from dataclasses import replace
 
 import httpx
 
-from app import discord, store
+from app import (
+    batcher, http_client, live_config, outbox, profiles, ranking, ratelimit,
+    recorder, reputation, store,
+)
 from app.config import settings
 from app.fetcher import fetch_recent_posts
-from app.scorer import score_posts
+from app.records import XPost, decode_x_post
+from app.scorer import enrich_posts, score_posts
 
 logger = logging.getLogger(__name__)
 
 
 def run_pipeline() -> None:
     """Fetch -> filter -> score -> store -> publish cycle."""
+    try:
+        with (
+            http_client.cycle_budget(settings.cycle_budget_seconds),
+            recorder.cycle("x"),
+        ):
+            _run_cycle()
+    finally:
+        http_client.log_stats()
+        ratelimit.log_report()
+
 
+def _run_cycle() -> None:
     # 1. Fetch
     try:
         raw_posts = fetch_recent_posts()
@@ -31,9 +46,19 @@ def run_pipeline() -> None:
         logger.info("No posts fetched, skipping cycle.")
         return
 
+    process_posts(raw_posts, settings.fetch_interval_minutes)
+
+
+def process_posts(raw_posts: list[XPost], interval_minutes: int) -> None:
+    """Dedup -> gate -> score -> store -> publish for fetched posts.
+
+    Shared by search polling and the filtered stream consumer;
+    *interval_minutes* is how often the caller comes back, which the
+    scoring buffer uses to decide when a batch cannot wait longer.
+    """
     # 2. Filter out posts already seen in previous cycles
-    new_posts = [p for p in raw_posts if not store.is_known(p["id"])]
-    store.mark_known([p["id"] for p in new_posts])
+    new_posts = [p for p in raw_posts if not store.is_known(p.id)]
+    store.mark_known([p.id for p in new_posts])
 
     if not new_posts:
         logger.info("All %d fetched posts already known. Skipping.", len(raw_posts))
@@ -41,65 +66,105 @@ def run_pipeline() -> None:
 
     logger.info("Fetched %d posts, %d are new.", len(raw_posts), len(new_posts))
 
-    # 3. Drop low-engagement posts before calling Gemini
-    def _engagement(p: dict) -> int:
-        m = p.get("public_metrics", {})
-        return m.get("like_count", 0) + m.get("retweet_count", 0) + m.get("quote_count", 0)
+    # 3. Author reputation: skip chronic rejects, fast-track reliable authors
+    authors = reputation.load([p.author_id for p in new_posts])
 
-    engaged = [p for p in new_posts if _engagement(p) >= settings.min_engagement]
+    def _author(p: XPost) -> reputation.AuthorStats:
+        return authors.get(p.author_id) or reputation.AuthorStats()
+
+    candidates = [p for p in new_posts if not _author(p).skip]
+    if len(candidates) < len(new_posts):
+        logger.info("Reputation filter: skipped %d post(s) from low-pass authors.",
+                    len(new_posts) - len(candidates))
+
+    # 4. Drop low-engagement posts before calling Gemini
+    min_engagement = live_config.current().min_engagement
+    engaged = [
+        p for p in candidates
+        if p.engagement >= min_engagement or _author(p).fast_track
+    ]
     if not engaged:
         logger.info("All %d new posts below engagement threshold (%d). Skipping.",
-                     len(new_posts), settings.min_engagement)
+                     len(candidates), min_engagement)
         return
 
-    logger.info("Engagement filter: %d -> %d posts (min %d).",
-                len(new_posts), len(engaged), settings.min_engagement)
+    logger.info("Engagement filter: %d -> %d posts (min %d, %d fast-tracked).",
+                len(candidates), len(engaged), min_engagement,
+                sum(1 for p in engaged if p.engagement < min_engagement))
 
-    # 4. Score against ALIGNMENTS via Gemini
-    try:
-        scored = score_posts(engaged)
-    except json.JSONDecodeError:
-        logger.error("Gemini returned invalid JSON. Skipping cycle.")
-        return
-    except Exception:
-        logger.error("Scoring failed.", exc_info=True)
+    # 5. Micro-batch across cycles; fast-tracked authors flush right away
+    batcher.add("x", engaged)
+    engaged = batcher.take_ready(
+        "x", decode_x_post, interval_minutes,
+        force=any(_author(p).fast_track for p in engaged),
+    )
+    if not engaged:
+        logger.info("Buffered candidates (%d pending), waiting for a fuller batch.",
+                    batcher.pending("x"))
         return
 
-    if not scored:
-        logger.info("No posts passed the relevance filter.")
+    # Buffered posts from earlier cycles may have authors not loaded yet
+    missing = [p.author_id for p in engaged if p.author_id not in authors]
+    if missing:
+        authors.update(reputation.load(missing))
+
+    engaged.sort(key=lambda p: _author(p).score, reverse=True)
+    seen_authors = [p.author_id for p in engaged]
+
+    # 6-8. Score, rank and queue once per profile, in parallel
+    results = profiles.fan_out(
+        lambda profile: _select(profile, engaged, authors),
+    )
+    if None in results.values():
+        # Already marked known, so a dropped batch would never come
+        # back; profiles that did score it have claimed their picks
+        batcher.restore("x", engaged)
         return
+    batcher.record_batch("x", engaged)
+    outcomes = list(results.values())
+
+    # Reputation is shared: an author passes if any profile wanted them
+    passed = {p.id: p for scored, _ in outcomes for p in scored}
+    high = {p.id for scored, _ in outcomes for p in scored
+            if p.verdict.priority == "high"}
+    queued = {p.id for _, top in outcomes for p in top}
+    reputation.record(
+        authors,
+        seen_authors,
+        [p.author_id for p in passed.values()],
+        [p.author_id for p in passed.values() if p.id in high],
+        [p.author_id for p in passed.values() if p.id in queued],
+    )
+    logger.info("Cycle complete. Queued %d new post(s) for publishing.",
+                sum(len(top) for _, top in outcomes))
+
+
+def _select(
+    profile: profiles.Profile,
+    engaged: list[XPost],
+    authors: dict[str, reputation.AuthorStats],
+) -> tuple[list[XPost], list[XPost]]:
+    """Classify, rank, enrich and queue posts for one profile.
+
+    Returns (passed, queued). Only the top N are enriched, so Gemini
+    writes titles and summaries just for what gets published.
+    """
+    # Verdicts differ per profile, so each scores its own copies
+    scored = score_posts([replace(p) for p in engaged], profile)
+    if not scored:
+        logger.info("No posts passed the relevance filter for %s.",
+                    profile.name)
+        return [], []
 
-    # 5. Select top N
-    top = scored[: settings.top_n]
+    scored = ranking.rank_posts(
+        scored, {a: s.score for a, s in authors.items()},
+    )
+    top = scored[: profile.top_n]
+    enrich_posts(top, profile)
     logger.info(
-        "Top %d posts: %s",
+        "Top %d posts for %s: %s",
         len(top),
-        [(p.get("short_title", "?"), p.get("priority", "?")) for p in top],
+        profile.name,
+        [(p.verdict.short_title, p.verdict.priority) for p in top],
     )
-
-    # 6. Store and publish
-    published_count = 0
-    for post in top:
-        try:
-            is_new = store.save_post(post)
-            if is_new:
-                thread_id = discord.post_news(post)
-                if thread_id:
-                    post["discord_thread_id"] = thread_id
-                    store.save_thread_id(post["id"], thread_id)
-                store.publish_to_stream(post)
-                logger.info(
-                    "PUBLISHED [%s] %s\n  Link: %s\n  Text: %s\n  TLDR: %s",
-                    post["id"],
-                    post.get("short_title", ""),
-                    f"https://x.com/i/status/{post['id']}",
-                    post.get("text", "")[:280],
-                    post.get("tldr", ""),
-                )
-                published_count += 1
-            else:
-                logger.info("Skipped (already published): [%s]", post["id"])
-        except Exception:
-            logger.error("Failed to store/publish post %s.", post["id"], exc_info=True)
-
-    logger.info("Cycle complete. Published %d new post(s).", published_count)
+    return scored, outbox.add("x", top, profile.name)
@@ -0,0 +1,148 @@
+import contextvars
+import json
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, TypeVar
+
+from app import live_config
+from app.config import settings
+from app.store import DEFAULT_PROFILE
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Profile names end up in Redis keys and Gemini cache names
+NAME_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,31}$")
+
+
+@dataclass(frozen=True, slots=True)
+class Profile:
+    """One team's view of the shared fetch: what passes, where it goes."""
+
+    name: str
+    alignments: str
+    discord_channel_id: str
+    top_n: int
+    github_top_n: int
+    # Empty means the standard GitHub filter prompt
+    github_prompt: str = ""
+
+    def gemini_name(self, source: str) -> str:
+        """Cache/usage name of this profile's scorer for *source*."""
+        if self.name == DEFAULT_PROFILE:
+            return source
+        return f"{source}:{self.name}"
+
+
+def default() -> Profile:
+    """The deployment's own (live) settings as a profile."""
+    current = live_config.current()
+    return Profile(
+        name=DEFAULT_PROFILE,
+        alignments=current.alignments,
+        discord_channel_id=settings.discord_channel_id,
+        top_n=current.top_n,
+        github_top_n=current.github_top_n,
+        github_prompt=current.github_prompt,
+    )
+
+
+def _read_text(entry: dict, field: str, base_dir: str) -> str:
+    """Inline *field*, or the contents of ``<field>_file``."""
+    path = entry.get(f"{field}_file")
+    if not path:
+        return entry.get(field, "")
+    with open(os.path.join(base_dir, path), encoding="utf-8") as f:
+        return f.read()
+
+
+@live_config.per_generation
+def load() -> tuple[Profile, ...]:
+    """The default profile plus every profile in PROFILES_FILE.
+
+    The file is a JSON list of objects with ``name``, ``alignments``
+    (or ``alignments_file``, relative to the profiles file) and
+    optionally ``discord_channel_id``, ``top_n``, ``github_top_n`` and
+    ``github_prompt``/``github_prompt_file``. Re-read whenever the live
+    config (app.live_config) changes.
+    """
+    profiles = [default()]
+    if not settings.profiles_file:
+        return tuple(profiles)
+
+    with open(settings.profiles_file, encoding="utf-8") as f:
+        entries = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(settings.profiles_file))
+    for entry in entries:
+        name = entry.get("name", "")
+        if not NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid profile name {name!r}.")
+        if any(p.name == name for p in profiles):
+            raise ValueError(f"Duplicate profile {name!r}.")
+        alignments = _read_text(entry, "alignments", base_dir)
+        if not alignments.strip():
+            raise ValueError(f"Profile {name!r} has no alignments.")
+        profiles.append(Profile(
+            name=name,
+            alignments=alignments,
+            discord_channel_id=entry.get("discord_channel_id", ""),
+            top_n=int(entry.get("top_n", profiles[0].top_n)),
+            github_top_n=int(
+                entry.get("github_top_n", profiles[0].github_top_n),
+            ),
+            github_prompt=_read_text(entry, "github_prompt", base_dir),
+        ))
+    logger.info(
+        "Loaded %d profile(s): %s",
+        len(profiles), ", ".join(p.name for p in profiles),
+    )
+    return tuple(profiles)
+
+
+def get(name: str) -> Profile:
+    for profile in load():
+        if profile.name == name:
+            return profile
+    raise KeyError(f"Unknown profile {name!r}")
+
+
+def names() -> list[str]:
+    return [p.name for p in load()]
+
+
+def fan_out(run: Callable[[Profile], T]) -> dict[str, T | None]:
+    """Call *run* once per profile, in parallel; returns results by name.
+
+    A profile whose call raises is logged and maps to None, so one
+    team's scoring failure does not cost the others their cycle.
+    """
+    profiles = load()
+
+    def guarded(profile: Profile) -> T | None:
+        try:
+            return run(profile)
+        except Exception:
+            logger.error(
+                "Profile %s failed this cycle.", profile.name,
+                exc_info=True,
+            )
+            return None
+
+    if len(profiles) == 1:
+        return {profiles[0].name: guarded(profiles[0])}
+
+    with ThreadPoolExecutor(
+        max_workers=len(profiles), thread_name_prefix="profile",
+    ) as pool:
+        # Each call keeps the caller's cycle deadline
+        futures = {
+            p.name: pool.submit(
+                contextvars.copy_context().run, guarded, p,
+            )
+            for p in profiles
+        }
+        return {name: future.result() for name, future in futures.items()}
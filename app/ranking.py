@@ -0,0 +1,178 @@
+import logging
+from datetime import datetime
+
+import numpy as np
+
+from app import clock, live_config
+from app.records import GitHubItem, XPost
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_VALUE = {"high": 1.0, "medium": 0.5}
+
+DEFAULT_WEIGHTS = {
+    "priority": 3.0,
+    "velocity": 1.0,
+    "author": 1.0,
+    "tags": 1.0,
+}
+
+# Interactions per hour count retweets/quotes double: they carry the
+# post to new audiences, likes and replies mostly do not.
+X_ENGAGEMENT_WEIGHTS = {
+    "like_count": 1.0,
+    "retweet_count": 2.0,
+    "quote_count": 2.0,
+    "reply_count": 1.0,
+}
+
+
+def _parse_weights(raw: str) -> dict[str, float]:
+    """Parse ``name=value,name=value`` into a dict, skipping junk."""
+    weights = {}
+    for part in raw.split(","):
+        name, sep, value = part.partition("=")
+        if not sep or not name.strip():
+            continue
+        try:
+            weights[name.strip()] = float(value)
+        except ValueError:
+            logger.warning("Ignoring bad ranking weight %r.", part)
+    return weights
+
+
+def _weights() -> dict[str, float]:
+    weights = live_config.current().rank_weights
+    return {**DEFAULT_WEIGHTS, **_parse_weights(weights)}
+
+
+def _tag_weights() -> dict[str, float]:
+    return _parse_weights(live_config.current().rank_tag_weights)
+
+
+def _age_hours(created_at: list[str], now: datetime) -> np.ndarray:
+    ages = np.empty(len(created_at))
+    for i, value in enumerate(created_at):
+        try:
+            dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            ages[i] = (now - dt).total_seconds() / 3600
+        except ValueError:
+            ages[i] = np.nan
+    # Unknown or future timestamps count as one hour old
+    return np.where(np.isnan(ages) | (ages < 1 / 60), 1.0, ages)
+
+
+def _normalized(values: np.ndarray) -> np.ndarray:
+    """Scale to [0, 1] across the candidate set."""
+    peak = values.max(initial=0.0)
+    return values / peak if peak > 0 else np.zeros_like(values)
+
+
+def _combine(
+    priority: np.ndarray,
+    velocity: np.ndarray,
+    author: np.ndarray,
+    tags: np.ndarray,
+    weights: dict[str, float],
+) -> np.ndarray:
+    return (
+        weights["priority"] * priority
+        + weights["velocity"] * _normalized(np.log1p(velocity))
+        + weights["author"] * author
+        + weights["tags"] * tags
+    )
+
+
+def _priority_and_tags(
+    records: list, tag_weights: dict[str, float],
+) -> tuple[np.ndarray, np.ndarray]:
+    priority = np.array([
+        PRIORITY_VALUE.get(r.verdict.priority, 0.0) for r in records
+    ])
+    tags = np.array([
+        max((tag_weights.get(t, 0.0) for t in r.verdict.tags), default=0.0)
+        for r in records
+    ])
+    return priority, tags
+
+
+def post_scores(
+    posts: list[XPost],
+    now: datetime,
+    author_scores: dict[str, float] | None = None,
+    weights: dict[str, float] | None = None,
+    tag_weights: dict[str, float] | None = None,
+) -> np.ndarray:
+    """Ranking score per scored post. Pure, so it replays offline."""
+    if not posts:
+        return np.zeros(0)
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    tag_weights = tag_weights or {}
+    author_scores = author_scores or {}
+
+    metrics = np.array([
+        [getattr(p, field) for field in X_ENGAGEMENT_WEIGHTS]
+        for p in posts
+    ], dtype=float)
+    engagement = metrics @ np.array(list(X_ENGAGEMENT_WEIGHTS.values()))
+    velocity = engagement / _age_hours([p.created_at for p in posts], now)
+    author = np.array([author_scores.get(p.author_id, 0.0) for p in posts])
+    priority, tags = _priority_and_tags(posts, tag_weights)
+    return _combine(priority, velocity, author, tags, weights)
+
+
+def github_scores(
+    items: list[GitHubItem],
+    now: datetime,
+    weights: dict[str, float] | None = None,
+    tag_weights: dict[str, float] | None = None,
+) -> np.ndarray:
+    """Ranking score per scored GitHub item, from reactions/comments."""
+    if not items:
+        return np.zeros(0)
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    tag_weights = tag_weights or {}
+
+    engagement = np.array([
+        it.reactions_count + it.comments_count for it in items
+    ], dtype=float)
+    velocity = engagement / _age_hours([it.created_at for it in items], now)
+    priority, tags = _priority_and_tags(items, tag_weights)
+    return _combine(priority, velocity, np.zeros(len(items)), tags, weights)
+
+
+def _order(records: list, scores: np.ndarray) -> list:
+    # Stable on ties so equal scores keep Gemini's order
+    return [records[i] for i in np.argsort(-scores, kind="stable")]
+
+
+def rank_posts(
+    posts: list[XPost],
+    author_scores: dict[str, float] | None = None,
+    now: datetime | None = None,
+) -> list[XPost]:
+    """Order scored posts by the configured ranking formula."""
+    now = now or clock.now()
+    scores = post_scores(
+        posts, now, author_scores, _weights(), _tag_weights(),
+    )
+    logger.info(
+        "Ranked %d posts: %s",
+        len(posts),
+        [(p.id, round(float(s), 3)) for p, s in zip(posts, scores)],
+    )
+    return _order(posts, scores)
+
+
+def rank_github_items(
+    items: list[GitHubItem], now: datetime | None = None,
+) -> list[GitHubItem]:
+    """Order scored GitHub items by the configured ranking formula."""
+    now = now or clock.now()
+    scores = github_scores(items, now, _weights(), _tag_weights())
+    logger.info(
+        "Ranked %d GH items: %s",
+        len(items),
+        [(it.id, round(float(s), 3)) for it, s in zip(items, scores)],
+    )
+    return _order(items, scores)
@@ -0,0 +1,170 @@
+import logging
+import time
+
+import httpx
+import redis
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+r = redis.from_url(settings.redis_url, decode_responses=True)
+
+# X uses x-rate-limit-*, GitHub uses x-ratelimit-* (headers are
+# case-insensitive in httpx).
+HEADER_PREFIXES = ("x-rate-limit-", "x-ratelimit-")
+# X and GitHub windows are 15 minutes and an hour; a window that
+# rolled over before any response is assumed to be the shorter one
+DEFAULT_WINDOW_SECONDS = 900
+
+# Store response headers without giving back calls reserved by take()
+# that the server has not counted yet. KEYS[1]=entry; ARGV: limit,
+# remaining, reset, updated_at
+_RECORD_SCRIPT = """
+local remaining = tonumber(ARGV[2])
+if redis.call('HGET', KEYS[1], 'reset') == ARGV[3] then
+    local held = tonumber(redis.call('HGET', KEYS[1], 'remaining'))
+    if held and held < remaining then
+        remaining = held
+    end
+end
+redis.call(
+    'HSET', KEYS[1], 'limit', ARGV[1], 'remaining', remaining,
+    'reset', ARGV[3], 'updated_at', ARGV[4]
+)
+if tonumber(ARGV[3]) > 0 then
+    redis.call('EXPIREAT', KEYS[1], tonumber(ARGV[3]) + 3600)
+end
+"""
+
+# Reserve one call if the budget allows. Returns 1 when reserved (or
+# no limit is known yet). KEYS[1]=entry; ARGV: now, reserve, window
+_TAKE_SCRIPT = """
+local data = redis.call('HMGET', KEYS[1], 'limit', 'remaining', 'reset')
+if not data[1] then
+    return 1
+end
+local now = tonumber(ARGV[1])
+local remaining = tonumber(data[2]) or 0
+if (tonumber(data[3]) or 0) <= now then
+    remaining = tonumber(data[1])
+    redis.call(
+        'HSET', KEYS[1], 'remaining', remaining,
+        'reset', now + tonumber(ARGV[3])
+    )
+end
+if remaining - tonumber(ARGV[2]) <= 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'remaining', remaining - 1)
+return 1
+"""
+
+
+def _key(api: str, endpoint: str) -> str:
+    return f"ratelimit:{api}:{endpoint}"
+
+
+def record(api: str, endpoint: str, resp: httpx.Response) -> None:
+    """Store the rate-limit headers of a response in the ledger.
+
+    GitHub reports which shared bucket the call counted against
+    (``core``, ``search``, ``graphql``) and that overrides *endpoint*.
+    """
+    headers = resp.headers
+    for prefix in HEADER_PREFIXES:
+        remaining = headers.get(f"{prefix}remaining")
+        if remaining is not None:
+            break
+    else:
+        return
+
+    endpoint = headers.get(f"{prefix}resource", endpoint)
+    try:
+        values = (
+            int(headers.get(f"{prefix}limit", "0")),
+            int(remaining),
+            int(headers.get(f"{prefix}reset", "0")),
+        )
+    except ValueError:
+        logger.warning(
+            "Unparseable rate-limit headers from %s %s.", api, endpoint,
+        )
+        return
+
+    r.eval(
+        _RECORD_SCRIPT, 1, _key(api, endpoint), *values, int(time.time()),
+    )
+
+
+def budget(api: str, endpoint: str) -> int | None:
+    """Calls still available in the current window, minus the reserve.
+
+    Returns None when the endpoint has not been seen yet (no limit is
+    known), and the full limit once the stored window has reset.
+    """
+    entry = r.hgetall(_key(api, endpoint))
+    if not entry:
+        return None
+    if int(entry.get("reset", 0)) <= time.time():
+        available = int(entry.get("limit", 0))
+    else:
+        available = int(entry.get("remaining", 0))
+    return max(0, available - settings.rate_limit_reserve)
+
+
+def take(api: str, endpoint: str) -> bool:
+    """Reserve one call from the budget; False once it is spent.
+
+    Atomic, so workers sharing the ledger cannot all spend the same
+    remaining calls. Unknown endpoints are not limited.
+    """
+    return bool(r.eval(
+        _TAKE_SCRIPT, 1, _key(api, endpoint),
+        int(time.time()), settings.rate_limit_reserve,
+        DEFAULT_WINDOW_SECONDS,
+    ))
+
+
+def rotate(name: str, items: list, count: int) -> list:
+    """Pick *count* items, starting where the previous cycle stopped.
+
+    Lets a short budget cover the whole list over several cycles
+    instead of always serving the same head of it.
+    """
+    if count >= len(items):
+        return list(items)
+    if count <= 0:
+        return []
+    end = r.incrby(f"ratelimit_cursor:{name}", count)
+    start = end - count
+    return [items[(start + i) % len(items)] for i in range(count)]
+
+
+def report() -> dict[str, dict]:
+    """Current ledger entry for every known endpoint."""
+    result = {}
+    now = time.time()
+    for key in r.scan_iter(match="ratelimit:*", count=100):
+        entry = r.hgetall(key)
+        if not entry:
+            continue
+        reset = int(entry.get("reset", 0))
+        result[key.removeprefix("ratelimit:")] = {
+            "limit": int(entry.get("limit", 0)),
+            "remaining": (
+                int(entry.get("limit", 0)) if reset <= now
+                else int(entry.get("remaining", 0))
+            ),
+            "resets_in": max(0, int(reset - now)),
+        }
+    return dict(sorted(result.items()))
+
+
+def log_report() -> None:
+    for endpoint, entry in report().items():
+        logger.info(
+            "Rate limit %s: %d/%d remaining, resets in %ds.",
+            endpoint, entry["remaining"], entry["limit"],
+            entry["resets_in"],
+        )
@@ -0,0 +1,263 @@
+import contextvars
+import glob
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import httpx
+
+from app import clock
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+FILE_PATTERN = "record-*.jsonl.gz"
+# Query parameters derived from the clock or stored watermarks; replay
+# matches requests without them
+VOLATILE_PARAMS = frozenset({"start_time", "end_time", "since"})
+# Transport headers that no longer describe the stored (decoded) body
+DROPPED_HEADERS = frozenset(
+    {"content-encoding", "content-length", "transfer-encoding"},
+)
+
+_cycle: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "record_cycle", default=None,
+)
+_player: contextvars.ContextVar["Player | None"] = contextvars.ContextVar(
+    "replay_player", default=None,
+)
+
+
+class ReplayMiss(httpx.HTTPError):
+    """A replayed cycle made a call the archive has no answer for."""
+
+
+class _Writer:
+    """Appends lines to a gzip archive, rolling over at RECORD_ROTATE_MB.
+
+    Each flush ends a complete gzip block, so a file that is still
+    being written (or was cut short by a crash) reads back up to the
+    last finished cycle.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.raw = None
+        self.file: gzip.GzipFile | None = None
+
+    def write(self, line: dict) -> None:
+        data = (json.dumps(line, separators=(",", ":")) + "\n").encode()
+        with self.lock:
+            limit = settings.record_rotate_mb * 1024 * 1024
+            if self.file is None or self.raw.tell() >= limit:
+                self._rotate()
+            self.file.write(data)
+
+    def flush(self) -> None:
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+
+    def _rotate(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.raw.close()
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        path = os.path.join(
+            self.directory, f"record-{stamp}-{os.getpid()}.jsonl.gz",
+        )
+        self.raw = open(path, "ab")
+        self.file = gzip.GzipFile(fileobj=self.raw, mode="ab")
+        logger.info("Recording cycles to %s.", path)
+
+        files = sorted(glob.glob(os.path.join(self.directory, FILE_PATTERN)))
+        for old in files[: max(0, len(files) - settings.record_keep_files)]:
+            os.remove(old)
+
+
+_writer: _Writer | None = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer() -> _Writer:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = _Writer(settings.record_dir)
+        return _writer
+
+
+def _write(kind: str, **fields) -> None:
+    cycle_id = _cycle.get()
+    if cycle_id is None:
+        return
+    _get_writer().write({"kind": kind, "cycle": cycle_id, **fields})
+
+
+@contextmanager
+def cycle(pipeline: str):
+    """Record what this block fetches and scores as one *pipeline* cycle.
+
+    A no-op unless RECORD_DIR is set, and while replaying.
+    """
+    if not settings.record_dir or _player.get() is not None:
+        yield
+        return
+    cycle_id = uuid.uuid4().hex
+    token = _cycle.set(cycle_id)
+    _write("cycle", pipeline=pipeline, ts=clock.time())
+    try:
+        yield
+    finally:
+        _cycle.reset(token)
+        _get_writer().flush()
+
+
+def _http_key(method: str, url: str, params: dict | None) -> str:
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query.update({k: str(v) for k, v in (params or {}).items()})
+    stable = sorted(
+        (k, v) for k, v in query.items() if k not in VOLATILE_PARAMS
+    )
+    return f"{method.upper()} {parts.path}?{urlencode(stable)}"
+
+
+def _gemini_key(name: str, contents: str) -> str:
+    digest = hashlib.sha256(contents.encode()).hexdigest()[:16]
+    return f"{name}:{digest}"
+
+
+def http(
+    method: str, url: str, params: dict | None, resp: httpx.Response,
+) -> None:
+    """Record a response received inside a recorded cycle."""
+    if _cycle.get() is None:
+        return
+    _write(
+        "http",
+        key=_http_key(method, url, params),
+        status=resp.status_code,
+        headers={
+            k: v for k, v in resp.headers.items()
+            if k.lower() not in DROPPED_HEADERS
+        },
+        body=resp.text,
+    )
+
+
+def gemini(name: str, contents: str, text: str) -> None:
+    """Record a Gemini answer given inside a recorded cycle."""
+    if _cycle.get() is None:
+        return
+    _write("gemini", key=_gemini_key(name, contents), text=text)
+
+
+class Player:
+    """Answers one cycle's calls from its recording, in recorded order."""
+
+    def __init__(self, lines: list[dict]) -> None:
+        self.responses: dict[str, deque] = defaultdict(deque)
+        self.verdicts: dict[str, deque] = defaultdict(deque)
+        for line in lines:
+            if line["kind"] == "http":
+                self.responses[line["key"]].append(line)
+            elif line["kind"] == "gemini":
+                self.verdicts[line["key"]].append(line["text"])
+        self.served = 0
+        self.misses = 0
+
+    def response(
+        self, method: str, url: str, params: dict | None,
+    ) -> httpx.Response:
+        key = _http_key(method, url, params)
+        queue = self.responses.get(key)
+        if not queue:
+            self.misses += 1
+            raise ReplayMiss(f"No recorded response for {key}")
+        line = queue.popleft()
+        self.served += 1
+        return httpx.Response(
+            line["status"],
+            headers=line["headers"],
+            content=line["body"].encode(),
+            request=httpx.Request(method, url, params=params),
+        )
+
+    def answer(self, name: str, contents: str) -> str:
+        key = _gemini_key(name, contents)
+        queue = self.verdicts.get(key)
+        if not queue:
+            self.misses += 1
+            raise ReplayMiss(f"No recorded Gemini answer for {key}")
+        self.served += 1
+        return queue.popleft()
+
+
+def player() -> Player | None:
+    """The active replay, if any; callers then skip the network."""
+    return _player.get()
+
+
+def load(path: str) -> list[tuple[dict, list[dict]]]:
+    """Recorded cycles from an archive file or directory, oldest first."""
+    if os.path.isdir(path):
+        files = sorted(glob.glob(os.path.join(path, FILE_PATTERN)))
+    else:
+        files = [path]
+
+    cycles: dict[str, tuple[dict, list[dict]]] = {}
+    for file in files:
+        with gzip.open(file, "rt", encoding="utf-8") as f:
+            try:
+                for raw in f:
+                    line = json.loads(raw)
+                    if line["kind"] == "cycle":
+                        cycles[line["cycle"]] = (line, [])
+                    elif line["cycle"] in cycles:
+                        cycles[line["cycle"]][1].append(line)
+            except (EOFError, json.JSONDecodeError):
+                # Still being written, or cut short by a crash
+                logger.info("%s ends mid-file; read to its last flush.", file)
+    return sorted(cycles.values(), key=lambda c: c[0]["ts"])
+
+
+def replay(path: str, runners: dict[str, Callable[[], None]]) -> dict:
+    """Re-run every recorded cycle in *path* offline, as fast as possible.
+
+    *runners* maps a recorded pipeline name (``x``, ``github``) to the
+    function that runs one cycle of it. Each cycle sees the clock
+    frozen at its recording time and gets its HTTP responses and
+    Gemini answers from the archive.
+    """
+    cycles = load(path)
+    stats = {"cycles": 0, "served": 0, "misses": 0}
+    started = time.perf_counter()
+    for header, lines in cycles:
+        run = runners.get(header["pipeline"])
+        if run is None:
+            continue
+        current = Player(lines)
+        token = _player.set(current)
+        try:
+            with clock.frozen_at(header["ts"]):
+                run()
+        finally:
+            _player.reset(token)
+        stats["cycles"] += 1
+        stats["served"] += current.served
+        stats["misses"] += current.misses
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    return stats
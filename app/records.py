@@ -0,0 +1,164 @@
+import json
+from dataclasses import asdict, dataclass, field
+
+# score_github_items only ever sends this much of a PR or issue body to
+# Gemini. Release notes are kept (up to the second limit) for
+# app.summarizer to read in full.
+GH_BODY_LIMIT = 500
+RELEASE_BODY_LIMIT = 60_000
+
+
+@dataclass(slots=True)
+class Verdict:
+    """Gemini's judgement on one item."""
+
+    priority: str
+    tags: list[str] = field(default_factory=list)
+    short_title: str = ""
+    reason: str = ""
+    tldr: str = ""
+    tips: str = ""
+
+    @classmethod
+    def from_gemini(cls, entry: dict) -> "Verdict":
+        return cls(
+            priority=entry["priority"],
+            tags=entry.get("tags", []),
+            short_title=entry.get("title", ""),
+            reason=entry.get("reason", ""),
+            tldr=entry.get("tldr", ""),
+            tips=entry.get("tips", ""),
+        )
+
+    def enrich(self, entry: dict) -> None:
+        """Fill in the prose fields from an enrichment answer."""
+        self.short_title = entry.get("title", "") or self.short_title
+        self.reason = entry.get("reason", "") or self.reason
+        self.tldr = entry.get("tldr", "") or self.tldr
+        self.tips = entry.get("tips", "") or self.tips
+
+
+@dataclass(slots=True)
+class XPost:
+    """An X post, keeping only the fields the pipeline reads."""
+
+    id: str
+    text: str
+    author_id: str = ""
+    username: str = ""
+    created_at: str = ""
+    like_count: int = 0
+    retweet_count: int = 0
+    quote_count: int = 0
+    reply_count: int = 0
+    verdict: Verdict | None = None
+    discord_thread_id: str = ""
+
+    @property
+    def engagement(self) -> int:
+        return self.like_count + self.retweet_count + self.quote_count
+
+    @property
+    def link(self) -> str:
+        return f"https://x.com/i/status/{self.id}"
+
+
+@dataclass(slots=True)
+class GitHubItem:
+    """A release, merged PR or issue, normalized across REST/GraphQL."""
+
+    id: str
+    repo: str
+    type: str
+    number: int
+    title: str
+    body: str
+    url: str
+    author: str
+    created_at: str
+    labels: list[str] = field(default_factory=list)
+    reactions_count: int = 0
+    comments_count: int = 0
+    # Digest of long release notes, written by app.summarizer
+    notes: str = ""
+    verdict: Verdict | None = None
+    discord_thread_id: str = ""
+
+
+def encode(record: XPost | GitHubItem) -> str:
+    """Serialize a record (and its verdict) for Redis."""
+    return json.dumps(asdict(record), separators=(",", ":"))
+
+
+def _decode(cls, data: str):
+    fields = json.loads(data)
+    verdict = fields.pop("verdict", None)
+    return cls(
+        **fields,
+        verdict=Verdict(**verdict) if verdict else None,
+    )
+
+
+def decode_x_post(data: str) -> XPost:
+    return _decode(XPost, data)
+
+
+def decode_github_item(data: str) -> GitHubItem:
+    return _decode(GitHubItem, data)
+
+
+@dataclass(slots=True)
+class SearchPage:
+    """One page of X search results."""
+
+    posts: list[XPost]
+    next_token: str | None = None
+
+
+def _x_post(raw: dict, users: dict[str, str]) -> XPost:
+    metrics = raw.get("public_metrics", {})
+    author_id = raw.get("author_id", "")
+    return XPost(
+        id=raw["id"],
+        text=raw.get("text", ""),
+        author_id=author_id,
+        username=users.get(author_id, ""),
+        created_at=raw.get("created_at", ""),
+        like_count=metrics.get("like_count", 0),
+        retweet_count=metrics.get("retweet_count", 0),
+        quote_count=metrics.get("quote_count", 0),
+        reply_count=metrics.get("reply_count", 0),
+    )
+
+
+def _users(payload: dict) -> dict[str, str]:
+    return {
+        u["id"]: u.get("username", "")
+        for u in payload.get("includes", {}).get("users", [])
+    }
+
+
+def decode_search(content: bytes) -> SearchPage:
+    """Decode an X search response body straight into records.
+
+    Only the fields XPost keeps are read; usernames from the
+    ``includes.users`` expansion are attached to their posts. Post
+    lookups (``/2/tweets?ids=``) share the shape.
+    """
+    payload = json.loads(content)
+    users = _users(payload)
+    return SearchPage(
+        posts=[_x_post(raw, users) for raw in payload.get("data", [])],
+        next_token=payload.get("meta", {}).get("next_token"),
+    )
+
+
+def decode_stream_line(line: bytes | str) -> XPost | None:
+    """Decode one filtered-stream line; None for keep-alives."""
+    if not line.strip():
+        return None
+    payload = json.loads(line)
+    raw = payload.get("data")
+    if not isinstance(raw, dict):
+        return None
+    return _x_post(raw, _users(payload))
@@ -0,0 +1,129 @@
+import logging
+from dataclasses import dataclass
+
+import redis
+
+from app import clock, live_config
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+r = redis.from_url(settings.redis_url, decode_responses=True)
+
+KEY_TTL_SECONDS = 90 * 24 * 3600
+
+
+@dataclass(slots=True)
+class AuthorStats:
+    """Exponentially decayed counts for one X author."""
+
+    seen: float = 0.0
+    passed: float = 0.0
+    high: float = 0.0
+    published: float = 0.0
+
+    @property
+    def pass_rate(self) -> float:
+        # Laplace-smoothed so a single verdict does not decide
+        return (self.passed + 1) / (self.seen + 2)
+
+    @property
+    def score(self) -> float:
+        """Author component for the ranking, in [0, 1]."""
+        high_rate = (self.high + 0.5) / (self.seen + 1)
+        return 0.7 * self.pass_rate + 0.3 * min(1.0, high_rate)
+
+    @property
+    def experienced(self) -> bool:
+        return self.seen >= settings.reputation_min_seen
+
+    @property
+    def skip(self) -> bool:
+        """Long history of rejections: not worth a Gemini slot."""
+        return (
+            self.experienced
+            and self.pass_rate < live_config.current().reputation_skip_rate
+        )
+
+    @property
+    def fast_track(self) -> bool:
+        """Consistently passes: skip the engagement gate."""
+        return (
+            self.experienced
+            and self.pass_rate
+            >= live_config.current().reputation_fast_track_rate
+        )
+
+
+def _decay(elapsed: float) -> float:
+    half_life = settings.reputation_half_life_days * 86400
+    if half_life <= 0 or elapsed <= 0:
+        return 1.0
+    return 0.5 ** (elapsed / half_life)
+
+
+def load(author_ids: list[str]) -> dict[str, AuthorStats]:
+    """Fetch decayed stats for all authors in one round trip."""
+    ids = sorted({a for a in author_ids if a})
+    if not ids:
+        return {}
+    pipe = r.pipeline()
+    for author_id in ids:
+        pipe.hgetall(f"author:{author_id}")
+    now = clock.time()
+
+    stats = {}
+    for author_id, raw in zip(ids, pipe.execute()):
+        if not raw:
+            stats[author_id] = AuthorStats()
+            continue
+        factor = _decay(now - float(raw.get("ts", now)))
+        stats[author_id] = AuthorStats(
+            seen=float(raw.get("seen", 0)) * factor,
+            passed=float(raw.get("passed", 0)) * factor,
+            high=float(raw.get("high", 0)) * factor,
+            published=float(raw.get("published", 0)) * factor,
+        )
+    return stats
+
+
+def record(
+    stats: dict[str, AuthorStats],
+    seen: list[str],
+    passed: list[str],
+    high: list[str],
+    published: list[str],
+) -> None:
+    """Add this cycle's outcomes (author ids, one per post) and save.
+
+    *stats* must come from load() in the same cycle; updated values are
+    written back in a single pipelined round trip.
+    """
+    touched = set()
+    for field, author_ids in (
+        ("seen", seen), ("passed", passed),
+        ("high", high), ("published", published),
+    ):
+        for author_id in author_ids:
+            if not author_id:
+                continue
+            entry = stats.setdefault(author_id, AuthorStats())
+            setattr(entry, field, getattr(entry, field) + 1)
+            touched.add(author_id)
+    if not touched:
+        return
+
+    now = clock.time()
+    pipe = r.pipeline()
+    for author_id in touched:
+        entry = stats[author_id]
+        key = f"author:{author_id}"
+        pipe.hset(key, mapping={
+            "seen": round(entry.seen, 4),
+            "passed": round(entry.passed, 4),
+            "high": round(entry.high, 4),
+            "published": round(entry.published, 4),
+            "ts": now,
+        })
+        pipe.expire(key, KEY_TTL_SECONDS)
+    pipe.execute()
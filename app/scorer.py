@@ -1,34 +1,80 @@
 import json
 import logging
 
-from google import genai
-
-from app.config import settings
+from app import gemini, profiles
+from app.records import Verdict, XPost
 
 logger = logging.getLogger(__name__)
 
-client = genai.Client(api_key=settings.gemini_api_key)
+# Phase 1 answers only what filtering and ranking need; tags stay
+# because RANK_TAG_WEIGHTS ranks on them.
+CLASSIFY_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "index": {"type": "INTEGER"},
+            "pass": {"type": "BOOLEAN"},
+            "priority": {"type": "STRING", "enum": ["high", "medium"]},
+            "tags": {"type": "ARRAY", "items": {"type": "STRING"}},
+        },
+        "required": ["index", "pass", "priority"],
+        "property_ordering": ["index", "pass", "priority", "tags"],
+    },
+}
+
+CLASSIFY_NOTE = (
+    "Classify the posts below. Return only index, pass, priority and "
+    "tags for the ones that pass; titles and summaries come later.\n\n"
+)
+ENRICH_NOTE = (
+    "The posts below already passed. Write the title, reason and tldr "
+    "for each, as described in your instructions.\n\n"
+)
+
+
+def enrichment_schema(*fields: str) -> dict:
+    """Phase 2 output: the index plus the given prose fields."""
+    return {
+        "type": "ARRAY",
+        "items": {
+            "type": "OBJECT",
+            "properties": {
+                "index": {"type": "INTEGER"},
+                **{f: {"type": "STRING"} for f in fields},
+            },
+            "required": ["index", *fields],
+            "property_ordering": ["index", *fields],
+        },
+    }
+
+
+ENRICH_SCHEMA = enrichment_schema("title", "reason", "tldr")
 
 
-def score_posts(posts: list[dict]) -> list[dict]:
-    """Filter and score posts against ALIGNMENTS using Gemini. Returns relevant posts sorted by priority."""
+def score_posts(
+    posts: list[XPost], profile: profiles.Profile | None = None,
+) -> list[XPost]:
+    """Filter and classify posts against a profile's ALIGNMENTS using Gemini. Returns relevant posts sorted by priority.
+
+    Verdicts carry priority and tags only; call enrich_posts() on the
+    posts that will be published.
+    """
     if not posts:
         return []
+    profile = profile or profiles.default()
 
     tweet_list = "\n".join(
-        f"[{i}] (id:{p['id']}) {p['text']}" for i, p in enumerate(posts)
+        f"[{i}] (id:{p.id}) {p.text}" for i, p in enumerate(posts)
     )
 
-    response = client.models.generate_content(
-        model=settings.gemini_model,
-        contents=tweet_list,
-        config={
-            "system_instruction": settings.alignments,
-            "response_mime_type": "application/json",
-        },
+    text = gemini.generate_json(
+        profile.gemini_name("x"), profile.alignments,
+        CLASSIFY_NOTE + tweet_list,
+        priority=gemini.PRIORITY_HIGH,
+        response_schema=CLASSIFY_SCHEMA,
     )
-
-    scored_list = json.loads(response.text)
+    scored_list = json.loads(text)
 
     post_map = {i: p for i, p in enumerate(posts)}
     priority_order = {"high": 0, "medium": 1}
@@ -36,21 +82,56 @@ def score_posts(posts: list[dict]) -> list[dict]:
     result = []
     for item in scored_list:
         idx = item["index"]
-        if idx in post_map:
-            enriched = post_map[idx].copy()
-            enriched["priority"] = item["priority"]
-            enriched["tags"] = item.get("tags", [])
-            enriched["short_title"] = item.get("title", "")
-            enriched["reason"] = item.get("reason", "")
-            enriched["tldr"] = item.get("tldr", "")
-            result.append(enriched)
+        if idx in post_map and item.get("pass", True):
+            post = post_map[idx]
+            post.verdict = Verdict.from_gemini(item)
+            result.append(post)
 
-    result.sort(key=lambda x: priority_order.get(x["priority"], 99))
+    result.sort(key=lambda x: priority_order.get(x.verdict.priority, 99))
 
     logger.info(
-        "Scored %d posts, %d passed filter. Priorities: %s",
+        "Scored %d posts for %s, %d passed filter. Priorities: %s",
         len(posts),
+        profile.name,
         len(result),
-        [f"{p['priority']}" for p in result],
+        [p.verdict.priority for p in result],
     )
     return result
+
+
+def enrich_posts(
+    posts: list[XPost], profile: profiles.Profile | None = None,
+) -> None:
+    """Write title, reason and TLDR for classified posts, in place.
+
+    Runs against the same cached system instruction as score_posts().
+    If the call fails, posts keep a title cut from their own text
+    rather than being dropped.
+    """
+    if not posts:
+        return
+    profile = profile or profiles.default()
+
+    tweet_list = "\n".join(
+        f"[{i}] (id:{p.id}) {p.text}" for i, p in enumerate(posts)
+    )
+    try:
+        text = gemini.generate_json(
+            profile.gemini_name("x"), profile.alignments,
+            ENRICH_NOTE + tweet_list,
+            priority=gemini.PRIORITY_HIGH,
+            response_schema=ENRICH_SCHEMA,
+        )
+        for item in json.loads(text):
+            idx = item.get("index")
+            if isinstance(idx, int) and 0 <= idx < len(posts):
+                posts[idx].verdict.enrich(item)
+    except Exception:
+        logger.error(
+            "Enriching %d post(s) for %s failed.",
+            len(posts), profile.name, exc_info=True,
+        )
+
+    for post in posts:
+        if not post.verdict.short_title:
+            post.verdict.short_title = post.text[:100]
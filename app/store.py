@@ -1,19 +1,37 @@
 import logging
+import time
 from datetime import datetime, timezone
 
 import redis
 
+from app import clock
 from app.config import settings
+from app.records import GitHubItem, XPost, encode
 
 logger = logging.getLogger(__name__)
 
 r = redis.from_url(settings.redis_url, decode_responses=True)
 
 STREAM_KEY = "stream:noticias"
+# Entry cap when STREAM_RETENTION_DAYS is 0
+STREAM_MAXLEN = 1000
+# Profile whose publishing keys carry no prefix
+DEFAULT_PROFILE = "default"
 
 
 def _today() -> str:
-    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    return clock.now().strftime("%Y-%m-%d")
+
+
+def scoped(key: str, profile: str = DEFAULT_PROFILE) -> str:
+    """*profile*'s own copy of a publishing key.
+
+    The default profile keeps the unprefixed names, so a single-profile
+    deployment sees exactly the keys it always had.
+    """
+    if profile == DEFAULT_PROFILE:
+        return key
+    return f"profile:{profile}:{key}"
 
 
 def is_known(tweet_id: str) -> bool:
@@ -25,53 +43,149 @@ def mark_known(tweet_ids: list[str]) -> None:
         r.sadd(f"known:{_today()}", *tweet_ids)
 
 
-def save_post(post: dict) -> bool:
-    """Save post hash to Redis. Returns True if the post has NOT been published yet."""
+# Per source: (post hash prefix, published set, claimed set)
+_DAY_KEYS = {
+    "x": ("post", "published", "claimed"),
+    "github": ("gh_post", "gh_published", "gh_claimed"),
+}
+
+# Claims an item and queues it for the publisher in one step.
+# KEYS: published set, claimed set, post hash, outbox stream
+# ARGV: item id, outbox maxlen, then hash field/value pairs up to the
+# "--" marker, then outbox entry field/value pairs.
+_CLAIM_SCRIPT = """
+if redis.call('SISMEMBER', KEYS[1], ARGV[1]) == 1 then
+    return 0
+end
+if redis.call('SADD', KEYS[2], ARGV[1]) == 0 then
+    return 0
+end
+local i = 3
+local post = {}
+while ARGV[i] ~= '--' do
+    table.insert(post, ARGV[i])
+    i = i + 1
+end
+redis.call('HSET', KEYS[3], unpack(post))
+local entry = {}
+for j = i + 1, #ARGV do
+    table.insert(entry, ARGV[j])
+end
+redis.call('XADD', KEYS[4], 'MAXLEN', '~', ARGV[2], '*', unpack(entry))
+return 1
+"""
+
+
+def claim_for_publish(
+    source: str,
+    post: XPost | GitHubItem,
+    outbox: str,
+    entry: dict[str, str],
+    maxlen: int,
+    profile: str = DEFAULT_PROFILE,
+) -> bool:
+    """Save the post hash and append *entry* to the *outbox* stream.
+
+    Atomic and first-wins: returns False, writing nothing, if the item
+    was already published or claimed today for *profile* (by any
+    replica).
+    """
     date = _today()
-    tweet_id = post["id"]
-    key = f"post:{date}:{tweet_id}"
-    link = f"https://x.com/i/status/{tweet_id}"
-
-    r.hset(key, mapping={
-        "link": link,
-        "short_title": post.get("short_title", ""),
+    prefix, published, claimed = _DAY_KEYS[source]
+    link_field = "link" if source == "x" else "url"
+    fields = {
+        link_field: post.link if source == "x" else post.url,
+        "short_title": post.verdict.short_title,
         "published": "0",
-        "discord_thread_id": post.get("discord_thread_id", ""),
-    })
-    mark_known([tweet_id])
+        "discord_thread_id": post.discord_thread_id,
+        # Full record and verdict, for the archive (see app.archive)
+        "record": encode(post),
+    }
+    args = [post.id, maxlen]
+    for field, value in fields.items():
+        args.extend([field, value])
+    args.append("--")
+    for field, value in entry.items():
+        args.extend([field, value])
+    return r.eval(
+        _CLAIM_SCRIPT, 4,
+        scoped(f"{published}:{date}", profile),
+        scoped(f"{claimed}:{date}", profile),
+        scoped(f"{prefix}:{date}:{post.id}", profile),
+        outbox,
+        *args,
+    ) == 1
+
+
+def save_thread_id(
+    tweet_id: str, thread_id: str, profile: str = DEFAULT_PROFILE,
+) -> None:
+    """Persist the Discord thread ID on an existing post hash."""
+    r.hset(
+        scoped(f"post:{_today()}:{tweet_id}", profile),
+        "discord_thread_id", thread_id,
+    )
 
-    return not r.sismember(f"published:{date}", tweet_id)
 
+def stream_key(
+    source: str | None = None, profile: str = DEFAULT_PROFILE,
+) -> str:
+    """Merged output stream, or the per-source one for *source*."""
+    key = f"{STREAM_KEY}:{source}" if source else STREAM_KEY
+    return scoped(key, profile)
 
-def save_thread_id(tweet_id: str, thread_id: str) -> None:
-    """Persist the Discord thread ID on an existing post hash."""
-    r.hset(f"post:{_today()}:{tweet_id}", "discord_thread_id", thread_id)
+
+def _trim_args() -> dict:
+    days = settings.stream_retention_days
+    if days <= 0:
+        return {"maxlen": STREAM_MAXLEN, "approximate": True}
+    cutoff_ms = int((time.time() - days * 86400) * 1000)
+    return {"minid": f"{cutoff_ms}-0", "approximate": True}
 
 
-def publish_to_stream(post: dict) -> None:
+def _append_to_stream(
+    source: str, fields: dict, profile: str = DEFAULT_PROFILE,
+) -> None:
+    """XADD to the merged stream and, if enabled, the source's stream.
+
+    Trimming is approximate (whole macro nodes) and by age, so a busy
+    day does not evict yesterday's entries.
+    """
+    trim = _trim_args()
+    pipe = r.pipeline()
+    pipe.xadd(stream_key(profile=profile), fields, **trim)
+    if settings.stream_per_source:
+        pipe.xadd(stream_key(source, profile), fields, **trim)
+    pipe.execute()
+
+
+def publish_to_stream(
+    post: XPost, profile: str = DEFAULT_PROFILE,
+) -> None:
     """Push a post to the presentation stream. Idempotent via published set."""
     date = _today()
-    tweet_id = post["id"]
+    tweet_id = post.id
+    published = scoped(f"published:{date}", profile)
 
-    if r.sismember(f"published:{date}", tweet_id):
+    if r.sismember(published, tweet_id):
         return
 
-    link = f"https://x.com/i/status/{tweet_id}"
     now = datetime.now(timezone.utc).isoformat()
 
-    r.xadd(STREAM_KEY, {
+    _append_to_stream("x", {
         "tweet_id": tweet_id,
-        "link": link,
-        "short_title": post.get("short_title", ""),
+        "link": post.link,
+        "short_title": post.verdict.short_title,
+        "source": "x",
         "published_at": now,
-    }, maxlen=1000)
+    }, profile)
 
-    r.sadd(f"published:{date}", tweet_id)
-    r.hset(f"post:{date}:{tweet_id}", "published", "1")
+    r.sadd(published, tweet_id)
+    r.hset(scoped(f"post:{date}:{tweet_id}", profile), "published", "1")
 
     logger.info(
         "Published to stream: [%s] %s",
-        tweet_id, post.get("short_title", ""),
+        tweet_id, post.verdict.short_title,
     )
 
 
@@ -86,51 +200,115 @@ def mark_gh_known(item_ids: list[str]) -> None:
         r.sadd(f"gh_known:{_today()}", *item_ids)
 
 
-def save_gh_post(post: dict) -> bool:
-    """Save GitHub post hash. Returns True if NOT yet published."""
-    date = _today()
-    item_id = post["id"]
-    key = f"gh_post:{date}:{item_id}"
-
-    r.hset(key, mapping={
-        "url": post.get("url", ""),
-        "short_title": post.get("short_title", ""),
-        "published": "0",
-        "discord_thread_id": post.get("discord_thread_id", ""),
-    })
-    mark_gh_known([item_id])
-
-    return not r.sismember(f"gh_published:{date}", item_id)
-
-
-def save_gh_thread_id(item_id: str, thread_id: str) -> None:
+def save_gh_thread_id(
+    item_id: str, thread_id: str, profile: str = DEFAULT_PROFILE,
+) -> None:
     """Persist Discord thread ID on a GitHub post hash."""
-    key = f"gh_post:{_today()}:{item_id}"
+    key = scoped(f"gh_post:{_today()}:{item_id}", profile)
     r.hset(key, "discord_thread_id", thread_id)
 
 
-def publish_gh_to_stream(post: dict) -> None:
+def publish_gh_to_stream(
+    post: GitHubItem, profile: str = DEFAULT_PROFILE,
+) -> None:
     """Push a GitHub item to the stream. Idempotent."""
     date = _today()
-    item_id = post["id"]
+    item_id = post.id
+    published = scoped(f"gh_published:{date}", profile)
 
-    if r.sismember(f"gh_published:{date}", item_id):
+    if r.sismember(published, item_id):
         return
 
     now = datetime.now(timezone.utc).isoformat()
 
-    r.xadd(STREAM_KEY, {
+    _append_to_stream("github", {
         "item_id": item_id,
-        "url": post.get("url", ""),
-        "short_title": post.get("short_title", ""),
+        "url": post.url,
+        "short_title": post.verdict.short_title,
         "source": "github",
+        "type": post.type,
         "published_at": now,
-    }, maxlen=1000)
+    }, profile)
 
-    r.sadd(f"gh_published:{date}", item_id)
-    r.hset(f"gh_post:{date}:{item_id}", "published", "1")
+    r.sadd(published, item_id)
+    r.hset(scoped(f"gh_post:{date}:{item_id}", profile), "published", "1")
 
     logger.info(
         "Published GH to stream: [%s] %s",
-        item_id, post.get("short_title", ""),
+        item_id, post.verdict.short_title,
     )
+
+
+# --------------- X account activity ---------------
+
+ACTIVITY_KEY = "x_activity"
+ACTIVITY_DECAY = 0.7
+
+
+def get_account_activity(accounts: list[str]) -> dict[str, float]:
+    """Return the decayed posts-per-cycle average for known accounts."""
+    if not accounts:
+        return {}
+    names = [a.lower() for a in accounts]
+    values = r.hmget(ACTIVITY_KEY, names)
+    return {
+        name: float(v)
+        for name, v in zip(names, values)
+        if v is not None
+    }
+
+
+def record_account_activity(
+    accounts: list[str], counts: dict[str, int],
+) -> None:
+    """Fold this cycle's per-account post counts into the average."""
+    if not accounts:
+        return
+    current = get_account_activity(accounts)
+    mapping = {}
+    for acct in accounts:
+        name = acct.lower()
+        mapping[name] = round(
+            current.get(name, 0.0) * ACTIVITY_DECAY
+            + counts.get(name, 0) * (1 - ACTIVITY_DECAY),
+            3,
+        )
+    r.hset(ACTIVITY_KEY, mapping=mapping)
+
+
+# --------------- GitHub watermarks ---------------
+
+def get_gh_watermarks(repos: list[str]) -> dict[str, dict[str, str]]:
+    """Last-seen timestamp per endpoint for each repo, in one round trip."""
+    pipe = r.pipeline()
+    for repo in repos:
+        pipe.hgetall(f"gh_watermark:{repo}")
+    return dict(zip(repos, pipe.execute()))
+
+
+def set_gh_watermark(repo: str, endpoint: str, value: str) -> None:
+    """Advance *endpoint*'s watermark, ending any paging backlog."""
+    pipe = r.pipeline()
+    pipe.hset(f"gh_watermark:{repo}", endpoint, value)
+    pipe.hdel(
+        f"gh_watermark:{repo}",
+        f"{endpoint}:resume_page", f"{endpoint}:resume_mark",
+    )
+    pipe.execute()
+
+
+def get_gh_resume(repo: str, endpoint: str) -> tuple[int, str] | None:
+    """Next page and pending watermark of a listing cut short by the cap."""
+    page, mark = r.hmget(
+        f"gh_watermark:{repo}",
+        f"{endpoint}:resume_page", f"{endpoint}:resume_mark",
+    )
+    return (int(page), mark) if page else None
+
+
+def set_gh_resume(repo: str, endpoint: str, page: int, mark: str) -> None:
+    """Keep the watermark; continue the listing from *page* next cycle."""
+    r.hset(f"gh_watermark:{repo}", mapping={
+        f"{endpoint}:resume_page": page,
+        f"{endpoint}:resume_mark": mark,
+    })
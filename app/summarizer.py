@@ -0,0 +1,168 @@
+import contextvars
+import hashlib
+import json
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+import redis
+
+from app import gemini, recorder
+from app.config import settings
+from app.records import GitHubItem
+
+logger = logging.getLogger(__name__)
+
+r = redis.from_url(settings.redis_url, decode_responses=True)
+
+CHUNK_TTL_SECONDS = 30 * 86400
+# Raw text kept for a section that was not summarized in time
+FALLBACK_CHARS = 300
+
+MAP_PROMPT = """\
+You summarize one section of a software release's notes for \
+engineers who use the tool daily.
+
+Return JSON: {"summary": "...", "highlights": ["...", ...]}
+- summary: 1-2 sentences on what this section changes.
+- highlights: up to 5 user-visible changes (new commands, flags, \
+integrations, breaking changes, notable fixes), each under 120 chars.
+Skip trivia: typo fixes, internal refactors, dependency bumps.
+"""
+
+MAP_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "summary": {"type": "STRING"},
+        "highlights": {"type": "ARRAY", "items": {"type": "STRING"}},
+    },
+    "required": ["summary", "highlights"],
+}
+
+
+def split_sections(text: str, max_chars: int) -> list[str]:
+    """Split markdown release notes at headings, then at line breaks.
+
+    Sections are never merged, so editing one section leaves the
+    others (and their cached summaries) untouched.
+    """
+    sections, current = [], []
+    for line in text.splitlines(keepends=True):
+        if line.lstrip().startswith("#") and current:
+            sections.append("".join(current))
+            current = []
+        current.append(line)
+    if current:
+        sections.append("".join(current))
+
+    chunks = []
+    for section in sections:
+        while len(section) > max_chars:
+            cut = section.rfind("\n", 0, max_chars) + 1 or max_chars
+            chunks.append(section[:cut])
+            section = section[cut:]
+        if section.strip():
+            chunks.append(section)
+    return chunks
+
+
+def _chunk_key(chunk: str) -> str:
+    payload = f"{settings.gemini_model}\n{MAP_PROMPT}\n{chunk}"
+    return f"release_chunk:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+def _summarize_chunk(chunk: str) -> dict:
+    """Summary of one section, from the content-hash cache if possible."""
+    key = _chunk_key(chunk)
+    cached = r.get(key)
+    if cached is not None:
+        # Recorded as an answer so a replay against an empty cache
+        # sees the same summary
+        recorder.gemini("release_map", chunk, cached)
+        return json.loads(cached)
+    text = gemini.generate_json(
+        "release_map", MAP_PROMPT, chunk,
+        priority=gemini.PRIORITY_RELEASE,
+        response_schema=MAP_SCHEMA,
+    )
+    summary = json.loads(text)
+    r.set(key, text, ex=CHUNK_TTL_SECONDS)
+    return summary
+
+
+def _digest(parts: list[dict | str]) -> str:
+    lines = [f"Release notes digest ({len(parts)} section(s)):"]
+    for part in parts:
+        if isinstance(part, str):
+            raw = " ".join(part.split())[:FALLBACK_CHARS]
+            lines.append(f"- (not summarized) {raw}")
+            continue
+        lines.append(f"- {part.get('summary', '')}")
+        lines.extend(f"  * {h}" for h in part.get("highlights", []))
+    return "\n".join(lines)
+
+
+def _parts(
+    chunks: list[str], futures: list[Future],
+) -> tuple[list[dict | str], int]:
+    """Each chunk's summary, or its raw text if it has none in time."""
+    parts: list[dict | str] = []
+    missing = 0
+    for chunk, future in zip(chunks, futures):
+        if future.done() and not future.cancelled() \
+                and future.exception() is None:
+            parts.append(future.result())
+        else:
+            if future.done() and not future.cancelled():
+                logger.warning(
+                    "Release section summary failed: %r",
+                    future.exception(),
+                )
+            missing += 1
+            parts.append(chunk)
+    return parts, missing
+
+
+def summarize_releases(items: list[GitHubItem]) -> None:
+    """Attach a digest to releases too long to be read in one chunk.
+
+    Every section of every such release goes to one pool
+    (RELEASE_MAP_CONCURRENCY) under a single RELEASE_MAP_TIMEOUT_SECONDS
+    bound, however many releases the batch holds. A section still
+    running then is represented by its opening text and finishes in
+    the background, so its summary is cached for next time. Sections
+    not started by then are cancelled and stay raw.
+    """
+    long_releases = [
+        item for item in items
+        if item.type == "release" and not item.notes
+        and len(item.body) > settings.release_chunk_chars
+    ]
+    if not long_releases:
+        return
+
+    pool = ThreadPoolExecutor(
+        max_workers=max(1, settings.release_map_concurrency),
+        thread_name_prefix="release-map",
+    )
+    jobs = []
+    for item in long_releases:
+        chunks = split_sections(item.body, settings.release_chunk_chars)
+        # Each call keeps the caller's cycle deadline and recording
+        futures = [
+            pool.submit(contextvars.copy_context().run, _summarize_chunk, c)
+            for c in chunks
+        ]
+        jobs.append((item, chunks, futures))
+    wait(
+        [f for _, _, futures in jobs for f in futures],
+        timeout=settings.release_map_timeout_seconds,
+    )
+    pool.shutdown(wait=False, cancel_futures=True)
+
+    for item, chunks, futures in jobs:
+        parts, missing = _parts(chunks, futures)
+        item.notes = _digest(parts)
+        logger.info(
+            "Summarized %d section(s) of release %s, %d left raw.",
+            len(chunks) - missing, item.id, missing,
+        )
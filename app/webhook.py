@@ -0,0 +1,200 @@
+import hashlib
+import hmac
+import json
+import logging
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+from app import http_client, live_config, outbox
+from app.config import settings
+from app.github_fetcher import _normalize, _parse_repos
+from app.github_pipeline import process_github_items
+from app.records import GitHubItem
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_PATH = "/github"
+# GitHub caps deliveries at 25 MB
+MAX_BODY_BYTES = 25 * 1024 * 1024
+ISSUE_ACTIONS = {"opened", "reopened", "edited", "labeled"}
+
+
+def signature(secret: str, body: bytes) -> str:
+    """Value GitHub sends in ``X-Hub-Signature-256`` for *body*."""
+    digest = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+
+def verify(secret: str, body: bytes, header: str | None) -> bool:
+    if not secret or not header:
+        return False
+    return hmac.compare_digest(signature(secret, body), header)
+
+
+def handle_event(event: str, payload: dict) -> list[GitHubItem]:
+    """Normalize one webhook delivery into pipeline records.
+
+    Mirrors what the polling fetchers keep: published releases, merged
+    PRs and new/updated issues on a watched repo. Anything else is [].
+    """
+    repo = payload.get("repository", {}).get("full_name", "")
+    watched = {r.lower(): r for r in _parse_repos()}
+    if repo.lower() not in watched:
+        return []
+    repo = watched[repo.lower()]
+    action = payload.get("action", "")
+
+    if event == "release" and action == "published":
+        return [_normalize(repo, "release", 0, payload["release"])]
+    if event == "pull_request" and action == "closed":
+        pr = payload["pull_request"]
+        if pr.get("merged"):
+            return [_normalize(repo, "pr", pr.get("number", 0), pr)]
+    if event == "issues" and action in ISSUE_ACTIONS:
+        issue = payload["issue"]
+        if "pull_request" not in issue:
+            return [
+                _normalize(repo, "issue", issue.get("number", 0), issue)
+            ]
+    return []
+
+
+def _ingest(items: list[GitHubItem]) -> None:
+    try:
+        with http_client.cycle_budget(settings.cycle_budget_seconds):
+            process_github_items(items)
+    finally:
+        http_client.log_stats()
+
+
+class _Worker(threading.Thread):
+    """Feeds queued deliveries to the pipeline, one batch at a time.
+
+    Deliveries that arrive while a batch is being scored are drained
+    together into the next one.
+    """
+
+    def __init__(self, ingest: Callable[[list[GitHubItem]], None]):
+        super().__init__(name="webhook-worker", daemon=True)
+        self.ingest = ingest
+        self.queue: queue.Queue[list[GitHubItem]] = queue.Queue()
+
+    def run(self) -> None:
+        while True:
+            items = list(self.queue.get())
+            while True:
+                try:
+                    items.extend(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.ingest(items)
+            except Exception:
+                logger.error(
+                    "Webhook ingestion of %d item(s) failed.",
+                    len(items), exc_info=True,
+                )
+
+
+def _handler(worker: _Worker, secret: str):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path == "/healthz":
+                self._reply(200, "ok")
+            else:
+                self._reply(404, "not found")
+
+        def do_POST(self) -> None:
+            if self.path != WEBHOOK_PATH:
+                self._reply(404, "not found")
+                return
+            header = self.headers.get("Content-Length")
+            if header is None:
+                self._reply(411, "length required")
+                return
+            try:
+                length = int(header)
+            except ValueError:
+                length = -1
+            if length < 0:
+                self._reply(400, "bad content length")
+                return
+            if length > MAX_BODY_BYTES:
+                self._reply(413, "payload too large")
+                return
+            body = self.rfile.read(length)
+            if not verify(
+                secret, body, self.headers.get("X-Hub-Signature-256"),
+            ):
+                logger.warning(
+                    "Rejected webhook with a bad signature from %s.",
+                    self.client_address[0],
+                )
+                self._reply(401, "bad signature")
+                return
+
+            event = self.headers.get("X-GitHub-Event", "")
+            delivery = self.headers.get("X-GitHub-Delivery", "")
+            if event == "ping":
+                self._reply(200, "pong")
+                return
+            try:
+                items = handle_event(event, json.loads(body))
+            except (ValueError, KeyError, TypeError):
+                self._reply(400, "bad payload")
+                return
+
+            if items:
+                worker.queue.put(items)
+            logger.info(
+                "Webhook %s %s: %d item(s) queued.",
+                event, delivery, len(items),
+            )
+            # Answer before scoring: GitHub times out after 10s
+            self._reply(202, "accepted")
+
+        def _reply(self, status: int, text: str) -> None:
+            data = text.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args) -> None:
+            logger.debug(format, *args)
+
+    return Handler
+
+
+def make_server(
+    host: str = "",
+    port: int = 0,
+    secret: str | None = None,
+    ingest: Callable[[list[GitHubItem]], None] = _ingest,
+) -> ThreadingHTTPServer:
+    """Build the webhook server and start its ingestion worker.
+
+    Port 0 picks a free port (see ``server.server_address``); pass a
+    custom *ingest* to capture items instead of scoring them.
+    """
+    secret = settings.github_webhook_secret if secret is None else secret
+    if not secret:
+        raise ValueError("GITHUB_WEBHOOK_SECRET is required for webhooks.")
+    worker = _Worker(ingest)
+    worker.start()
+    return ThreadingHTTPServer((host, port), _handler(worker, secret))
+
+
+def serve() -> None:
+    outbox.start_publisher()
+    live_config.start_listener()
+    server = make_server(settings.webhook_host, settings.webhook_port)
+    logger.info(
+        "Listening for GitHub webhooks on %s:%d%s.",
+        settings.webhook_host or "0.0.0.0", settings.webhook_port,
+        WEBHOOK_PATH,
+    )
+    server.serve_forever()
@@ -0,0 +1,199 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Callable
+
+import redis
+
+from app import http_client
+from app.config import settings
+from app.records import encode
+
+logger = logging.getLogger(__name__)
+
+r = redis.from_url(settings.redis_url, decode_responses=True)
+
+RESULT_TTL_SECONDS = 3600
+IDLE_POLL_SECONDS = 0.5
+
+# queue name -> function running one unit and returning records
+_handlers: dict[str, Callable[[dict], list]] = {}
+
+# Makes expired in-flight units visible again, then hands out the
+# next unit that has not been completed or abandoned.
+# KEYS: ready, inflight, units; ARGV: now, visible_again_at
+_CLAIM_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, id in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('RPUSH', KEYS[1], id)
+end
+while true do
+    local id = redis.call('LPOP', KEYS[1])
+    if not id then
+        return nil
+    end
+    local payload = redis.call('HGET', KEYS[3], id)
+    if payload then
+        redis.call('ZADD', KEYS[2], ARGV[2], id)
+        return {id, payload}
+    end
+end
+"""
+
+
+def _keys(queue: str) -> list[str]:
+    return [
+        f"work:{queue}:ready",
+        f"work:{queue}:inflight",
+        f"work:{queue}:units",
+    ]
+
+
+def _results_key(queue: str, cycle: str) -> str:
+    return f"work:{queue}:results:{cycle}"
+
+
+def register(queue: str, execute: Callable[[dict], list]) -> None:
+    """Declare how workers run units of *queue*."""
+    _handlers[queue] = execute
+
+
+def enqueue(queue: str, units: list[dict]) -> tuple[str, list[str]]:
+    """Add one cycle's units; returns the cycle id and unit ids."""
+    cycle = uuid.uuid4().hex
+    ids = [f"{cycle}:{i}" for i in range(len(units))]
+    ready, _, unit_key = _keys(queue)
+    pipe = r.pipeline()
+    pipe.hset(unit_key, mapping={
+        unit_id: json.dumps(unit) for unit_id, unit in zip(ids, units)
+    })
+    pipe.rpush(ready, *ids)
+    pipe.execute()
+    return cycle, ids
+
+
+def claim(queue: str) -> tuple[str, dict] | None:
+    """Take the next unit, hidden from others for WORK_VISIBILITY_SECONDS.
+
+    A worker that dies mid-unit never completes it; once the
+    visibility timeout passes the unit is handed out again.
+    """
+    now = time.time()
+    job = r.eval(
+        _CLAIM_SCRIPT, 3, *_keys(queue),
+        now, now + settings.work_visibility_seconds,
+    )
+    if not job:
+        return None
+    unit_id, payload = job
+    return unit_id, json.loads(payload)
+
+
+def complete(
+    queue: str, unit_id: str, records: list | None, ok: bool = True,
+) -> None:
+    """Store a unit's result and retire it.
+
+    Results are keyed by unit id, so a unit that ran twice after a
+    timeout still counts once.
+    """
+    cycle = unit_id.rsplit(":", 1)[0]
+    _, inflight, unit_key = _keys(queue)
+    key = _results_key(queue, cycle)
+    pipe = r.pipeline()
+    pipe.hset(key, unit_id, json.dumps({
+        "ok": ok,
+        "records": [encode(rec) for rec in records or []],
+    }))
+    pipe.expire(key, RESULT_TTL_SECONDS)
+    pipe.zrem(inflight, unit_id)
+    pipe.hdel(unit_key, unit_id)
+    pipe.execute()
+
+
+def run_one(queue: str) -> bool:
+    """Claim and run one unit of *queue*; False if none was waiting."""
+    job = claim(queue)
+    if job is None:
+        return False
+    unit_id, unit = job
+    try:
+        with http_client.cycle_budget(settings.work_visibility_seconds):
+            records = _handlers[queue](unit)
+    except Exception:
+        logger.error(
+            "Work unit %s on %s failed.", unit_id, queue, exc_info=True,
+        )
+        complete(queue, unit_id, None, ok=False)
+    else:
+        complete(queue, unit_id, records)
+    return True
+
+
+def run(
+    queue: str,
+    units: list[dict],
+    decode: Callable[[str], object],
+    timeout: float,
+) -> list:
+    """Fan *units* out to all workers and gather their records.
+
+    The caller works the queue too while it waits, so a single replica
+    makes progress on its own. Units still unfinished after *timeout*
+    are abandoned and their records dropped for this cycle.
+    """
+    if not units:
+        return []
+    cycle, ids = enqueue(queue, units)
+    deadline = time.monotonic() + timeout
+    key = _results_key(queue, cycle)
+
+    while r.hlen(key) < len(ids):
+        if time.monotonic() >= deadline:
+            done = set(r.hkeys(key))
+            missing = [unit_id for unit_id in ids if unit_id not in done]
+            r.hdel(_keys(queue)[2], *missing)
+            logger.warning(
+                "Abandoned %d of %d %s unit(s) after %.0fs.",
+                len(missing), len(ids), queue, timeout,
+            )
+            break
+        if not run_one(queue):
+            time.sleep(0.2)
+
+    results = [json.loads(v) for v in r.hgetall(key).values()]
+    r.delete(key)
+    failed = sum(1 for res in results if not res["ok"])
+    logger.info(
+        "Collected %d %s unit(s) (%d failed).",
+        len(results), queue, failed,
+    )
+    return [decode(rec) for res in results for rec in res["records"]]
+
+
+def work(stop: threading.Event) -> None:
+    """Run units from every registered queue until *stop* is set."""
+    logger.info("Worker started for %s.", ", ".join(sorted(_handlers)))
+    while not stop.is_set():
+        busy = False
+        for queue in list(_handlers):
+            try:
+                busy |= run_one(queue)
+            except redis.RedisError:
+                logger.error(
+                    "Work queue %s unavailable.", queue, exc_info=True,
+                )
+        if not busy:
+            stop.wait(IDLE_POLL_SECONDS)
+
+
+def start_worker() -> threading.Event:
+    """Run work() on a daemon thread; set the event to stop it."""
+    stop = threading.Event()
+    threading.Thread(
+        target=work, args=(stop,), name="work-queue", daemon=True,
+    ).start()
+    return stop
@@ -0,0 +1,301 @@
+import logging
+import random
+import threading
+import time
+from datetime import datetime
+
+import httpx
+import redis
+
+from app import http_client, live_config, outbox, ratelimit
+from app.config import settings
+from app.fetcher import POST_FIELDS, _account_batches, _query_for
+from app.pipeline import process_posts
+from app.records import XPost, decode_search, decode_stream_line
+
+logger = logging.getLogger(__name__)
+
+r = redis.from_url(settings.redis_url, decode_responses=True)
+
+STREAM_URL = f"{settings.x_api_base}/2/tweets/search/stream"
+RULES_URL = f"{STREAM_URL}/rules"
+LOOKUP_URL = f"{settings.x_api_base}/2/tweets"
+LOOKUP_ENDPOINT = "tweets_lookup"
+# Ids per /2/tweets lookup
+LOOKUP_LIMIT = 100
+
+BUFFER_KEY = "x_stream:pending"
+# X sends a keep-alive every 20s; silence past this means a dead link
+READ_TIMEOUT = 60
+
+# Reconnect backoff per X's guidance: linear for network drops,
+# exponential for HTTP errors, slower still for 429s.
+NETWORK_BACKOFF = (0.25, 16)
+HTTP_BACKOFF = (5, 320)
+RATE_LIMIT_BACKOFF = (60, 960)
+
+_lock = threading.Lock()
+_stop: threading.Event | None = None
+
+# Pops buffered post ids created before a cutoff, oldest first.
+# KEYS[1]=buffer; ARGV: cutoff_ts, limit
+_POP_SCRIPT = """
+local members = redis.call(
+    'ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2]
+)
+if #members > 0 then
+    redis.call('ZREM', KEYS[1], unpack(members))
+end
+return members
+"""
+
+
+def _headers() -> dict:
+    return {"Authorization": f"Bearer {settings.x_bearer_token}"}
+
+
+def build_rules() -> dict[str, str]:
+    """Stream rules (tag -> value) from the same config as polling."""
+    batches = _account_batches()
+    if not batches:
+        return {"keyword": live_config.current().x_search_query}
+    return {
+        f"accounts:{i}": _query_for(batch)
+        for i, batch in enumerate(batches)
+    }
+
+
+def sync_rules() -> None:
+    """Make the stream's server-side rules match build_rules()."""
+    wanted = build_rules()
+    resp = http_client.get(RULES_URL, headers=_headers(), timeout=30)
+    resp.raise_for_status()
+    current = resp.json().get("data", [])
+
+    stale = [
+        rule["id"] for rule in current
+        if wanted.get(rule.get("tag")) != rule["value"]
+    ]
+    present = {
+        rule.get("tag") for rule in current if rule["id"] not in stale
+    }
+    missing = [
+        {"value": value, "tag": tag}
+        for tag, value in wanted.items()
+        if tag not in present
+    ]
+
+    if stale:
+        resp = http_client.post(
+            RULES_URL, json={"delete": {"ids": stale}},
+            headers=_headers(), timeout=30,
+        )
+        resp.raise_for_status()
+    if missing:
+        resp = http_client.post(
+            RULES_URL, json={"add": missing},
+            headers=_headers(), timeout=30,
+        )
+        resp.raise_for_status()
+    logger.info(
+        "Stream rules: %d kept, %d removed, %d added.",
+        len(current) - len(stale), len(stale), len(missing),
+    )
+
+
+def _created_ts(post: XPost) -> float:
+    try:
+        return datetime.fromisoformat(
+            post.created_at.replace("Z", "+00:00"),
+        ).timestamp()
+    except ValueError:
+        return time.time()
+
+
+def buffer(posts: list[XPost]) -> None:
+    """Queue arriving post ids by creation time until old enough.
+
+    Only ids are kept: metrics at arrival are always near zero, so
+    consume() looks every post up again anyway.
+    """
+    if posts:
+        r.zadd(BUFFER_KEY, {p.id: _created_ts(p) for p in posts}, nx=True)
+
+
+def pending() -> int:
+    return r.zcard(BUFFER_KEY)
+
+
+def _reconnect_delay(kind: str, attempt: int) -> float:
+    if kind == "network":
+        start, cap = NETWORK_BACKOFF
+        delay = min(cap, start * (attempt + 1))
+    else:
+        start, cap = RATE_LIMIT_BACKOFF if kind == "rate" else HTTP_BACKOFF
+        delay = min(cap, start * 2 ** attempt)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def listen(stop: threading.Event) -> None:
+    """Hold the filtered-stream connection open until *stop* is set.
+
+    Rules are re-synced on every (re)connect. Each post is pushed to
+    the Redis buffer as it arrives; scoring happens in consume().
+    """
+    attempt = 0
+    while not stop.is_set():
+        kind = "network"
+        try:
+            sync_rules()
+            with http_client.stream(
+                "GET", STREAM_URL,
+                params=POST_FIELDS,
+                headers=_headers(),
+                timeout=httpx.Timeout(30, read=READ_TIMEOUT),
+            ) as resp:
+                ratelimit.record("x", "search_stream", resp)
+                if resp.status_code != 200:
+                    resp.read()
+                    kind = "rate" if resp.status_code == 429 else "http"
+                    logger.warning(
+                        "Stream connect failed (%d): %s",
+                        resp.status_code, resp.text[:200],
+                    )
+                else:
+                    logger.info("Connected to X filtered stream.")
+                    attempt = 0
+                    for line in resp.iter_lines():
+                        if stop.is_set():
+                            return
+                        try:
+                            post = decode_stream_line(line)
+                        except ValueError:
+                            logger.warning(
+                                "Bad stream line: %r", line[:200],
+                            )
+                            continue
+                        if post:
+                            buffer([post])
+                    logger.warning("X closed the filtered stream.")
+        except httpx.HTTPStatusError as e:
+            kind = "rate" if e.response.status_code == 429 else "http"
+            logger.warning("Stream rule sync failed: %s", e)
+        except httpx.HTTPError as e:
+            logger.warning("Stream connection lost: %r", e)
+
+        delay = _reconnect_delay(kind, attempt)
+        attempt += 1
+        logger.info("Reconnecting to X stream in %.1fs.", delay)
+        stop.wait(delay)
+
+
+def lookup_posts(ids: list[str]) -> list[XPost]:
+    """Current metrics for posts; deleted ones are left out."""
+    resp = http_client.get(
+        LOOKUP_URL,
+        params={"ids": ",".join(ids), **POST_FIELDS},
+        headers=_headers(), timeout=30,
+    )
+    ratelimit.record("x", LOOKUP_ENDPOINT, resp)
+    resp.raise_for_status()
+    return decode_search(resp.content).posts
+
+
+def consume() -> None:
+    """Score buffered posts that have reached MIN_AGE_MINUTES.
+
+    Posts past MAX_AGE_MINUTES are dropped, as polling would never
+    have seen them. Metrics are refreshed in one lookup per 100 posts
+    so the engagement gate sees the same numbers as a search would.
+    """
+    now = time.time()
+    dropped = r.zremrangebyscore(
+        BUFFER_KEY, "-inf", now - settings.max_age_minutes * 60,
+    )
+    if dropped:
+        logger.info("Dropped %d stream post(s) past max age.", dropped)
+
+    cutoff = now - settings.min_age_minutes * 60
+    posts: list[XPost] = []
+    while True:
+        ids = r.eval(_POP_SCRIPT, 1, BUFFER_KEY, cutoff, LOOKUP_LIMIT)
+        if not ids:
+            break
+        try:
+            posts.extend(lookup_posts(ids))
+        except httpx.HTTPError:
+            logger.error("Post lookup failed; re-buffering.", exc_info=True)
+            r.zadd(BUFFER_KEY, {post_id: cutoff for post_id in ids})
+            break
+        if len(ids) < LOOKUP_LIMIT:
+            break
+
+    if not posts:
+        return
+    logger.info(
+        "Consuming %d stream post(s), %d still maturing.",
+        len(posts), pending(),
+    )
+    process_posts(posts, settings.x_stream_consume_minutes)
+
+
+def consume_cycle() -> None:
+    try:
+        with http_client.cycle_budget(settings.cycle_budget_seconds):
+            consume()
+    except Exception:
+        logger.error("Stream consume cycle failed.", exc_info=True)
+    finally:
+        http_client.log_stats()
+        ratelimit.log_report()
+
+
+def _listening() -> bool:
+    return _stop is not None and not _stop.is_set()
+
+
+def start_listener() -> threading.Event:
+    """Run listen() on a daemon thread; set the event to stop it.
+
+    X allows one stream connection per app, so a process runs at most
+    one listener; calling this again returns the running one's event.
+    """
+    global _stop
+    with _lock:
+        if not _listening():
+            _stop = threading.Event()
+            threading.Thread(
+                target=listen, args=(_stop,), name="x-stream",
+                daemon=True,
+            ).start()
+        return _stop
+
+
+def stop_listener() -> None:
+    """Close the stream connection (at the next line or keep-alive)."""
+    with _lock:
+        if _listening():
+            logger.info("Stopping the X stream listener.")
+            _stop.set()
+
+
+def _resync(_) -> None:
+    # Accounts added at runtime are streamed without reconnecting
+    if _listening():
+        sync_rules()
+
+
+live_config.on_change(_resync)
+
+
+def run_stream() -> None:
+    """Listener thread plus a consumer every X_STREAM_CONSUME_MINUTES."""
+    outbox.start_publisher()
+    live_config.start_listener()
+    stop = start_listener()
+    try:
+        while not stop.is_set():
+            consume_cycle()
+            stop.wait(settings.x_stream_consume_minutes * 60)
+    finally:
+        stop.set()
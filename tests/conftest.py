@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+import redis
+
+# Settings are read once at import, so set them before any app module
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("X_BEARER_TOKEN", "test")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/15")
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """One in-memory Redis shared by every imported app module."""
+    conn = fakeredis.FakeRedis(decode_responses=True)
+    for name, module in list(sys.modules.items()):
+        if name.startswith("app.") and isinstance(
+            getattr(module, "r", None), redis.Redis,
+        ):
+            monkeypatch.setattr(module, "r", conn)
+    return conn
@@ -0,0 +1,99 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app import batcher, clock, github_pipeline
+from app.records import GitHubItem, decode_github_item
+
+# 15:00 ART, inside the default 9-20 operating hours
+MIDDAY = datetime(2026, 3, 2, 18, 0, tzinfo=timezone.utc).timestamp()
+# 19:45 ART: a 30-minute cycle would next run after 20:00
+EVENING = datetime(2026, 3, 2, 22, 45, tzinfo=timezone.utc).timestamp()
+
+
+def _item(n: int, kind: str = "issue") -> GitHubItem:
+    return GitHubItem(
+        id=f"gh:o/r:{kind}:{n}", repo="o/r", type=kind, number=n,
+        title=f"{kind} {n}", body="", url="", author="a",
+        created_at="2026-03-02T17:00:00Z",
+    )
+
+
+def _scores(fake_redis, source: str) -> dict[str, float]:
+    members = fake_redis.zrange(
+        f"score_buffer:{source}", 0, -1, withscores=True,
+    )
+    return {decode_github_item(m).id: s for m, s in members}
+
+
+def test_restore_keeps_enqueue_times(fake_redis):
+    with clock.frozen_at(MIDDAY - 600):
+        batcher.add("github", [_item(1)])
+    with clock.frozen_at(MIDDAY):
+        batcher.add("github", [_item(2)])
+        batch = batcher.take_ready("github", decode_github_item, 30, True)
+        assert len(batch) == 2
+        batcher.restore("github", batch + [_item(3, "release")])
+
+    assert _scores(fake_redis, "github") == {
+        "gh:o/r:issue:1": MIDDAY - 600,
+        "gh:o/r:issue:2": MIDDAY,
+        "gh:o/r:release:3": 0.0,
+    }
+
+
+def test_last_cycle_of_the_day_flushes(fake_redis):
+    with clock.frozen_at(MIDDAY):
+        batcher.add("github", [_item(1)])
+        assert batcher.take_ready("github", decode_github_item, 30) == []
+    with clock.frozen_at(EVENING):
+        batch = batcher.take_ready("github", decode_github_item, 30)
+
+    assert [it.id for it in batch] == ["gh:o/r:issue:1"]
+
+
+@pytest.fixture
+def failing_scorer(monkeypatch):
+    def fail(items, profile):
+        raise RuntimeError("Gemini 500")
+
+    monkeypatch.setattr(github_pipeline, "score_github_items", fail)
+    monkeypatch.setattr(
+        github_pipeline.summarizer, "summarize_releases", lambda items: None,
+    )
+
+
+def test_failed_scoring_puts_the_batch_back(fake_redis, failing_scorer):
+    with clock.frozen_at(MIDDAY):
+        github_pipeline.process_github_items(
+            [_item(1), _item(2, "release")],
+        )
+
+    assert set(_scores(fake_redis, "github")) == {
+        "gh:o/r:issue:1", "gh:o/r:release:2",
+    }
+    assert not fake_redis.exists(batcher.STATS_KEY)
+
+
+def test_repeatedly_failing_record_is_parked(fake_redis):
+    with clock.frozen_at(MIDDAY):
+        for _ in range(batcher.MAX_ATTEMPTS - 1):
+            batcher.restore("github", [_item(1)])
+        assert set(_scores(fake_redis, "github")) == {"gh:o/r:issue:1"}
+
+        batcher.take_ready("github", decode_github_item, 30, True)
+        batcher.restore("github", [_item(1), _item(2)])
+
+    assert set(_scores(fake_redis, "github")) == {"gh:o/r:issue:2"}
+    (entry,) = fake_redis.xrange(batcher.dead_letter_key("github"))
+    assert entry[1]["id"] == "gh:o/r:issue:1"
+    assert fake_redis.hgetall("score_attempts:github") == {
+        "gh:o/r:issue:2": "1",
+    }
+
+
+def test_scored_record_starts_over(fake_redis):
+    batcher.restore("github", [_item(1)])
+    batcher.record_batch("github", [_item(1)])
+
+    assert not fake_redis.exists("score_attempts:github")
@@ -0,0 +1,40 @@
+from dataclasses import replace
+from datetime import datetime, timezone
+
+from app import archive, cleanup, clock, digest, discord, profiles
+from app.records import Verdict, XPost, encode
+
+DAY = "2026-03-02"
+# 00:00 ART, when the cleanup job runs
+MIDNIGHT = datetime(2026, 3, 3, 3, 0, tzinfo=timezone.utc).timestamp()
+
+
+def test_cleanup_digests_pending_items_first(fake_redis, monkeypatch):
+    for module in (cleanup, digest):
+        monkeypatch.setattr(
+            module, "settings",
+            replace(module.settings, publish_mode="digest"),
+        )
+    profile = replace(profiles.default(), discord_channel_id="c1")
+    monkeypatch.setattr(profiles, "load", lambda: (profile,))
+    monkeypatch.setattr(archive, "archive_day", lambda day: None)
+    monkeypatch.setattr(discord, "is_configured", lambda channel: True)
+    posted, deleted = [], []
+
+    def post_digest(title, messages, channel):
+        posted.append(messages)
+        return "digest-1"
+
+    monkeypatch.setattr(discord, "post_digest", post_digest)
+    monkeypatch.setattr(discord, "delete_thread", deleted.append)
+    post = XPost(id="9", text="late news", verdict=Verdict("high"))
+    fake_redis.hset(f"post:{DAY}:9", mapping={
+        "published": "1", "record": encode(post),
+    })
+
+    with clock.frozen_at(MIDNIGHT):
+        cleanup.midnight_cleanup(DAY)
+
+    assert len(posted) == 1
+    assert deleted == ["digest-1"]
+    assert not fake_redis.exists(f"post:{DAY}:9")
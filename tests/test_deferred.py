@@ -0,0 +1,105 @@
+import json
+from dataclasses import replace
+
+import pytest
+
+from app import batcher, clock, deferred, gemini, outbox
+from app.records import GitHubItem, decode_github_item
+
+# 15:00 ART, inside the default operating hours
+MIDDAY = 1772474400.0
+
+
+def _item(n: int) -> GitHubItem:
+    return GitHubItem(
+        id=f"gh:o/r:issue:{n}", repo="o/r", type="issue", number=n,
+        title=f"issue {n}", body="", url="", author="a",
+        created_at="2026-03-02T17:00:00Z",
+    )
+
+
+@pytest.fixture
+def job(fake_redis, monkeypatch):
+    """A local job of two requests: 25 items and 5 items."""
+    monkeypatch.setattr(deferred, "settings", replace(
+        deferred.settings, batch_backend="local", deferred_batch_size=30,
+    ))
+    monkeypatch.setattr(
+        deferred, "enrich_github_items", lambda items, profile: None,
+    )
+    with clock.frozen_at(MIDDAY):
+        deferred.enqueue([_item(n) for n in range(30)])
+        return deferred.submit_ready(30)
+
+
+@pytest.fixture
+def answers(monkeypatch):
+    """Gemini answers: each request passes its first item, or fails."""
+    made = []
+
+    def generate_json(name, system_instruction, contents, **kwargs):
+        made.append(contents)
+        if len(made) == 2:
+            return "{unparseable"
+        return json.dumps([{"index": 0, "priority": "high"}])
+
+    monkeypatch.setattr(gemini, "generate_json", generate_json)
+    return made
+
+
+def _queued() -> set[str]:
+    return {
+        decode_github_item(m).id
+        for m in deferred.r.zrange(batcher._key(deferred.QUEUE), 0, -1)
+    }
+
+
+def test_unusable_request_requeues_its_items(job, answers, monkeypatch):
+    first, second = json.loads(
+        deferred.r.hget(deferred.JOBS_KEY, job),
+    )["requests"]
+    published = []
+    monkeypatch.setattr(
+        outbox, "add",
+        lambda source, items, profile: published.extend(items) or items,
+    )
+
+    with clock.frozen_at(MIDDAY + 60):
+        assert deferred.collect() == 1
+
+    assert [it.id for it in published] \
+        == [decode_github_item(first["items"][0]).id]
+    assert _queued() \
+        == {decode_github_item(raw).id for raw in second["items"]}
+    assert len(second["items"]) == 5
+    assert not deferred.r.hexists(deferred.JOBS_KEY, job)
+    assert not deferred.r.keys("deferred:local:*")
+    assert not deferred.r.keys("deferred:collecting:*")
+
+
+def test_failed_publish_keeps_the_job(job, answers, monkeypatch):
+    def fail(source, items, profile):
+        raise ConnectionError("Redis went away")
+
+    monkeypatch.setattr(outbox, "add", fail)
+    with clock.frozen_at(MIDDAY + 60):
+        assert deferred.collect() == 0
+    assert deferred.r.hexists(deferred.JOBS_KEY, job)
+    assert len(answers) == 2
+
+    monkeypatch.setattr(
+        outbox, "add", lambda source, items, profile: items,
+    )
+    with clock.frozen_at(MIDDAY + 120):
+        assert deferred.collect() == 1
+    # The retry reused the stored answers instead of asking again
+    assert len(answers) == 2
+    assert not deferred.r.hexists(deferred.JOBS_KEY, job)
+
+
+def test_claimed_job_is_left_to_its_collector(job, answers):
+    deferred.r.set(f"deferred:collecting:{job}", "1")
+
+    assert deferred.collect() == 0
+    assert answers == []
+    assert deferred.r.hexists(deferred.JOBS_KEY, job)
@@ -0,0 +1,30 @@
+from collections import Counter
+from dataclasses import replace
+
+from app import fetcher
+from app.records import SearchPage, XPost
+
+WINDOW = ("2026-03-02T12:00:00Z", "2026-03-02T17:00:00Z")
+
+
+def test_saturated_keyword_query_is_paged(fake_redis, monkeypatch):
+    monkeypatch.setattr(
+        fetcher, "settings", replace(fetcher.settings, x_max_pages=3),
+    )
+    tokens = []
+
+    def search(params, headers, next_token=None):
+        tokens.append(next_token)
+        n = len(tokens)
+        return SearchPage([XPost(id=str(n), text="")], f"t{n}")
+
+    monkeypatch.setattr(fetcher, "_search", search)
+    budget = iter([True, True, False])
+    stats = Counter()
+
+    posts = fetcher._fetch_batch(None, WINDOW, lambda: next(budget), stats)
+
+    # The third page was not affordable
+    assert tokens == [None, "t1"]
+    assert [p.id for p in posts] == ["1", "2"]
+    assert stats["saturated"] == 1 and stats["splits"] == 0
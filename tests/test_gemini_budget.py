@@ -0,0 +1,20 @@
+from app import gemini
+
+
+def test_settle_skips_expired_bucket(fake_redis):
+    gemini._settle(1000, {"prompt": 200, "output": 100})
+
+    assert not fake_redis.exists(gemini.TPM_KEY)
+
+
+def test_settle_credits_live_bucket(fake_redis):
+    gemini._acquire(1000, gemini.PRIORITY_NORMAL)
+    before = float(fake_redis.hget(gemini.TPM_KEY, "tokens"))
+    fake_redis.pexpire(gemini.TPM_KEY, 5000)
+
+    gemini._settle(1000, {"prompt": 200, "output": 100})
+
+    after = float(fake_redis.hget(gemini.TPM_KEY, "tokens"))
+    assert after == before + 700
+    assert fake_redis.hget(gemini.TPM_KEY, "ts") is not None
+    assert fake_redis.pttl(gemini.TPM_KEY) > 5000
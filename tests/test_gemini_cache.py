@@ -0,0 +1,99 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import gemini
+
+
+class StubCaches:
+    def __init__(self):
+        self.created = []
+        self.updated = []
+        self.deleted = []
+
+    def create(self, model, config):
+        self.created.append(config)
+        return SimpleNamespace(name=f"cachedContents/{len(self.created)}")
+
+    def update(self, name, config):
+        self.updated.append((name, config))
+
+    def delete(self, name):
+        self.deleted.append(name)
+
+
+class StubModels:
+    def __init__(self):
+        self.configs = []
+
+    def generate_content(self, model, contents, config):
+        self.configs.append(dict(config))
+        return SimpleNamespace(
+            text="[]",
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=10,
+                cached_content_token_count=8,
+                candidates_token_count=2,
+            ),
+        )
+
+
+@pytest.fixture
+def client(fake_redis, monkeypatch):
+    stub = SimpleNamespace(caches=StubCaches(), models=StubModels())
+    monkeypatch.setattr(gemini, "_client", stub)
+    return stub
+
+
+def test_creates_cache_once_and_reuses_it(client):
+    first = gemini._cached_content("score", "prompt v1")
+    second = gemini._cached_content("score", "prompt v1")
+
+    assert first == second == "cachedContents/1"
+    assert len(client.caches.created) == 1
+    assert client.caches.created[0]["system_instruction"] == "prompt v1"
+
+
+def test_refreshes_ttl_inside_margin(client, fake_redis):
+    handle = gemini._cached_content("score", "prompt v1")
+    soon = time.time() + gemini.CACHE_REFRESH_MARGIN - 5
+    fake_redis.hset("gemini_cache:score", "expires_at", soon)
+
+    assert gemini._cached_content("score", "prompt v1") == handle
+    assert [name for name, _ in client.caches.updated] == [handle]
+    assert len(client.caches.created) == 1
+    expires_at = float(fake_redis.hget("gemini_cache:score", "expires_at"))
+    assert expires_at > soon + gemini.CACHE_REFRESH_MARGIN
+
+
+def test_prompt_change_invalidates_cache(client):
+    old = gemini._cached_content("score", "prompt v1")
+    new = gemini._cached_content("score", "prompt v2")
+
+    assert client.caches.deleted == [old]
+    assert new != old
+    assert client.caches.created[-1]["system_instruction"] == "prompt v2"
+
+
+def test_rejected_prompt_is_sent_inline(client, monkeypatch):
+    def reject(model, config):
+        raise RuntimeError("below the minimum cacheable size")
+
+    monkeypatch.setattr(client.caches, "create", reject)
+    text = gemini.generate_json("score", "short prompt", "[0] post")
+
+    assert text == "[]"
+    config = client.models.configs[-1]
+    assert config["system_instruction"] == "short prompt"
+    assert "cached_content" not in config
+    # The rejection is remembered instead of retried on every call
+    assert gemini._cached_content("score", "short prompt") is None
+
+
+def test_generate_json_uses_cache_handle(client):
+    gemini.generate_json("score", "prompt v1", "[0] post")
+
+    config = client.models.configs[-1]
+    assert config["cached_content"] == "cachedContents/1"
+    assert "system_instruction" not in config
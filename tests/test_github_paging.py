@@ -0,0 +1,95 @@
+from dataclasses import replace
+from datetime import datetime, timezone
+
+import pytest
+
+from app import github_fetcher, store
+
+SINCE = datetime(2026, 1, 1, tzinfo=timezone.utc)
+PER_PAGE = 100
+
+
+def _issue(n: int) -> dict:
+    # Listed newest first: issue 1 is the most recently updated
+    updated = f"2026-01-02T{23 - n // 60:02d}:{59 - n % 60:02d}:00Z"
+    return {
+        "id": n, "number": n, "title": f"issue {n}",
+        "created_at": updated, "updated_at": updated,
+    }
+
+
+class FakeListing:
+    def __init__(self, count: int):
+        self.issues = [_issue(n) for n in range(1, count + 1)]
+        self.pages: list[int] = []
+
+    def get(self, url, params):
+        self.pages.append(params["page"])
+        start = (params["page"] - 1) * params["per_page"]
+        batch = self.issues[start:start + params["per_page"]]
+        return type("Response", (), {"json": lambda self: batch})()
+
+
+@pytest.fixture
+def listing(fake_redis, monkeypatch):
+    fake = FakeListing(250)
+    monkeypatch.setattr(github_fetcher, "_get", fake.get)
+    monkeypatch.setattr(
+        github_fetcher, "settings",
+        replace(github_fetcher.settings, github_max_pages=1),
+    )
+    return fake
+
+
+def _fetch_issues() -> set[int]:
+    label, endpoint, fn = github_fetcher.FETCHERS[2]
+    items = github_fetcher._fetch_endpoint(
+        "o/r", label, endpoint, fn, {"o/r": {"issues": SINCE}},
+    )
+    return {item.number for item in items}
+
+
+def _watermark() -> str | None:
+    return store.get_gh_watermarks(["o/r"])["o/r"].get("issues")
+
+
+def test_resume_rereads_last_page(fake_redis, monkeypatch):
+    fake = FakeListing(450)
+    monkeypatch.setattr(github_fetcher, "_get", fake.get)
+    monkeypatch.setattr(
+        github_fetcher, "settings",
+        replace(github_fetcher.settings, github_max_pages=2),
+    )
+
+    seen = set()
+    for _ in range(4):
+        seen |= _fetch_issues()
+
+    assert fake.pages == [1, 2, 2, 3, 3, 4, 4, 5]
+    assert seen == set(range(1, 451))
+    assert _watermark() == fake.issues[0]["updated_at"]
+
+
+def test_page_cap_resumes_without_gaps(listing):
+    seen = _fetch_issues()
+    assert seen == set(range(1, PER_PAGE + 1))
+    # The watermark holds until the backlog is read
+    assert _watermark() is None
+    assert store.get_gh_resume("o/r", "issues")[0] == 2
+
+    seen |= _fetch_issues()
+    seen |= _fetch_issues()
+    assert listing.pages == [1, 2, 3]
+
+    assert seen == set(range(1, 251))
+    assert store.get_gh_resume("o/r", "issues") is None
+    assert _watermark() == listing.issues[0]["updated_at"]
+
+
+def test_listing_within_cap_advances_watermark(fake_redis, monkeypatch):
+    fake = FakeListing(40)
+    monkeypatch.setattr(github_fetcher, "_get", fake.get)
+
+    assert _fetch_issues() == set(range(1, 41))
+    assert fake.pages == [1]
+    assert _watermark() == fake.issues[0]["updated_at"]
@@ -0,0 +1,47 @@
+from dataclasses import replace
+
+from app import http_client
+
+
+def test_half_open_breaker_lets_one_trial_through(monkeypatch):
+    monkeypatch.setattr(http_client, "settings", replace(
+        http_client.settings,
+        http_breaker_threshold=1, http_breaker_cooldown_seconds=10,
+    ))
+    now = [100.0]
+    monkeypatch.setattr(http_client.time, "monotonic", lambda: now[0])
+    breaker = http_client._Breaker()
+
+    breaker.failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    now[0] += 10
+    assert breaker.allow()
+    assert breaker.state == "half-open"
+    # Concurrent callers wait while the trial is in flight
+    assert not breaker.allow()
+    assert not breaker.allow()
+
+    breaker.success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_unsettled_trial_is_replaced_after_cooldown(monkeypatch):
+    monkeypatch.setattr(http_client, "settings", replace(
+        http_client.settings,
+        http_breaker_threshold=1, http_breaker_cooldown_seconds=10,
+    ))
+    now = [100.0]
+    monkeypatch.setattr(http_client.time, "monotonic", lambda: now[0])
+    breaker = http_client._Breaker()
+
+    breaker.failure()
+    now[0] += 10
+    assert breaker.allow()
+    now[0] += 5
+    assert not breaker.allow()
+    now[0] += 5
+    assert breaker.allow()
+    assert not breaker.allow()
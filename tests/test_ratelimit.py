@@ -0,0 +1,53 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from app import ratelimit
+from app.config import settings
+
+
+def _response(remaining: int, reset: int) -> httpx.Response:
+    return httpx.Response(200, headers={
+        "x-rate-limit-limit": "450",
+        "x-rate-limit-remaining": str(remaining),
+        "x-rate-limit-reset": str(reset),
+    })
+
+
+def test_take_never_overspends(fake_redis):
+    reset = int(time.time()) + 600
+    ratelimit.record("x", "search_recent", _response(12, reset))
+    allowed = 12 - settings.rate_limit_reserve
+
+    with ThreadPoolExecutor(8) as pool:
+        granted = list(pool.map(
+            lambda _: ratelimit.take("x", "search_recent"), range(40),
+        ))
+
+    assert sum(granted) == allowed
+    assert ratelimit.budget("x", "search_recent") == 0
+
+
+def test_record_keeps_reserved_calls(fake_redis):
+    reset = int(time.time()) + 600
+    ratelimit.record("x", "search_recent", _response(100, reset))
+    for _ in range(5):
+        ratelimit.take("x", "search_recent")
+
+    # A response that left before those reservations reports more
+    ratelimit.record("x", "search_recent", _response(99, reset))
+
+    assert fake_redis.hget("ratelimit:x:search_recent", "remaining") == "95"
+
+
+def test_take_refills_after_reset(fake_redis):
+    past = int(time.time()) - 10
+    ratelimit.record("x", "search_recent", _response(0, past))
+
+    assert ratelimit.take("x", "search_recent")
+    assert fake_redis.hget("ratelimit:x:search_recent", "remaining") == "449"
+
+
+def test_unknown_endpoint_is_not_limited(fake_redis):
+    assert ratelimit.take("x", "never_seen")
@@ -0,0 +1,72 @@
+import json
+import threading
+import time
+from dataclasses import replace
+
+import pytest
+
+from app import gemini, summarizer
+from app.records import GitHubItem
+
+
+def _release(n: int, sections: int, text: str = "change") -> GitHubItem:
+    body = "".join(
+        f"## Section {k}\n" + f"- {text} line here\n" * 150
+        for k in range(sections)
+    )
+    return GitHubItem(
+        id=f"gh:o/r:release:{n}", repo="o/r", type="release", number=0,
+        title=f"v{n}", body=body, url="", author="a", created_at="",
+    )
+
+
+@pytest.fixture
+def calls(fake_redis, monkeypatch):
+    made = []
+    lock = threading.Lock()
+
+    def generate_json(name, system_instruction, contents, **kwargs):
+        with lock:
+            made.append(contents)
+        return json.dumps({
+            "summary": contents.splitlines()[0], "highlights": [],
+        })
+
+    monkeypatch.setattr(gemini, "generate_json", generate_json)
+    return made
+
+
+def test_edited_release_only_resummarizes_changed_section(calls):
+    first = _release(1, 4)
+    summarizer.summarize_releases([first])
+    assert len(calls) == 4
+
+    edited = _release(1, 4)
+    edited.body = edited.body.replace("## Section 2\n", "## Section 2b\n")
+    summarizer.summarize_releases([edited])
+
+    assert len(calls) == 5
+    assert calls[-1].startswith("## Section 2b")
+    assert "## Section 2b" in edited.notes
+
+
+def test_one_deadline_for_the_whole_batch(fake_redis, monkeypatch):
+    monkeypatch.setattr(summarizer, "settings", replace(
+        summarizer.settings,
+        release_map_concurrency=2, release_map_timeout_seconds=0.3,
+    ))
+
+    def slow(chunk):
+        time.sleep(0.2)
+        return {"summary": "done", "highlights": []}
+
+    monkeypatch.setattr(summarizer, "_summarize_chunk", slow)
+    releases = [_release(n, 3) for n in range(3)]
+
+    started = time.monotonic()
+    summarizer.summarize_releases(releases)
+    elapsed = time.monotonic() - started
+
+    assert elapsed < 0.5
+    assert all(item.notes for item in releases)
+    assert "(not summarized)" in releases[-1].notes
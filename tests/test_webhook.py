@@ -0,0 +1,82 @@
+import http.client
+import queue
+import threading
+from pathlib import Path
+
+import pytest
+
+from app import webhook
+
+SECRET = "test-secret"
+DATA = Path(__file__).parent / "data"
+PAYLOAD = (DATA / "release_published.json").read_bytes()
+
+
+@pytest.fixture
+def server(fake_redis):
+    received: queue.Queue = queue.Queue()
+    srv = webhook.make_server(
+        "127.0.0.1", 0, secret=SECRET, ingest=received.put,
+    )
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv, received
+    srv.shutdown()
+    srv.server_close()
+
+
+def _post(srv, body: bytes, headers: dict) -> tuple[int, str]:
+    conn = http.client.HTTPConnection(*srv.server_address, timeout=5)
+    conn.putrequest("POST", webhook.WEBHOOK_PATH)
+    for name, value in headers.items():
+        conn.putheader(name, value)
+    conn.endheaders(body)
+    resp = conn.getresponse()
+    text = resp.read().decode()
+    conn.close()
+    return resp.status, text
+
+
+def _signed(body: bytes, **extra) -> dict:
+    return {
+        "Content-Length": str(len(body)),
+        "X-GitHub-Event": "release",
+        "X-GitHub-Delivery": "72d3162e-cc78-11e3-81ab-4c9367dc0958",
+        "X-Hub-Signature-256": webhook.signature(SECRET, body),
+        **extra,
+    }
+
+
+def test_recorded_release_is_ingested(server):
+    srv, received = server
+
+    assert _post(srv, PAYLOAD, _signed(PAYLOAD)) == (202, "accepted")
+
+    (item,) = received.get(timeout=5)
+    assert item.id == "gh:anthropics/claude-code:release:218871432"
+    assert item.type == "release"
+    assert item.title == "v2.0.14"
+    assert item.author == "ant-kurt"
+    assert item.reactions_count == 12
+    assert "MCP servers" in item.body
+
+
+def test_bad_signature_is_rejected(server):
+    srv, received = server
+    headers = _signed(PAYLOAD, **{"X-Hub-Signature-256": "sha256=00"})
+
+    assert _post(srv, PAYLOAD, headers)[0] == 401
+    assert received.empty()
+
+
+@pytest.mark.parametrize("length, status", [
+    (None, 411), ("abc", 400), ("-1", 400),
+])
+def test_bad_content_length(server, length, status):
+    srv, received = server
+    headers = _signed(b"")
+    del headers["Content-Length"]
+    if length is not None:
+        headers["Content-Length"] = length
+
+    assert _post(srv, b"", headers)[0] == status
+    assert received.empty()
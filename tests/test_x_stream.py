@@ -0,0 +1,194 @@
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from app import http_client, ratelimit, x_stream
+
+
+def _post(post_id: str, minutes_ago: int, likes: int = 0) -> dict:
+    created = datetime.now(timezone.utc) - timedelta(minutes=minutes_ago)
+    return {
+        "id": post_id,
+        "text": f"post {post_id} about Claude Code",
+        "author_id": "7",
+        "created_at": created.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        "public_metrics": {
+            "like_count": likes, "retweet_count": 0,
+            "reply_count": 0, "quote_count": 0,
+        },
+    }
+
+
+USERS = {"users": [{"id": "7", "username": "alice"}]}
+
+
+class FakeX:
+    """Local stand-in for X's filtered stream, rules and lookup APIs.
+
+    Each stream connection takes the next scripted reply: an HTTP
+    status to fail with, or lines to send before closing.
+    """
+
+    def __init__(self, connections: list):
+        self.connections = list(connections)
+        self.rules = [{"id": "1", "value": "stale query", "tag": "keyword"}]
+        self.rule_changes: list[dict] = []
+        self.posts: dict[str, dict] = {}
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path.endswith("/stream/rules"):
+                    self._json(200, {"data": fake.rules})
+                elif url.path.endswith("/stream"):
+                    fake.stream(self)
+                elif url.path == "/2/tweets":
+                    ids = parse_qs(url.query)["ids"][0].split(",")
+                    self._json(200, {
+                        "data": [fake.posts[i] for i in ids
+                                 if i in fake.posts],
+                        "includes": USERS,
+                    })
+                else:
+                    self._json(404, {})
+
+            def do_POST(self):
+                length = int(self.headers["Content-Length"])
+                change = json.loads(self.rfile.read(length))
+                fake.rule_changes.append(change)
+                ids = set(change.get("delete", {}).get("ids", []))
+                fake.rules = [r for r in fake.rules if r["id"] not in ids]
+                for rule in change.get("add", []):
+                    rule_id = str(len(fake.rule_changes) + 100)
+                    fake.rules.append({"id": rule_id, **rule})
+                self._json(200, {"meta": {}})
+
+            def _json(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        host, port = self.server.server_address
+        self.base = f"http://{host}:{port}"
+
+    def stream(self, handler) -> None:
+        reply = self.connections.pop(0) if self.connections else 503
+        if isinstance(reply, int):
+            handler._json(reply, {"title": "Too Many Requests"})
+            return
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        for line in reply:
+            handler.wfile.write(line.encode() + b"\r\n")
+            handler.wfile.flush()
+        handler.close_connection = True
+
+
+@pytest.fixture
+def fake_x(fake_redis, monkeypatch):
+    def start(connections: list) -> FakeX:
+        fake = FakeX(connections)
+        threading.Thread(
+            target=fake.server.serve_forever, daemon=True,
+        ).start()
+        stream_url = f"{fake.base}/2/tweets/search/stream"
+        monkeypatch.setattr(x_stream, "STREAM_URL", stream_url)
+        monkeypatch.setattr(x_stream, "RULES_URL", f"{stream_url}/rules")
+        monkeypatch.setattr(
+            x_stream, "LOOKUP_URL", f"{fake.base}/2/tweets",
+        )
+        servers.append(fake.server)
+        return fake
+
+    servers = []
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_listen_reconnects_and_buffers_posts(fake_x, monkeypatch):
+    post = _post("101", minutes_ago=40)
+    fake = fake_x([
+        429,
+        ["", json.dumps({"data": post, "includes": USERS}), "{bad", ""],
+    ])
+    stop = threading.Event()
+    delays = []
+
+    def reconnect_delay(kind, attempt):
+        delays.append((kind, attempt))
+        if len(delays) == 2:
+            stop.set()
+        return 0
+
+    monkeypatch.setattr(x_stream, "_reconnect_delay", reconnect_delay)
+    listener = threading.Thread(target=x_stream.listen, args=(stop,))
+    listener.start()
+    listener.join(timeout=10)
+
+    assert not listener.is_alive()
+    # 429 backs off as a rate limit; the successful connection resets
+    # the attempt count before X closes it
+    assert delays == [("rate", 0), ("network", 0)]
+    assert x_stream.pending() == 1
+    # Rules were synced on each connect: the stale one replaced once
+    assert [rule["tag"] for rule in fake.rules] == ["keyword"]
+    assert fake.rules[0]["value"] == x_stream.build_rules()["keyword"]
+    assert len(fake.rule_changes) == 2
+
+
+def test_reconnect_backoff(monkeypatch):
+    monkeypatch.setattr(x_stream.random, "uniform", lambda a, b: 1.0)
+
+    assert [x_stream._reconnect_delay("network", n) for n in range(3)] \
+        == [0.25, 0.5, 0.75]
+    assert x_stream._reconnect_delay("network", 500) == 16
+    assert [x_stream._reconnect_delay("http", n) for n in range(3)] \
+        == [5, 10, 20]
+    assert x_stream._reconnect_delay("http", 10) == 320
+    assert x_stream._reconnect_delay("rate", 0) == 60
+    assert x_stream._reconnect_delay("rate", 10) == 960
+
+
+def test_consume_cycle_looks_up_mature_posts(fake_x, monkeypatch):
+    fake = fake_x([])
+    mature, young = _post("201", 40, likes=9), _post("202", 5)
+    fake.posts = {p["id"]: p for p in (mature, young)}
+    x_stream.buffer([
+        x_stream.decode_stream_line(json.dumps({"data": p}))
+        for p in (mature, young)
+    ])
+    consumed, reports = [], []
+    monkeypatch.setattr(
+        x_stream, "process_posts",
+        lambda posts, interval: consumed.extend(posts),
+    )
+    monkeypatch.setattr(
+        http_client, "log_stats", lambda: reports.append("http"),
+    )
+    monkeypatch.setattr(
+        ratelimit, "log_report", lambda: reports.append("ratelimit"),
+    )
+
+    x_stream.consume_cycle()
+
+    assert [(p.id, p.like_count) for p in consumed] == [("201", 9)]
+    assert x_stream.pending() == 1
+    assert reports == ["http", "ratelimit"]